@@ -3,14 +3,9 @@
 Provides intelligent recommendations, real-time tracking, and traffic-aware predictions
 """
 
-from datetime import datetime
 from janmarg_data import (
     COMMERCIAL_SPEED_KMH,
     DWELL_TIME_SEC,
-    HEADWAY_PEAK,
-    HEADWAY_OFFPEAK,
-    PEAK_HOURS_MORNING,
-    PEAK_HOURS_EVENING,
     ROUTE_1_STOPS,
     ROUTE_7_STOPS,
     ROUTE_15_STOPS,
@@ -24,8 +19,16 @@ from janmarg_data import (
     ROUTE_15_INDICES,
     ROUTE_4_INDICES
 )
-import random
+from service_profile import service_profile
+from timetable import timetable, minute_of_day, DWELL_MIN
+from transit_network import ROUTES, STOP_CHAINAGE_KM, canonical_station
+from fleet_simulator import fleet
+from vehicle_tracks import vehicle_tracks
+from passenger_load import passenger_load
+from eta_distribution import ride_distribution, percentiles, eta_model
+from determinism import clock, seed_for
 import math
+import numpy as np
 
 
 class TransitAIAgent:
@@ -78,16 +81,17 @@ class TransitAIAgent:
         
         Returns:
             {
-                "bus_id": "BUS-001",
+                "bus_id": "BUS-1-ON-034",
                 "route_id": "1",
                 "distance_km": 2.5,
                 "eta_minutes": 8,
                 "location": [lat, lng],
+                "bus_location": [lat, lng],
                 "heading": "approaching_your_route"
             }
+            distance_km and location refer to the nearest station; the bus is
+            the soonest simulated one still calling there.
         """
-        current_hour = datetime.now().hour
-        
         user_point = [user_lat, user_lng]
         stations = TransitAIAgent._station_points()
 
@@ -103,7 +107,7 @@ class TransitAIAgent:
                 "location": None,
                 "heading": "unavailable",
                 "occupancy_percent": None,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": clock().isoformat(),
                 "station_name": None
             }
 
@@ -114,35 +118,75 @@ class TransitAIAgent:
         )
 
         distance_km = round(TransitAIAgent._haversine_km(user_point, nearest["location"]), 2)
-        
-        # Calculate ETA based on distance
-        eta_minutes = round((distance_km / COMMERCIAL_SPEED_KMH) * 60 + random.uniform(1, 3))
-        
+
+        # Soonest live-tracked bus heading to that station
+        live = vehicle_tracks.approaching(nearest["station"], user_route_id)
+        if live:
+            eta, bus = live[0]
+            bus_distance_km = round(TransitAIAgent._haversine_km(bus["location"], nearest["location"]), 2)
+            return {
+                "bus_id": bus["bus_id"],
+                "route_id": bus["route_id"],
+                "distance_km": distance_km,
+                "eta_minutes": round(eta),
+                "location": nearest["location"],
+                "bus_location": bus["location"],
+                "bus_distance_km": bus_distance_km,
+                "heading": "approaching_your_route" if bus_distance_km < 2 else "in_transit",
+                "occupancy_percent": None,
+                "station_name": nearest["station"],
+                "source": "avl",
+                "timestamp": bus["timestamp"]
+            }
+
+        # Otherwise the soonest simulated bus still calling there
+        snapshot = fleet.snapshot()
+        approaching = snapshot.approaching(nearest["station"], user_route_id)
+        if not approaching:
+            return {
+                "bus_id": None,
+                "route_id": nearest["route_id"],
+                "distance_km": distance_km,
+                "eta_minutes": None,
+                "location": nearest["location"],
+                "heading": "no_service",
+                "occupancy_percent": None,
+                "station_name": nearest["station"],
+                "timestamp": snapshot.timestamp.isoformat()
+            }
+
+        eta, i = approaching[0]
+        bus = snapshot.vehicle(i)
+        bus_distance_km = round(TransitAIAgent._haversine_km(bus["location"], nearest["location"]), 2)
         return {
-            "bus_id": f"BUS-R{nearest['route_id']}-{random.randint(100, 999)}",
-            "route_id": nearest["route_id"],
+            "bus_id": bus["bus_id"],
+            "route_id": bus["route_id"],
             "distance_km": distance_km,
-            "eta_minutes": eta_minutes,
+            "eta_minutes": round(eta),
             "location": nearest["location"],
-            "heading": "approaching_your_route" if distance_km < 2 else "in_transit",
-            "occupancy_percent": round(random.uniform(30, 85)),
+            "bus_location": bus["location"],
+            "bus_distance_km": bus_distance_km,
+            "heading": "approaching_your_route" if bus_distance_km < 2 else "in_transit",
+            "occupancy_percent": bus["occupancy_percent"],
             "station_name": nearest["station"],
-            "timestamp": datetime.now().isoformat()
+            "source": "simulator",
+            "timestamp": bus["timestamp"]
         }
 
     @staticmethod
-    def get_live_bus_position(route_id, bus_id, current_progress_percent):
+    def get_live_bus_position(route_id, bus_id, current_progress_percent=None):
         """
-        Get simulated live position of a bus with realistic movement
-        
+        Get the live position of a bus: its newest AVL fix when it reports,
+        otherwise the shared fleet snapshot
+
         Args:
             route_id: Route identifier
-            bus_id: Bus identifier
-            current_progress_percent: 0-100, how far along the route
-        
+            bus_id: Bus identifier (as returned by get_nearest_bus / the fleet list)
+            current_progress_percent: Ignored; kept for older clients
+
         Returns:
             {
-                "bus_id": "BUS-001",
+                "bus_id": "BUS-1-ON-034",
                 "route_id": "1",
                 "location": [lat, lng],
                 "speed_kmh": 25,
@@ -151,38 +195,14 @@ class TransitAIAgent:
                 "progress_percent": 5,
                 "timestamp": "2026-02-03T15:30:45"
             }
+            or None if no such bus is in service on that route
         """
-        # Route reference points (simplified)
-        route_centers = {
-            "1": {"start": [23.027159, 72.508525], "end": [23.003624, 72.554034]},
-            "7": {"start": [23.109374, 72.596374], "end": [23.104768, 72.596371]},
-            "15": {"start": [23.027159, 72.508525], "end": [23.188333, 72.778125]}
-        }
-        
-        center = route_centers.get(route_id, route_centers["1"])
-        progress = current_progress_percent / 100.0
-        
-        # Interpolate position along route
-        lat = center["start"][0] + (center["end"][0] - center["start"][0]) * progress
-        lng = center["start"][1] + (center["end"][1] - center["start"][1]) * progress
-        
-        # Simulate speed with traffic variation
-        base_speed = COMMERCIAL_SPEED_KMH
-        current_hour = datetime.now().hour
-        is_peak = (PEAK_HOURS_MORNING[0] <= current_hour < PEAK_HOURS_MORNING[1] or
-                   PEAK_HOURS_EVENING[0] <= current_hour < PEAK_HOURS_EVENING[1])
-        
-        speed = base_speed * (0.7 if is_peak else 1.0) + random.uniform(-2, 2)
-        
-        return {
-            "bus_id": bus_id,
-            "route_id": route_id,
-            "location": [round(lat, 6), round(lng, 6)],
-            "speed_kmh": round(speed, 1),
-            "accuracy_meters": random.randint(5, 15),
-            "progress_percent": current_progress_percent,
-            "timestamp": datetime.now().isoformat()
-        }
+        bus = vehicle_tracks.latest(bus_id)
+        if bus is None:
+            bus = fleet.snapshot().find(bus_id)
+        if bus is None or bus["route_id"] != route_id:
+            return None
+        return bus
 
     @staticmethod
     def get_transfer_recommendations(origin, destination, current_hour=None):
@@ -204,14 +224,6 @@ class TransitAIAgent:
                 }
             ]
         """
-        if current_hour is None:
-            current_hour = datetime.now().hour
-        
-        is_peak = (PEAK_HOURS_MORNING[0] <= current_hour < PEAK_HOURS_MORNING[1] or
-                   PEAK_HOURS_EVENING[0] <= current_hour < PEAK_HOURS_EVENING[1])
-        
-        headway = HEADWAY_PEAK if is_peak else HEADWAY_OFFPEAK
-        
         recommendations = [
             {
                 "segment": 1,
@@ -241,10 +253,13 @@ class TransitAIAgent:
         return recommendations
 
     @staticmethod
-    def predict_transfer_wait_time(transfer_station, from_route, to_route, current_hour=None):
+    def predict_transfer_wait_time(transfer_station, from_route, to_route, current_hour=None, to_direction=None):
         """
         Predict waiting time at transfer station
         
+        Aligns the next from_route bus arriving at the station with the next
+        to_route departure from the timetable.
+        
         Returns:
             {
                 "station": "Ranip Cross-Road",
@@ -255,27 +270,55 @@ class TransitAIAgent:
                 "amenities": ["Waiting Area", "Bathroom", "Water Fountain", "Shop"]
             }
         """
-        if current_hour is None:
-            current_hour = datetime.now().hour
-        
-        is_peak = (PEAK_HOURS_MORNING[0] <= current_hour < PEAK_HOURS_MORNING[1] or
-                   PEAK_HOURS_EVENING[0] <= current_hour < PEAK_HOURS_EVENING[1])
-        
-        headway = HEADWAY_PEAK if is_peak else HEADWAY_OFFPEAK
-        
-        # Random wait between 0 and headway
-        wait_minutes = round(random.uniform(0.5, headway), 1)
+        now = clock()
+        now_minutes = minute_of_day(now) if current_hour is None else current_hour * 60
+        
+        headway = service_profile.headway(now_minutes, str(to_route))
+        
+        station = canonical_station(transfer_station)
+        connection = None
+        if station:
+            connection = timetable.connection(
+                station, str(from_route), str(to_route), now_minutes, to_direction=to_direction
+            )
+        
+        if connection:
+            waits = [d["wait_min"] for d in connection["departures"]]
+            wait_minutes = waits[0]
+            wait_range = f"{min(waits):.1f}-{max(waits):.1f}"
+            confidence = 0.9
+            connecting = [
+                {
+                    "route_id": d["route_id"],
+                    "direction": d["direction_label"],
+                    "headsign": d["headsign"],
+                    "trip_id": d["trip_id"],
+                    "scheduled": d["scheduled"],
+                    "wait_minutes": d["wait_min"]
+                }
+                for d in connection["departures"]
+            ]
+            arriving_trip = connection["arriving_trip_id"]
+        else:
+            # Routes do not meet here: fall back to the average wait of half a headway
+            wait_minutes = round(headway / 2, 1)
+            wait_range = f"0.5-{headway:.1f}"
+            confidence = 0.6
+            connecting = []
+            arriving_trip = None
         
         return {
-            "station": transfer_station,
+            "station": station or transfer_station,
             "from_route": from_route,
             "to_route": to_route,
             "wait_minutes": wait_minutes,
-            "wait_range": f"{max(0.5, wait_minutes - 1.5):.1f}-{wait_minutes + 1.5:.1f}",
-            "confidence": round(random.uniform(0.75, 0.95), 2),
+            "wait_range": wait_range,
+            "arriving_trip_id": arriving_trip,
+            "connections": connecting,
+            "confidence": confidence,
             "recommendation": "Stretch legs and refresh" if wait_minutes > 5 else "Be ready to board",
             "amenities": ["Waiting Area", "Bathroom", "Water Fountain", "Shop"],
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now.isoformat()
         }
 
     @staticmethod
@@ -294,10 +337,15 @@ class TransitAIAgent:
                 "factors": ["Light traffic", "Bus not crowded", "No accidents reported"]
             }
         """
-        current_hour = datetime.now().hour
-        
-        is_peak = (PEAK_HOURS_MORNING[0] <= current_hour < PEAK_HOURS_MORNING[1] or
-                   PEAK_HOURS_EVENING[0] <= current_hour < PEAK_HOURS_EVENING[1])
+        now = clock()
+        if distance_km is None:
+            sampled = TransitAIAgent._sampled_eta(route_id, origin_idx, destination_idx, now)
+            if sampled:
+                return sampled
+
+        minute = minute_of_day(now)
+        is_peak = service_profile.is_peak(minute, str(route_id))
+        traffic_factor = service_profile.traffic_factor(minute, str(route_id))
         
         if distance_km is None:
             distance_km = 5.0  # default
@@ -305,17 +353,14 @@ class TransitAIAgent:
         # Base ETA
         base_eta = (distance_km / COMMERCIAL_SPEED_KMH) * 60
         
-        # Apply traffic factor
-        if is_peak:
-            traffic_factor = 1.4
+        # Apply the service profile's traffic factor
+        if traffic_factor >= 1.25:
             traffic_condition = "Heavy"
             confidence = 0.75
-        elif 12 <= current_hour < 17:
-            traffic_factor = 1.15
+        elif traffic_factor > 1.0:
             traffic_condition = "Moderate"
             confidence = 0.85
         else:
-            traffic_factor = 1.0
             traffic_condition = "Light"
             confidence = 0.92
         
@@ -338,7 +383,54 @@ class TransitAIAgent:
             "delay_minutes": delay,
             "speed_kmh": round(COMMERCIAL_SPEED_KMH * (1 / traffic_factor), 1),
             "factors": factors,
-            "timestamp": datetime.now().isoformat()
+            "model": "schedule",
+            "timestamp": now.isoformat()
+        }
+
+    @staticmethod
+    def _sampled_eta(route_id, origin_idx, destination_idx, now):
+        """
+        ETA from Monte Carlo ride samples (learned segment times where trained,
+        scheduled runs otherwise); None if the stop indices are not a ride
+        """
+        route = ROUTES.get(route_id)
+        if route is None or origin_idx == destination_idx:
+            return None
+        stops = route['stops']
+        if not (0 <= origin_idx < len(stops) and 0 <= destination_idx < len(stops)):
+            return None
+
+        sampled = ride_distribution(
+            route_id, stops[origin_idx], stops[destination_idx], minute_of_day(now),
+            seed=seed_for("traffic-eta", route_id, origin_idx, destination_idx)
+        )
+        ride = sampled["ride"]
+        p10, p50, p90 = np.percentile(ride, (10, 50, 90))
+        distance_km = abs(float(STOP_CHAINAGE_KM[route_id][destination_idx] - STOP_CHAINAGE_KM[route_id][origin_idx]))
+        free_flow = distance_km / COMMERCIAL_SPEED_KMH * 60 + (sampled["segments"] - 1) * DWELL_MIN
+        slowdown = p50 / free_flow if free_flow > 0 else 1.0
+        traffic_condition = "Heavy" if slowdown > 1.3 else "Moderate" if slowdown > 1.1 else "Light"
+        delay = max(0, round(p50 - free_flow))
+
+        factors = [f"{traffic_condition.lower()} traffic"]
+        if sampled["learned_segments"]:
+            factors.insert(0, f"Learned from recorded trips ({sampled['learned_segments']}/{sampled['segments']} segments)")
+        if delay > 2:
+            factors.append(f"Estimated {delay} min delay")
+
+        return {
+            "route_id": route_id,
+            "eta_minutes": int(round(p50)),
+            "eta_range": f"{math.floor(p10)}-{math.ceil(p90)}",
+            "eta_percentiles": percentiles(ride),
+            # Share of sampled rides finishing within 2 minutes of the quoted ETA
+            "confidence": round(float(np.mean(np.abs(ride - round(p50)) <= 2)), 2),
+            "traffic_condition": traffic_condition,
+            "delay_minutes": delay,
+            "speed_kmh": round(distance_km / p50 * 60, 1) if p50 > 0 else None,
+            "factors": factors,
+            "model": eta_model(sampled["learned_segments"], sampled["segments"]),
+            "timestamp": now.isoformat()
         }
 
     @staticmethod
@@ -357,30 +449,45 @@ class TransitAIAgent:
                 "confidence": 0.9
             }
         """
-        if current_hour is None:
-            current_hour = datetime.now().hour
-        
-        is_peak = (PEAK_HOURS_MORNING[0] <= current_hour < PEAK_HOURS_MORNING[1] or
-                   PEAK_HOURS_EVENING[0] <= current_hour < PEAK_HOURS_EVENING[1])
-        
-        headway = HEADWAY_PEAK if is_peak else HEADWAY_OFFPEAK
-        
-        next_bus_eta = round(random.uniform(1, headway * 0.8), 1)
-        bus_after_eta = round(next_bus_eta + headway, 1)
-        occupancy = round(random.uniform(30, 80))
+        now = clock()
+        now_minutes = minute_of_day(now) if current_hour is None else current_hour * 60
+        
+        headway = service_profile.headway(now_minutes, str(route_id))
+        
+        # Next two scheduled trips in the same direction at this stop
+        departures = []
+        station = canonical_station(origin_station)
+        stops = ROUTES.get(str(route_id), {}).get('stops', [])
+        if station in stops:
+            direction = 0 if stops.index(station) < len(stops) - 1 else 1
+            departures = timetable.next_departures(
+                station, now_minutes, limit=2, route_id=str(route_id), direction=direction
+            )
+        if len(departures) == 2:
+            next_bus_eta = departures[0]["wait_min"]
+            bus_after_eta = departures[1]["wait_min"]
+            # Load each bus will carry when it leaves this stop, from the passenger load model
+            occupancy, after_occupancy = (
+                round(ratio * 100) for _, ratio in passenger_load.departure_crowding(departures)
+            )
+        else:
+            next_bus_eta = round(headway / 2, 1)
+            bus_after_eta = round(next_bus_eta + headway, 1)
+            occupancy = after_occupancy = round(service_profile.occupancy(now_minutes, str(route_id)) * 100)
         
         # Comfort score (0-10)
         comfort_score = 10 - (occupancy / 10)
         
-        if next_bus_eta <= 3:
-            recommendation = "Catch NEXT bus NOW!"
-            reason = f"High comfort ({10 - occupancy/10:.1f}/10), arriving in {next_bus_eta} min"
-        elif occupancy > 70:
+        crowded = " (crowded, the bus after is no emptier)" if occupancy > 70 else ""
+        if occupancy > 70 and after_occupancy < occupancy - 10:
             recommendation = "Wait for bus after next"
-            reason = f"Avoid crowding. {bus_after_eta} min wait for {9 - occupancy/10:.1f}/10 comfort"
+            reason = f"Avoid crowding. {bus_after_eta} min wait for {10 - after_occupancy/10:.1f}/10 comfort"
+        elif next_bus_eta <= 3:
+            recommendation = "Catch NEXT bus NOW!"
+            reason = f"Comfort {comfort_score:.1f}/10{crowded}, arriving in {next_bus_eta} min"
         else:
             recommendation = "Next bus is good"
-            reason = f"Decent comfort ({10 - occupancy/10:.1f}/10), arrive in {next_bus_eta} min"
+            reason = f"Comfort {comfort_score:.1f}/10{crowded}, arrive in {next_bus_eta} min"
         
         return {
             "recommendation": recommendation,
@@ -390,9 +497,10 @@ class TransitAIAgent:
             "next_bus_eta": next_bus_eta,
             "bus_after_next_eta": bus_after_eta,
             "occupancy_percent": occupancy,
+            "bus_after_next_occupancy_percent": after_occupancy,
             "comfort_score": round(comfort_score, 1),
             "confidence": 0.88,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": clock().isoformat()
         }
 
     @staticmethod
@@ -418,7 +526,7 @@ class TransitAIAgent:
                 }
             ]
         """
-        current_hour = datetime.now().hour
+        current_hour = clock().hour
 
         # Prefer actual journey transfer stations when available
         transfer_station_1 = None
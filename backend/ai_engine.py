@@ -3,6 +3,17 @@ import json
 from urllib import request as urllib_request
 from urllib.error import URLError, HTTPError
 from PyPDF2 import PdfReader
+from prompt_builder import prompt_builder
+from fares import fare_engine
+from intent_engine import intent_engine, INTENT_FARE
+
+
+DEFAULT_GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+
+def _chat_completions_url():
+    base_url = os.getenv("GROQ_BASE_URL", "").strip() or DEFAULT_GROQ_BASE_URL
+    return f"{base_url.rstrip('/')}/chat/completions"
 
 
 class JanmargBrain:
@@ -12,46 +23,8 @@ class JanmargBrain:
         self.pdf_path = pdf_path or os.getenv("JANMARG_PDF_PATH", default_pdf)
         self.official_context = self._build_official_context()
 
-    def _fare_table_context(self):
-        return (
-            "FARE TABLE (distance_km -> fare_inr): "
-            "<3=5, 3-5=10, 5-8=15, 8-14=20, 14-20=25, >20=30."
-        )
-
-    def _estimate_fare(self, distance_km):
-        if distance_km is None:
-            return None
-        try:
-            km = float(distance_km)
-        except (TypeError, ValueError):
-            return None
-        if km < 3:
-            return 5
-        if km < 5:
-            return 10
-        if km < 8:
-            return 15
-        if km < 14:
-            return 20
-        if km < 20:
-            return 25
-        return 30
-
     def _is_fare_question(self, query):
-        q = query.lower()
-        return any(word in q for word in ("fare", "ticket", "price", "cost"))
-
-    def _extract_distance_from_context(self, context):
-        if not context:
-            return None
-        marker = "distance_km="
-        if marker not in context:
-            return None
-        try:
-            value = context.split(marker, 1)[1].split(",", 1)[0]
-            return float(value)
-        except (ValueError, TypeError):
-            return None
+        return intent_engine.classify(query) == INTENT_FARE
 
     def _read_pdf_text(self):
         if not self.pdf_path or not os.path.exists(self.pdf_path):
@@ -103,33 +76,21 @@ class JanmargBrain:
         raw_text = self._read_pdf_text()
         extracted = self._extract_key_sentences(raw_text)
         if extracted:
-            return f"{extracted}\n{self._fare_table_context()}"
+            return f"{extracted}\n{fare_engine.context_line()}"
         return (
             "Official context could not be loaded from the PDF. "
             "Please ensure World_Bank_GEF.pdf is available. "
-            f"{self._fare_table_context()}"
+            f"{fare_engine.context_line()}"
         )
 
-    def _fallback_answer(self, query, user_context=None):
-        if self._is_fare_question(query):
-            context_str = user_context or ""
-            distance_km = self._extract_distance_from_context(context_str)
-            
-            # If we don't have distance but have origin/dest, we should have distance in context string
-            # if server.py calculated it correctly. Let's make sure we try our best.
-            fare = self._estimate_fare(distance_km)
-            
-            if fare is not None:
-                return (
-                    f"The estimated fare for your journey is Rs {fare} (approx {distance_km:.1f} km). "
-                    "Janmarg fare bands: 1-3km=Rs 5, 3-5km=Rs 10, 5-8km=Rs 15, 8-14km=Rs 20, 14-20km=Rs 25, >20km=Rs 30."
-                )
-            
-            return (
-                "Based on Janmarg's official fare policy, tickets start at Rs 5 (up to 3km) "
-                "and go up to Rs 30 (for journeys over 20km). "
-                "To get exact pricing, please select your origin and destination in the search bar."
-            )
+    def fare_answer(self, origin=None, destination=None, distance_km=None):
+        return fare_engine.answer(distance_km=distance_km, origin=origin, destination=destination)
+
+    def _fallback_answer(self, query, trip=None, fare_question=None):
+        if fare_question is None:
+            fare_question = self._is_fare_question(query)
+        if fare_question:
+            return self.fare_answer(**(trip or {}))
 
         return (
             "I am the Janmarg AI. I can help you with fares, route guidance, and operating hours. "
@@ -137,42 +98,39 @@ class JanmargBrain:
         )
 
 
-    def ask_llama(self, user_query, user_context=None, history=None):
+    def ask_llama(self, user_query, user_context=None, history=None, trip=None):
+        answer, _ = self.ask_llama_with_stats(user_query, user_context=user_context, history=history, trip=trip)
+        return answer
+
+    def ask_llama_with_stats(self, user_query, user_context=None, history=None, trip=None, fare_question=None):
+        """
+        Ask the LLM and report prompt size
+
+        Args:
+            trip: Optional {"origin", "destination", "distance_km"} for fare
+                answers when the LLM cannot be reached
+            fare_question: Whether the caller already classified the query as
+                a fare question; classified here (on fallback only) when None
+
+        Returns:
+            (answer, prompt_stats); prompt_stats is None when no prompt was sent
+        """
         query = (user_query or "").strip()
         if not query:
-            return "Please provide a question about Janmarg BRTS operations."
+            return "Please provide a question about Janmarg BRTS operations.", None
 
         api_key = os.getenv("GROQ_API_KEY", "").strip()
         if not api_key:
-            fallback = self._fallback_answer(query, user_context=user_context)
-            return "LLM unavailable (missing GROQ_API_KEY). " + fallback
-
-        context_block = ""
-        if user_context:
-            context_block = f"\nUSER CONTEXT (not authoritative): {user_context}"
-
-        system_prompt = (
-            "You are the Janmarg AI Assistant. Answer the user's question strictly "
-            "using the following context from the World Bank GEF Report. "
-            f"CONTEXT: {self.official_context} "
-            f"{context_block} "
-            "If the answer is not in the text, say "
-            "\"I can only answer based on official BRTS protocols.\""
+            fallback = self._fallback_answer(query, trip=trip, fare_question=fare_question)
+            return "LLM unavailable (missing GROQ_API_KEY). " + fallback, None
+
+        messages, prompt_stats = prompt_builder.build(
+            query,
+            self.official_context,
+            user_context=user_context,
+            history=history
         )
 
-        messages = [
-            {"role": "system", "content": system_prompt}
-        ]
-
-        if history:
-            for item in history[-6:]:
-                role = item.get("role")
-                content = item.get("content")
-                if role in ("user", "assistant") and content:
-                    messages.append({"role": role, "content": str(content)})
-
-        messages.append({"role": "user", "content": query})
-
         payload = {
             "model": os.getenv("GROQ_MODEL", "llama3-70b-8192"),
             "messages": messages,
@@ -183,14 +141,15 @@ class JanmargBrain:
         try:
             data = json.dumps(payload).encode("utf-8")
             req = urllib_request.Request(
-                "https://api.groq.com/openai/v1/chat/completions",
+                _chat_completions_url(),
                 data=data,
                 headers={
                     "Content-Type": "application/json",
                     "Authorization": f"Bearer {api_key}"
                 }
             )
-            with urllib_request.urlopen(req, timeout=20) as resp:
+            timeout = float(os.getenv("GROQ_TIMEOUT_SEC", "20"))
+            with urllib_request.urlopen(req, timeout=timeout) as resp:
                 result = json.loads(resp.read().decode("utf-8"))
         except HTTPError as err:
             try:
@@ -198,32 +157,36 @@ class JanmargBrain:
                 error_payload = json.loads(body)
                 message = error_payload.get("error", {}).get("message")
                 if message:
-                    return message
+                    return message, prompt_stats
                 if body.strip():
-                    return body.strip()[:300]
+                    return body.strip()[:300], prompt_stats
             except (ValueError, KeyError, TypeError):
                 pass
-            return self._fallback_answer(query, user_context=user_context)
-        except URLError:
-            return self._fallback_answer(query, user_context=user_context)
+            return self._fallback_answer(query, trip=trip, fare_question=fare_question), prompt_stats
+        except (URLError, TimeoutError):
+            return self._fallback_answer(query, trip=trip, fare_question=fare_question), prompt_stats
         except (ValueError, KeyError, TypeError):
-            return self._fallback_answer(query, user_context=user_context)
+            return self._fallback_answer(query, trip=trip, fare_question=fare_question), prompt_stats
 
         if not isinstance(result, dict):
-            return self._fallback_answer(query, user_context=user_context)
+            return self._fallback_answer(query, trip=trip, fare_question=fare_question), prompt_stats
 
         if result.get("error"):
-            return self._fallback_answer(query, user_context=user_context)
+            return self._fallback_answer(query, trip=trip, fare_question=fare_question), prompt_stats
+
+        usage = result.get("usage")
+        if isinstance(usage, dict) and usage.get("prompt_tokens") is not None:
+            prompt_stats["reported_prompt_tokens"] = usage.get("prompt_tokens")
 
         choices = result.get("choices", [])
         if not choices:
-            return self._fallback_answer(query, user_context=user_context)
+            return self._fallback_answer(query, trip=trip, fare_question=fare_question), prompt_stats
 
         message = choices[0].get("message") or choices[0].get("delta") or {}
         content = message.get("content")
         if not content:
             content = choices[0].get("text")
         if not content:
-            return self._fallback_answer(query, user_context=user_context)
+            return self._fallback_answer(query, trip=trip, fare_question=fare_question), prompt_stats
 
-        return str(content).strip()
+        return str(content).strip(), prompt_stats
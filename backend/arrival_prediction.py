@@ -0,0 +1,147 @@
+"""
+🎯 KALMAN ARRIVAL PREDICTION
+Per-vehicle constant-velocity Kalman filter on chainage (km along the route
+trace). State is position and signed speed; each map-matched ping is one O(1)
+predict/update on plain arrays indexed by vehicle slot.
+
+Stop ETAs blend the filtered speed with the scheduled running speed by
+inverse variance, so a freshly seen bus leans on the schedule and a bus with
+a settled track leans on how it is actually moving. Intervals come from
+propagating position/speed variance plus dwell and per-km travel noise.
+"""
+
+import math
+
+import numpy as np
+
+from janmarg_data import COMMERCIAL_SPEED_KMH
+from service_profile import service_profile
+from timetable import DWELL_MIN
+
+
+ACCEL_NOISE = 0.05            # km²/min³, how fast a bus can change speed
+GPS_SIGMA_KM = 0.015          # map-matched fix error
+INITIAL_SPEED_SIGMA = 0.35    # km/min, before the second fix
+SCHEDULE_SPEED_SIGMA = 0.08   # km/min, how far real running speed strays from the schedule
+DWELL_SIGMA_MIN = 0.3         # per intermediate stop
+TRAVEL_NOISE_PER_KM = 0.15    # min² per km, signals and traffic along the way
+MIN_SPEED_KM_MIN = 0.05
+RESET_GAP_MIN = 10            # longer silences restart the filter
+Z_90 = 1.645
+
+
+def schedule_speed(minute, route_id=None):
+    """Scheduled running speed in km/min at one minute of the day"""
+    return COMMERCIAL_SPEED_KMH / service_profile.traffic_factor(minute, route_id) / 60
+
+
+class ChainageKalman:
+    """Position/speed filter for every vehicle slot"""
+
+    def __init__(self, capacity):
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.x = np.zeros(capacity)
+        self.v = np.zeros(capacity)
+        self.p00 = np.zeros(capacity)
+        self.p01 = np.zeros(capacity)
+        self.p11 = np.zeros(capacity)
+        self.t = np.zeros(capacity)
+        self.ready = np.zeros(capacity, dtype=bool)
+
+    def resize(self, capacity):
+        old = {name: getattr(self, name) for name in ("x", "v", "p00", "p01", "p11", "t", "ready")}
+        size = len(self.x)
+        self._allocate(capacity)
+        for name, values in old.items():
+            getattr(self, name)[:size] = values
+
+    def update(self, slots, ts, z):
+        """
+        One predict/update per slot (slots must be distinct within a call)
+
+        Args:
+            slots: Vehicle slot indices
+            ts: Fix times, epoch seconds
+            z: Map-matched chainage, km
+        """
+        dt = (ts - self.t[slots]) / 60
+        fresh = ~self.ready[slots] | (dt > RESET_GAP_MIN) | (dt < 0)
+        dt = np.where(fresh, 0.0, dt)
+
+        x = self.x[slots] + self.v[slots] * dt
+        v = self.v[slots]
+        p00 = self.p00[slots] + 2 * dt * self.p01[slots] + dt ** 2 * self.p11[slots] + ACCEL_NOISE * dt ** 3 / 3
+        p01 = self.p01[slots] + dt * self.p11[slots] + ACCEL_NOISE * dt ** 2 / 2
+        p11 = self.p11[slots] + ACCEL_NOISE * dt
+
+        r = GPS_SIGMA_KM ** 2
+        s = p00 + r
+        k0, k1 = p00 / s, p01 / s
+        innovation = z - x
+        x = x + k0 * innovation
+        v = v + k1 * innovation
+        p11 = p11 - k1 * p01
+        p00, p01 = (1 - k0) * p00, (1 - k0) * p01
+
+        self.x[slots] = np.where(fresh, z, x)
+        self.v[slots] = np.where(fresh, 0.0, v)
+        self.p00[slots] = np.where(fresh, r, p00)
+        self.p01[slots] = np.where(fresh, 0.0, p01)
+        self.p11[slots] = np.where(fresh, INITIAL_SPEED_SIGMA ** 2, p11)
+        self.t[slots] = ts
+        self.ready[slots] = True
+
+    def speed_kmh(self, slot):
+        return abs(float(self.v[slot])) * 60
+
+    def predict_stops(self, slot, direction, stops, now, minute, route_id=None):
+        """
+        Arrival predictions for the stops still ahead of one vehicle
+
+        Args:
+            slot: Vehicle slot
+            direction: 0 (chainage increasing) or 1 (decreasing)
+            stops: [(station, chainage_km), ...] in listed route order
+            now: Epoch seconds to predict from
+            minute: Minute of day, for the scheduled speed prior
+            route_id: Route whose service profile gives that prior
+
+        Returns:
+            [{"station", "eta_minutes", "eta_low", "eta_high"}, ...] in the
+            order the bus reaches them (90% interval)
+        """
+        if not self.ready[slot]:
+            return []
+        sign = 1.0 if direction == 0 else -1.0
+        dt = max(0.0, (now - self.t[slot]) / 60)
+        p00, p01, p11 = float(self.p00[slot]), float(self.p01[slot]), float(self.p11[slot])
+        position = float(self.x[slot] + self.v[slot] * dt)
+        position_var = p00 + 2 * dt * p01 + dt ** 2 * p11 + ACCEL_NOISE * dt ** 3 / 3
+        speed_var = p11 + ACCEL_NOISE * dt
+
+        prior = schedule_speed(minute, route_id)
+        prior_var = SCHEDULE_SPEED_SIGMA ** 2
+        observed = sign * float(self.v[slot])
+        speed = (observed / speed_var + prior / prior_var) / (1 / speed_var + 1 / prior_var)
+        speed = max(speed, MIN_SPEED_KM_MIN)
+        blended_var = 1 / (1 / speed_var + 1 / prior_var)
+
+        ahead = [(station, km) for station, km in stops if sign * (km - position) > 0]
+        if direction == 1:
+            ahead.reverse()
+        predictions = []
+        for n, (station, km) in enumerate(ahead):
+            distance = sign * (km - position)
+            eta = distance / speed + n * DWELL_MIN
+            var = (position_var / speed ** 2 + distance ** 2 * blended_var / speed ** 4
+                   + n * DWELL_SIGMA_MIN ** 2 + TRAVEL_NOISE_PER_KM * distance)
+            sd = math.sqrt(var)
+            predictions.append({
+                "station": station,
+                "eta_minutes": round(eta, 1),
+                "eta_low": round(max(0.0, eta - Z_90 * sd), 1),
+                "eta_high": round(eta + Z_90 * sd, 1)
+            })
+        return predictions
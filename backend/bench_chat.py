@@ -0,0 +1,147 @@
+"""
+🏁 CHAT THROUGHPUT BENCHMARK
+Drives /api/chat against the local LLM stub so throughput, timeouts and caching
+can be measured in CI with no external service.
+
+Usage:
+    python bench_chat.py --requests 200 --concurrency 16 --latency-ms 300
+    python bench_chat.py --url http://localhost:8000   # against a running backend
+"""
+
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib import request as urllib_request
+from urllib.error import HTTPError, URLError
+
+from llm_stub import StubConfig, create_stub_server
+
+
+MESSAGES = [
+    "Why does Janmarg use a dedicated corridor?",
+    "Explain how the BRTS reduces congestion",
+    "What is the fare from ISKCON to VGEC?",
+    "How do I go from LD to Airport?",
+    "How often do buses come during peak hours?",
+    "Tell me about the history of the BRTS",
+]
+
+
+def _start_thread(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def _start_backend(port):
+    import uvicorn
+    from server import app
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    backend = uvicorn.Server(config)
+    _start_thread(backend.run)
+    deadline = time.time() + 15
+    while not backend.started and time.time() < deadline:
+        time.sleep(0.05)
+    return backend
+
+
+def _post_chat(url, message, timeout):
+    data = json.dumps({"message": message}).encode("utf-8")
+    req = urllib_request.Request(
+        f"{url}/api/chat",
+        data=data,
+        headers={"Content-Type": "application/json"}
+    )
+    started = time.perf_counter()
+    try:
+        with urllib_request.urlopen(req, timeout=timeout) as resp:
+            body = json.loads(resp.read().decode("utf-8"))
+            status = resp.status
+    except HTTPError as err:
+        body = {}
+        status = err.code
+    except (URLError, TimeoutError):
+        body = {}
+        status = "timeout"
+    return status, body.get("served_by"), (time.perf_counter() - started) * 1000
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /api/chat against the local LLM stub")
+    parser.add_argument("--url", default=None, help="Existing backend URL; starts one in-process if omitted")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    stub = create_stub_server(port=0, config=StubConfig(
+        latency_ms=args.latency_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed
+    ))
+    _start_thread(stub.serve_forever)
+    stub_url = f"http://127.0.0.1:{stub.server_address[1]}/openai/v1"
+
+    backend = None
+    url = args.url
+    if not url:
+        os.environ["GROQ_BASE_URL"] = stub_url
+        os.environ.setdefault("GROQ_API_KEY", "stub")
+        os.environ.setdefault("USE_VALHALLA", "false")
+        backend = _start_backend(8765)
+        url = "http://127.0.0.1:8765"
+
+    print("=" * 60)
+    print(f"Benchmarking {url}/api/chat via stub at {stub_url}")
+    print("=" * 60)
+
+    messages = [MESSAGES[i % len(MESSAGES)] for i in range(args.requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda m: _post_chat(url, m, args.timeout), messages))
+    wall = time.perf_counter() - started
+
+    latencies = [latency for status, _, latency in results if status == 200]
+    statuses = {}
+    served = {}
+    for status, served_by, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        served[str(served_by)] = served.get(str(served_by), 0) + 1
+
+    print(f"Requests:     {len(results)} in {wall:.2f}s ({len(results) / wall:.1f} req/s)")
+    print(f"Status codes: {statuses}")
+    print(f"Served by:    {served}")
+    if latencies:
+        print(f"Latency ms:   mean={statistics.mean(latencies):.1f} "
+              f"p50={_percentile(latencies, 50):.1f} "
+              f"p95={_percentile(latencies, 95):.1f} "
+              f"p99={_percentile(latencies, 99):.1f}")
+    print(f"Stub:         {stub.stub_config.stats()}")
+
+    stub.shutdown()
+    if backend:
+        backend.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+💬 SERVER-SIDE CHAT SESSIONS
+Keeps trimmed history, resolved origin/destination and the precomputed user
+context per session, so each /api/chat turn only has to carry the new message.
+In-memory LRU with optional SQLite write-through persistence.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "2000"))
+CHAT_SESSION_TTL_SEC = int(os.getenv("CHAT_SESSION_TTL_SEC", "86400"))
+CHAT_SESSION_HISTORY_TURNS = int(os.getenv("CHAT_SESSION_HISTORY_TURNS", "12"))
+CHAT_SESSION_DB = os.getenv("CHAT_SESSION_DB", "").strip()
+
+
+class ChatSession:
+    """Conversation state for one chat client"""
+
+    def __init__(self, session_id, origin="", destination="", journey=None,
+                 user_context="", history=None, created_at=None, updated_at=None):
+        self.session_id = session_id
+        self.origin = origin
+        self.destination = destination
+        self.journey = journey or {}
+        self.user_context = user_context
+        self.history = history or []
+        self.created_at = created_at or time.time()
+        self.updated_at = updated_at or self.created_at
+
+    def add_turn(self, role, content, max_turns=CHAT_SESSION_HISTORY_TURNS):
+        """Append a turn and keep only the last max_turns"""
+        if not content:
+            return
+        self.history.append({"role": role, "content": str(content)})
+        if len(self.history) > max_turns:
+            del self.history[:-max_turns]
+
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "origin": self.origin,
+            "destination": self.destination,
+            "journey": self.journey,
+            "user_context": self.user_context,
+            "history": self.history,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["session_id"],
+            origin=data.get("origin", ""),
+            destination=data.get("destination", ""),
+            journey=data.get("journey"),
+            user_context=data.get("user_context", ""),
+            history=data.get("history"),
+            created_at=data.get("created_at"),
+            updated_at=data.get("updated_at")
+        )
+
+
+class ChatSessionStore:
+    """LRU session cache, optionally backed by a SQLite table"""
+
+    def __init__(self, max_sessions=CHAT_SESSION_MAX, ttl_sec=CHAT_SESSION_TTL_SEC, db_path=CHAT_SESSION_DB):
+        self.max_sessions = max_sessions
+        self.ttl_sec = ttl_sec
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _expired(self, session):
+        return (time.time() - session.updated_at) > self.ttl_sec
+
+    def _load(self, session_id):
+        if not self._db:
+            return None
+        row = self._db.execute(
+            "SELECT data FROM chat_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if not row:
+            return None
+        try:
+            return ChatSession.from_dict(json.loads(row[0]))
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def _remember(self, session):
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id):
+        """
+        Fetch a live session
+
+        Args:
+            session_id: Session identifier from a previous response
+
+        Returns:
+            ChatSession, or None if unknown or expired
+        """
+        if not session_id:
+            return None
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._load(session_id)
+            if session is None:
+                return None
+            if self._expired(session):
+                self._delete(session_id)
+                return None
+            self._remember(session)
+            return session
+
+    def create(self):
+        session = ChatSession(uuid.uuid4().hex)
+        with self._lock:
+            self._remember(session)
+        return session
+
+    def get_or_create(self, session_id):
+        return self.get(session_id) or self.create()
+
+    def save(self, session):
+        """Mark a session as updated and persist it when SQLite is enabled"""
+        session.updated_at = time.time()
+        with self._lock:
+            self._remember(session)
+            if self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO chat_sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                    (session.session_id, json.dumps(session.to_dict()), session.updated_at)
+                )
+                self._db.commit()
+
+    def _delete(self, session_id):
+        self._sessions.pop(session_id, None)
+        if self._db:
+            self._db.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+    def delete(self, session_id):
+        with self._lock:
+            self._delete(session_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active_sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_sec": self.ttl_sec,
+                "persistent": self._db is not None
+            }
+
+
+# Initialize store
+chat_sessions = ChatSessionStore()
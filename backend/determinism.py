@@ -0,0 +1,61 @@
+"""
+🎯 DETERMINISTIC MODE
+With DETERMINISTIC_MODE=true every endpoint reads time through clock(), which
+floors the wall clock to the start of a DETERMINISTIC_BUCKET_SEC bucket, and
+every sampler seeds from a stable hash of its inputs plus that bucket. Two
+identical requests in the same bucket then produce byte-identical responses,
+which the server turns into ETags and bucket-long cache lifetimes.
+
+Live inputs (AVL pings, bunching observations) still change responses when
+they arrive; everything the server derives on its own does not.
+
+With the mode off (the default) clock() is the wall clock and seed_for()
+returns None, i.e. fresh entropy.
+"""
+
+import os
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from prediction_tables import PREDICTION_SEED
+
+
+DETERMINISTIC_MODE = os.getenv("DETERMINISTIC_MODE", "false").lower() == "true"
+DETERMINISTIC_BUCKET_SEC = max(1, int(os.getenv("DETERMINISTIC_BUCKET_SEC", "60")))
+
+
+def bucket_start(moment):
+    """Start of the time bucket containing `moment`"""
+    midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    elapsed = int((moment - midnight).total_seconds())
+    return midnight + timedelta(seconds=elapsed - elapsed % DETERMINISTIC_BUCKET_SEC)
+
+
+def clock():
+    """Current time as the server reports it: bucket start in deterministic mode"""
+    now = datetime.now()
+    return bucket_start(now) if DETERMINISTIC_MODE else now
+
+
+def seconds_left_in_bucket(now=None):
+    """Seconds until the current bucket (and any response built in it) expires"""
+    now = now or datetime.now()
+    return DETERMINISTIC_BUCKET_SEC - (now - bucket_start(now)).total_seconds()
+
+
+def stable_seed(*parts):
+    """32-bit seed from PREDICTION_SEED, the current bucket and the given inputs"""
+    key = repr((PREDICTION_SEED, bucket_start(datetime.now()).isoformat()) + parts)
+    return zlib.crc32(key.encode("utf-8"))
+
+
+def seed_for(*parts):
+    """Seed for a sampler: stable in deterministic mode, None (fresh entropy) otherwise"""
+    return stable_seed(*parts) if DETERMINISTIC_MODE else None
+
+
+def stable_uniform(low, high, *parts):
+    """Uniform draw in [low, high): a pure function of the inputs in deterministic mode"""
+    return float(np.random.default_rng(seed_for(*parts)).uniform(low, high))
@@ -0,0 +1,217 @@
+"""
+🎲 MONTE CARLO ETA DISTRIBUTIONS
+Samples whole itineraries instead of quoting one number. Every sample draws:
+- how late each candidate bus leaves the boarding stop, and so which trip the
+  passenger actually catches (a slow first leg can miss the planned connection)
+- each stop-to-stop run time around that trip's scheduled time, or around the
+  learned segment median where the trained table has data
+- the dwell at every intermediate stop
+
+All samples of a leg are one set of array operations: searchsorted for the
+boarded trip, cumulative sums for its scheduled runs, and one draw each for the
+summed runs (lognormal matched to the mean and variance of the per-segment
+lognormals) and the summed dwells (gamma, exact). 10k samples take a few
+milliseconds. Pass a seed for reproducible draws; in deterministic mode the
+timing field is left out so identical requests give identical bodies.
+"""
+
+import math
+import time
+
+import numpy as np
+
+from timetable import timetable, format_clock, DWELL_MIN, MIN_TRANSFER_MIN, MINUTES_PER_DAY
+from transit_network import direction_between
+from segment_model import segment_times
+from determinism import DETERMINISTIC_MODE
+
+
+ETA_SAMPLES = 10000
+ETA_SAMPLES_MAX = 100000
+RUN_SIGMA = 0.12              # lognormal spread of a scheduled stop-to-stop run
+DWELL_SHAPE = 2.0             # gamma shape of the dwell at an intermediate stop (mean DWELL_MIN)
+LATENESS_SHAPE = 2.0          # gamma shape of a bus's departure delay at the boarding stop
+LATENESS_MEAN_MIN = 1.0
+Z_10_90 = 1.2816
+
+
+def percentiles(values, points=(50, 80, 95)):
+    """{"p50": .., "p80": .., "p95": ..} rounded to 0.1 minute"""
+    found = np.percentile(values, points)
+    return {f"p{p}": round(float(v), 1) for p, v in zip(points, found)}
+
+
+_RUN_SUMS = {}
+
+
+def _run_sums(pattern):
+    """Cumulative scheduled run minutes and squared run minutes per trip, from the first stop"""
+    sums = _RUN_SUMS.get(pattern.key)
+    if sums is None:
+        run = pattern.arrivals[:, 1:] - pattern.departures[:, :-1]
+        zero = np.zeros((len(run), 1))
+        sums = _RUN_SUMS[pattern.key] = (
+            np.hstack((zero, np.cumsum(run, axis=1))),
+            np.hstack((zero, np.cumsum(run ** 2, axis=1)))
+        )
+    return sums
+
+
+def _learned_columns(pattern, from_seq, to_seq, trip):
+    """Learned (median, sigma) per segment of one leg, None where untrained"""
+    learned = []
+    for seq in range(from_seq, to_seq):
+        minute = float(pattern.departures[trip, seq]) % MINUTES_PER_DAY
+        found = segment_times.segment(pattern.route_id, pattern.direction, seq, minute)
+        if found is None:
+            learned.append(None)
+        else:
+            p10, p50, p90, _ = found
+            learned.append((p50, max(math.log(p90 / p10) / (2 * Z_10_90), 0.01)))
+    return learned
+
+
+def sample_leg(rng, pattern, from_seq, to_seq, ready):
+    """
+    Board the first bus leaving from_seq after `ready` and ride to to_seq
+
+    Args:
+        rng: numpy Generator
+        pattern: timetable RoutePattern
+        from_seq, to_seq: Stop positions in travel order
+        ready: Minute each sample is at the stop (array, may run past midnight)
+
+    Returns:
+        (board, arrive, trip, learned_segments): board/arrive minutes and the
+        trip index caught, per sample
+    """
+    n = len(ready)
+    times, trips = pattern.columns[from_seq]
+    times = np.concatenate((times, times + MINUTES_PER_DAY))
+    trips = np.concatenate((trips, trips))
+    day = MINUTES_PER_DAY * np.floor(ready / MINUTES_PER_DAY)
+
+    lateness = rng.gamma(LATENESS_SHAPE, LATENESS_MEAN_MIN / LATENESS_SHAPE, n)
+    slot = np.minimum(np.searchsorted(times, ready - day - lateness, side="left"), len(times) - 1)
+    board = times[slot] + lateness + day
+    trip = trips[slot]
+
+    run_sum, run_sq = _run_sums(pattern)
+    mean = run_sum[trip, to_seq] - run_sum[trip, from_seq]
+    var = (run_sq[trip, to_seq] - run_sq[trip, from_seq]) * (math.exp(RUN_SIGMA ** 2) - 1)
+    dwells = to_seq - from_seq - 1   # stops passed through, each booked on the segment leaving it
+
+    learned = _learned_columns(pattern, from_seq, to_seq, int(np.median(trip)))
+    for j, found in enumerate(learned):
+        if found is not None:
+            # Learned stop-to-stop times already include the dwell
+            median, sigma = found
+            spread = math.exp(sigma ** 2)
+            run = pattern.arrivals[trip, from_seq + j + 1] - pattern.departures[trip, from_seq + j]
+            mean = mean - run + median * math.sqrt(spread)
+            var = var - run ** 2 * (math.exp(RUN_SIGMA ** 2) - 1) + median ** 2 * spread * (spread - 1)
+            dwells -= j > 0
+
+    # Sum of independent lognormal runs as one lognormal with the same mean and variance
+    s2 = np.log1p(var / mean ** 2)
+    ride = np.exp(np.log(mean) - s2 / 2 + np.sqrt(s2) * rng.standard_normal(n))
+    if dwells > 0:
+        # Sum of iid gamma dwells is gamma with the shapes added
+        ride += rng.gamma(DWELL_SHAPE * dwells, DWELL_MIN / DWELL_SHAPE, n)
+
+    return board, board + ride, trip, sum(found is not None for found in learned)
+
+
+def eta_model(learned, total):
+    """Model label by how many segments the trained table covered: learned, mixed or schedule"""
+    return "learned" if learned == total else "mixed" if learned else "schedule"
+
+
+def ride_distribution(route_id, from_station, to_station, ready_min, samples=ETA_SAMPLES, seed=None):
+    """
+    Sampled ride on one route (boarding wait excluded)
+
+    Returns:
+        {"ride": array of ride minutes, "wait": array, "segments", "learned_segments"}
+    """
+    direction = direction_between(route_id, from_station, to_station)
+    pattern = timetable.patterns[(route_id, direction)]
+    from_seq, to_seq = pattern.stop_index[from_station], pattern.stop_index[to_station]
+    rng = np.random.default_rng(seed)
+    ready = np.full(samples, float(ready_min))
+    board, arrive, _, learned = sample_leg(rng, pattern, from_seq, to_seq, ready)
+    return {
+        "ride": arrive - board,
+        "wait": board - ready,
+        "segments": to_seq - from_seq,
+        "learned_segments": learned
+    }
+
+
+def itinerary_distribution(plan, samples=ETA_SAMPLES, seed=None):
+    """
+    ETA distribution of a journey-planner itinerary
+
+    Each sample starts at the requested time and follows the itinerary's
+    routes and transfer stations, catching whichever bus it actually can.
+
+    Args:
+        plan: Itinerary from journey_planner.plan()
+        samples: Number of draws
+        seed: Seed for the random generator (None: fresh entropy)
+
+    Returns:
+        Percentiles of door-to-door minutes and arrival clock, per-leg wait
+        and ride percentiles, and how often each leg's planned trip is caught
+    """
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    legs = plan["legs"]
+    requested = legs[0]["depart_min"] - legs[0]["wait_minutes"]
+    ready = np.full(samples, float(requested))
+    described = []
+    learned_total = segments_total = 0
+
+    for i, leg in enumerate(legs):
+        direction = direction_between(leg["route_id"], leg["from_station"], leg["to_station"])
+        pattern = timetable.patterns[(leg["route_id"], direction)]
+        from_seq = pattern.stop_index[leg["from_station"]]
+        to_seq = pattern.stop_index[leg["to_station"]]
+        if i > 0:
+            ready = ready + MIN_TRANSFER_MIN
+        board, arrive, trip, learned = sample_leg(rng, pattern, from_seq, to_seq, ready)
+        planned_trip = int(leg["trip_id"].rsplit("-", 1)[1])
+        described.append({
+            "route_id": leg["route_id"],
+            "from_station": leg["from_station"],
+            "to_station": leg["to_station"],
+            "trip_id": leg["trip_id"],
+            "wait_minutes": percentiles(board - ready),
+            "ride_minutes": percentiles(arrive - board),
+            "planned_trip_share": round(float(np.mean(trip == planned_trip)), 3)
+        })
+        learned_total += learned
+        segments_total += to_seq - from_seq
+        ready = arrive
+
+    duration = ready - requested
+    arrival = np.percentile(ready, (50, 80, 95))
+    result = {
+        "origin": plan["origin"],
+        "destination": plan["destination"],
+        "requested": format_clock(requested),
+        "samples": samples,
+        "seed": seed,
+        "planned": {
+            "departs": plan["departs"],
+            "arrives": plan["arrives"],
+            "duration_minutes": round(plan["arrive_min"] - requested, 1)
+        },
+        "duration_minutes": {"mean": round(float(duration.mean()), 1), **percentiles(duration)},
+        "arrives": {f"p{p}": format_clock(v) for p, v in zip((50, 80, 95), arrival)},
+        "legs": described,
+        "model": eta_model(learned_total, segments_total)
+    }
+    if not DETERMINISTIC_MODE:
+        result["compute_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
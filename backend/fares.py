@@ -0,0 +1,156 @@
+"""
+💰 FARE ENGINE
+Single source of truth for Janmarg fares. Two policies share one interface:
+
+- linear: FARE_BASE_INR + FARE_PER_KM_INR × km (the configured model)
+- band:   distance slabs from FARE_BANDS_INR
+
+A station × station fare matrix over shortest network distance is built at
+startup, so a fare lookup is an array index. Chat answers, the journey
+planner and /api/fares all read from here.
+"""
+
+import os
+
+import numpy as np
+
+from janmarg_data import FARE_BASE_INR, FARE_PER_KM_INR, FARE_BANDS_INR
+from transit_network import ROUTES, STOP_CHAINAGE_KM, STATIONS
+
+
+FARE_POLICY = os.getenv("FARE_POLICY", "linear").strip().lower()
+
+
+class LinearFarePolicy:
+    """Base fare plus a per-km rate, rounded to the rupee"""
+    name = "linear"
+
+    def fares(self, distance_km):
+        km = np.asarray(distance_km, dtype=float)
+        return np.rint(FARE_BASE_INR + FARE_PER_KM_INR * km).astype(np.int32)
+
+    def describe(self):
+        return f"base ₹{FARE_BASE_INR} + ₹{FARE_PER_KM_INR}/km"
+
+
+class BandFarePolicy:
+    """Flat fare per distance slab"""
+    name = "band"
+
+    def __init__(self, bands=FARE_BANDS_INR):
+        self.limits = np.array([limit for limit, _ in bands if limit is not None], dtype=float)
+        self.amounts = np.array([amount for _, amount in bands], dtype=np.int32)
+
+    def fares(self, distance_km):
+        km = np.asarray(distance_km, dtype=float)
+        return self.amounts[np.searchsorted(self.limits, km, side="right")]
+
+    def describe(self):
+        parts = []
+        lower = 0
+        for limit, amount in FARE_BANDS_INR:
+            parts.append(f"{lower}-{limit} km ₹{amount}" if limit is not None else f">{lower} km ₹{amount}")
+            lower = limit
+        return "slabs " + ", ".join(parts)
+
+
+FARE_POLICIES = {
+    "linear": LinearFarePolicy(),
+    "band": BandFarePolicy()
+}
+
+
+def network_distance_matrix():
+    """Shortest in-vehicle km between every pair of stations (Floyd-Warshall)"""
+    index = {station: i for i, station in enumerate(STATIONS)}
+    n = len(STATIONS)
+    dist = np.full((n, n), np.inf)
+    np.fill_diagonal(dist, 0.0)
+    for route_id, route in ROUTES.items():
+        stops = route['stops']
+        chainage = STOP_CHAINAGE_KM[route_id]
+        for i in range(len(stops) - 1):
+            a, b = index[stops[i]], index[stops[i + 1]]
+            km = abs(chainage[i + 1] - chainage[i])
+            if km < dist[a, b]:
+                dist[a, b] = dist[b, a] = km
+    for k in range(n):
+        dist = np.minimum(dist, dist[:, k:k + 1] + dist[k:k + 1, :])
+    return dist
+
+
+class FareEngine:
+    """Fare policy plus the precomputed station × station fare matrix"""
+
+    def __init__(self, policy=FARE_POLICY):
+        if policy not in FARE_POLICIES:
+            raise ValueError(f"Unknown fare policy '{policy}' (expected one of {sorted(FARE_POLICIES)})")
+        self.policy = FARE_POLICIES[policy]
+        self.stations = list(STATIONS)
+        self.station_index = {station: i for i, station in enumerate(self.stations)}
+        self.distance_km = network_distance_matrix()
+        self.fare_matrix = self.policy.fares(self.distance_km)
+        np.fill_diagonal(self.fare_matrix, 0)
+
+    def fare(self, distance_km):
+        """Fare in INR for one ticket covering distance_km"""
+        return int(self.policy.fares(distance_km))
+
+    def lookup(self, origin, destination):
+        """
+        Fare between two canonical station names
+
+        Returns:
+            Dict with distance_km, fare_inr and policy, or None if unknown
+        """
+        i = self.station_index.get(origin)
+        j = self.station_index.get(destination)
+        if i is None or j is None:
+            return None
+        return {
+            "origin": origin,
+            "destination": destination,
+            "distance_km": round(float(self.distance_km[i, j]), 2),
+            "fare_inr": int(self.fare_matrix[i, j]),
+            "policy": self.policy.name
+        }
+
+    def matrix(self):
+        """Full matrix as plain lists (stations, fares, distances)"""
+        return {
+            "policy": self.policy.name,
+            "stations": self.stations,
+            "fare_inr": self.fare_matrix.tolist(),
+            "distance_km": np.round(self.distance_km, 2).tolist()
+        }
+
+    def answer(self, distance_km=None, origin=None, destination=None):
+        """
+        Chat-ready fare sentence
+
+        Uses the station matrix when both stations are known, otherwise the
+        given distance; without either explains the policy.
+        """
+        quote = self.lookup(origin, destination) if origin and destination else None
+        if quote:
+            return (
+                f"Estimated fare from {origin} to {destination}: ₹{quote['fare_inr']} "
+                f"({quote['distance_km']:.1f} km; {self.policy.describe()})."
+            )
+        if distance_km is not None:
+            return (
+                f"Estimated fare: ₹{self.fare(distance_km)} "
+                f"for {float(distance_km):.1f} km ({self.policy.describe()})."
+            )
+        return (
+            f"Janmarg fares follow {self.policy.describe()}. "
+            "Select your origin and destination to get the exact fare."
+        )
+
+    def context_line(self):
+        """One-line fare policy summary for LLM prompts"""
+        return f"FARE POLICY ({self.policy.name}): {self.policy.describe()}."
+
+
+# Build fare matrix at import (startup)
+fare_engine = FareEngine()
@@ -0,0 +1,303 @@
+"""
+🚌 FLEET SIMULATOR
+In-process discrete-event model of every bus in service. Trips are dispatched
+from the timetable's terminal departures (i.e. at the configured headways) and
+all vehicle states - chainage, next stop, dwell countdown and load - live in
+numpy arrays that advance together on a fixed tick.
+
+Readers never drive the model themselves: snapshot() catches the clock up by
+whole ticks under a lock and hands back an immutable FleetSnapshot, so any
+number of pollers within one tick share a single simulation step. In
+deterministic mode every new tick re-seeds from the timetable, so a snapshot
+depends only on its time and not on which ticks were polled before it.
+"""
+
+import os
+import threading
+from datetime import timedelta
+
+import numpy as np
+
+from janmarg_data import COMMERCIAL_SPEED_KMH, BUS_CAPACITY_STD
+from prediction_tables import PREDICTION_SEED
+from determinism import clock, DETERMINISTIC_MODE
+from timetable import timetable, minute_of_day, MINUTES_PER_DAY, DWELL_MIN
+from service_profile import service_profile
+from passenger_load import passenger_load
+from transit_network import ROUTES, TRACE_CHAINAGE_KM, STOP_CHAINAGE_KM, DIRECTION_LABELS
+
+
+FLEET_TICK_SEC = float(os.getenv("FLEET_TICK_SEC", "5"))
+FLEET_MAX_CATCHUP_SEC = 600   # longer gaps re-seed from the timetable instead of replaying ticks
+VEHICLE_SPEED_SPREAD = 0.05   # ±5% per-vehicle running speed
+
+
+def bus_id_for(pattern, trip_index):
+    return f"BUS-{pattern.trip_id(trip_index)}"
+
+
+class FleetSnapshot:
+    """Read-only view of the fleet at one tick"""
+
+    def __init__(self, moment, sim, pattern, trip, km, next_seq, dwell_left, speed, load):
+        self.timestamp = moment
+        self._sim = sim
+        self.pattern = pattern
+        self.trip = trip
+        self.km = km
+        self.next_seq = next_seq
+        self.dwell_left = dwell_left
+        self.speed_kmh = speed
+        self.load = load
+        self.bus_ids = [bus_id_for(sim.patterns[p], k) for p, k in zip(pattern.tolist(), trip.tolist())]
+        self.index = {bus_id: i for i, bus_id in enumerate(self.bus_ids)}
+        self.lat, self.lng = sim.positions(pattern, km)
+
+    def __len__(self):
+        return len(self.bus_ids)
+
+    def vehicle(self, i):
+        sim = self._sim
+        p = int(self.pattern[i])
+        pattern = sim.patterns[p]
+        seq = int(self.next_seq[i])
+        dwelling = self.dwell_left[i] > 0
+        total_km = float(pattern.chainage_km[-1]) or 1.0
+        return {
+            "bus_id": self.bus_ids[i],
+            "route_id": pattern.route_id,
+            "direction": DIRECTION_LABELS[pattern.direction],
+            "headsign": pattern.headsign,
+            "trip_id": pattern.trip_id(int(self.trip[i])),
+            "location": [round(float(self.lat[i]), 6), round(float(self.lng[i]), 6)],
+            "speed_kmh": 0.0 if dwelling else round(float(self.speed_kmh[i]), 1),
+            "last_station": pattern.stops[seq - 1],
+            "next_station": pattern.stops[seq] if seq < len(pattern.stops) else None,
+            "at_stop": bool(dwelling),
+            "progress_percent": round(float(self.km[i]) / total_km * 100, 1),
+            "occupancy_percent": round(float(self.load[i]) / BUS_CAPACITY_STD * 100),
+            "source": "simulator",
+            "timestamp": self.timestamp.isoformat()
+        }
+
+    def vehicles(self, route_id=None):
+        return [
+            self.vehicle(i) for i in range(len(self))
+            if route_id is None or self._sim.patterns[int(self.pattern[i])].route_id == route_id
+        ]
+
+    def find(self, bus_id):
+        i = self.index.get(bus_id)
+        return None if i is None else self.vehicle(i)
+
+    def approaching(self, station, route_id=None):
+        """
+        Buses that will still call at station, soonest first
+
+        Returns:
+            List of (eta_minutes, vehicle_index)
+        """
+        sim = self._sim
+        seq = sim.station_seq(station)[self.pattern]
+        dwelling = self.dwell_left > 0
+        calling = (seq >= self.next_seq) | (dwelling & (seq == self.next_seq - 1))
+        if route_id is not None:
+            calling &= sim.pattern_route[self.pattern] == route_id
+        idx = np.flatnonzero(calling & (seq >= 0))
+        if len(idx) == 0:
+            return []
+        p, s = self.pattern[idx], seq[idx]
+        remaining_km = np.maximum(sim.stop_km[p, s] - self.km[idx], 0.0)
+        stops_between = np.maximum(s - self.next_seq[idx], 0)
+        eta = self.dwell_left[idx] / 60 + remaining_km / self.speed_kmh[idx] * 60 + stops_between * DWELL_MIN
+        eta = np.where(s == self.next_seq[idx] - 1, 0.0, eta)
+        order = np.argsort(eta, kind="stable")
+        return list(zip(eta[order].tolist(), idx[order].tolist()))
+
+
+class FleetSimulator:
+    """Vectorised per-tick model of all buses in service"""
+
+    def __init__(self, source=timetable, tick_sec=FLEET_TICK_SEC, seed=PREDICTION_SEED):
+        self.patterns = list(source.patterns.values())
+        self.tick_sec = tick_sec
+        self.seed = seed
+        n_patterns = len(self.patterns)
+        width = max(len(p.stops) for p in self.patterns)
+        self.n_stops = np.array([len(p.stops) for p in self.patterns])
+        self.stop_km = np.full((n_patterns, width + 1), np.inf)
+        for i, pattern in enumerate(self.patterns):
+            self.stop_km[i, :len(pattern.stops)] = pattern.chainage_km
+        self.pattern_route = np.array([p.route_id for p in self.patterns])
+        self.dispatch = [p.departures[:, 0] for p in self.patterns]
+
+        # Per-minute traffic factor and dwell of each pattern's route
+        profiles = [service_profile.table(p.route_id) for p in self.patterns]
+        self.minute_traffic = np.vstack([profile.traffic_factor for profile in profiles])
+        self.minute_dwell = np.vstack([profile.dwell_sec for profile in profiles])
+        # Per-trip spread in speed, fixed by the seed
+        rng = np.random.default_rng(seed)
+        n_trips = max(len(d) for d in self.dispatch)
+        self.trip_speed = 1 + VEHICLE_SPEED_SPREAD * rng.uniform(-1, 1, size=(n_patterns, n_trips))
+        # Load leaving each stop, per pattern and trip, from the passenger load model
+        self.trip_load = np.zeros((n_patterns, n_trips, width))
+        for i, pattern in enumerate(self.patterns):
+            load = np.minimum(passenger_load.load[pattern.key], BUS_CAPACITY_STD)
+            self.trip_load[i, :load.shape[0], :load.shape[1]] = load
+
+        self._station_seq = {}
+        self._lock = threading.Lock()
+        self._time = None
+        self._snapshot = None
+        self._empty()
+
+    def _empty(self):
+        self.v_pattern = np.zeros(0, dtype=np.intp)
+        self.v_trip = np.zeros(0, dtype=np.intp)
+        self.v_km = np.zeros(0)
+        self.v_next = np.zeros(0, dtype=np.intp)
+        self.v_dwell = np.zeros(0)
+        self.v_load = np.zeros(0)
+        self._next_dispatch = [0] * len(self.patterns)
+
+    def station_seq(self, station):
+        """Stop sequence of station in each pattern (-1 where not served)"""
+        seq = self._station_seq.get(station)
+        if seq is None:
+            seq = self._station_seq[station] = np.array(
+                [p.stop_index.get(station, -1) for p in self.patterns], dtype=np.intp
+            )
+        return seq
+
+    def positions(self, pattern, km):
+        """Lat/lng arrays for vehicles at km along their pattern"""
+        lat = np.empty(len(km))
+        lng = np.empty(len(km))
+        for p in np.unique(pattern).tolist():
+            rows = pattern == p
+            route = self.patterns[p].route_id
+            stops_km = STOP_CHAINAGE_KM[route]
+            chain = stops_km[0] + km[rows] if self.patterns[p].direction == 0 else stops_km[-1] - km[rows]
+            trace = np.asarray(ROUTES[route]['trace'], dtype=float)
+            lat[rows] = np.interp(chain, TRACE_CHAINAGE_KM[route], trace[:, 0])
+            lng[rows] = np.interp(chain, TRACE_CHAINAGE_KM[route], trace[:, 1])
+        return lat, lng
+
+    def _speed(self, minute):
+        factor = self.minute_traffic[self.v_pattern, int(minute) % MINUTES_PER_DAY]
+        return COMMERCIAL_SPEED_KMH / factor * self.trip_speed[self.v_pattern, self.v_trip]
+
+    def _current_load(self):
+        """On board since the last stop each vehicle left (or is dwelling at)"""
+        return self.trip_load[self.v_pattern, self.v_trip, self.v_next - 1]
+
+    def _seed_from_timetable(self, minute):
+        """Place every trip running at `minute` where the timetable has it"""
+        self._empty()
+        rows = {name: [] for name in ("pattern", "trip", "km", "next", "dwell")}
+        for p, pattern in enumerate(self.patterns):
+            arrivals, departures = pattern.arrivals, pattern.departures
+            for m in (minute, minute + MINUTES_PER_DAY):
+                running = np.flatnonzero((departures[:, 0] <= m) & (arrivals[:, -1] > m))
+                for k in running.tolist():
+                    times = np.ravel(np.column_stack((arrivals[k], departures[k])))
+                    km = np.repeat(pattern.chainage_km, 2)
+                    next_seq = int(np.searchsorted(arrivals[k], m, side="right"))
+                    rows["pattern"].append(p)
+                    rows["trip"].append(k)
+                    rows["km"].append(float(np.interp(m, times, km)))
+                    rows["next"].append(next_seq)
+                    rows["dwell"].append(max(0.0, (departures[k, next_seq - 1] - m) * 60) if next_seq > 1 else 0.0)
+            self._next_dispatch[p] = int(np.searchsorted(self.dispatch[p], minute, side="right"))
+
+        self.v_pattern = np.array(rows["pattern"], dtype=np.intp)
+        self.v_trip = np.array(rows["trip"], dtype=np.intp)
+        self.v_km = np.array(rows["km"], dtype=float)
+        self.v_next = np.array(rows["next"], dtype=np.intp)
+        self.v_dwell = np.array(rows["dwell"], dtype=float)
+        self.v_load = self._current_load()
+
+    def _dispatch(self, minute):
+        new_pattern, new_trip = [], []
+        for p, times in enumerate(self.dispatch):
+            start = self._next_dispatch[p]
+            end = int(np.searchsorted(times, minute, side="right"))
+            if end > start:
+                new_pattern.extend([p] * (end - start))
+                new_trip.extend(range(start, end))
+                self._next_dispatch[p] = end
+        if not new_pattern:
+            return
+        count = len(new_pattern)
+        self.v_pattern = np.concatenate((self.v_pattern, new_pattern)).astype(np.intp)
+        self.v_trip = np.concatenate((self.v_trip, new_trip)).astype(np.intp)
+        self.v_km = np.concatenate((self.v_km, np.zeros(count)))
+        self.v_next = np.concatenate((self.v_next, np.ones(count, dtype=np.intp)))
+        self.v_dwell = np.concatenate((self.v_dwell, np.zeros(count)))
+        self.v_load = np.concatenate((self.v_load, self.trip_load[new_pattern, new_trip, 0]))
+
+    def _step(self, minute):
+        """Advance every vehicle by one tick ending at `minute`"""
+        dt = self.tick_sec
+        dwelling = self.v_dwell > 0
+        self.v_dwell = np.maximum(self.v_dwell - dt, 0.0)
+
+        target = self.stop_km[self.v_pattern, self.v_next]
+        moved = self.v_km + self._speed(minute) * dt / 3600
+        arrived = ~dwelling & (moved >= target)
+        self.v_km = np.where(dwelling, self.v_km, np.minimum(moved, target))
+        self.v_next = self.v_next + arrived
+        terminal = self.v_next >= self.n_stops[self.v_pattern]
+        dwell = self.minute_dwell[self.v_pattern, int(minute) % MINUTES_PER_DAY]
+        self.v_dwell = np.where(arrived & ~terminal, dwell, self.v_dwell)
+        self.v_load = np.where(arrived & ~terminal, self._current_load(), self.v_load)
+
+        keep = ~terminal
+        if not keep.all():
+            for name in ("v_pattern", "v_trip", "v_km", "v_next", "v_dwell", "v_load"):
+                setattr(self, name, getattr(self, name)[keep])
+
+        if minute < self._last_minute:
+            # Midnight: a new service day starts dispatching from the top
+            self._next_dispatch = [0] * len(self.patterns)
+        self._last_minute = minute
+        self._dispatch(minute)
+
+    def _align(self, moment):
+        midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        ticks = int((moment - midnight).total_seconds() // self.tick_sec)
+        return midnight + timedelta(seconds=ticks * self.tick_sec)
+
+    def snapshot(self, now=None):
+        """
+        Fleet state at the latest whole tick not after `now`
+
+        Args:
+            now: Optional datetime (defaults to the server clock)
+
+        Returns:
+            FleetSnapshot shared by every caller within the same tick
+        """
+        moment = self._align(now or clock())
+        with self._lock:
+            if self._time == moment and self._snapshot is not None:
+                return self._snapshot
+            gap = (moment - self._time).total_seconds() if self._time else None
+            if DETERMINISTIC_MODE or gap is None or gap < 0 or gap > FLEET_MAX_CATCHUP_SEC:
+                self._seed_from_timetable(minute_of_day(moment))
+                self._last_minute = minute_of_day(moment)
+                self._time = moment
+            else:
+                step = timedelta(seconds=self.tick_sec)
+                while self._time < moment:
+                    self._time += step
+                    self._step(minute_of_day(self._time))
+            self._snapshot = FleetSnapshot(
+                self._time, self, self.v_pattern.copy(), self.v_trip.copy(), self.v_km.copy(),
+                self.v_next.copy(), self.v_dwell.copy(), self._speed(minute_of_day(self._time)),
+                self.v_load.copy()
+            )
+            return self._snapshot
+
+
+fleet = FleetSimulator()
@@ -0,0 +1,212 @@
+"""
+📣 FLEET PUSH CHANNEL
+One producer loop per process turns the fleet (live AVL fixes over the
+simulator) into per-tick diffs and fans them out to every subscriber, over
+Server-Sent Events or WebSocket.
+
+Per tick the work is done once: the fleet snapshot, each bus's JSON
+fragment, which buses changed, and the ETA list of every subscribed station.
+A subscriber only costs a set intersection and a string join. Slow consumers
+never block the loop: when a subscriber's queue is full its diff is dropped
+and it gets a full snapshot on the next tick instead.
+"""
+
+import asyncio
+import json
+import time
+
+from fleet_simulator import fleet
+from vehicle_tracks import vehicle_tracks
+from transit_network import ROUTES
+
+
+STREAM_QUEUE_MAX = 8      # pending messages per subscriber before it is resynced
+STATION_ETA_LIMIT = 3     # buses listed per subscribed station
+
+
+def _bus_state(bus):
+    return {
+        "bus_id": bus["bus_id"],
+        "route_id": bus["route_id"],
+        "direction": bus.get("direction"),
+        "location": [round(bus["location"][0], 5), round(bus["location"][1], 5)],
+        "speed_kmh": bus.get("speed_kmh"),
+        "next_station": bus.get("next_station"),
+        "occupancy_percent": bus.get("occupancy_percent"),
+        "source": bus.get("source")
+    }
+
+
+def parse_bbox(value):
+    """'min_lat,min_lng,max_lat,max_lng' -> tuple of floats (ValueError if malformed)"""
+    parts = [float(part) for part in value.split(",")]
+    if len(parts) != 4 or parts[0] > parts[2] or parts[1] > parts[3]:
+        raise ValueError("bbox must be min_lat,min_lng,max_lat,max_lng")
+    return tuple(parts)
+
+
+class Subscription:
+    """What one client wants: route ids, station names and/or a bounding box"""
+
+    def __init__(self, routes=None, stations=None, bbox=None):
+        self.routes = set(routes or [])
+        self.stations = set(stations or [])
+        self.bbox = bbox
+        self.queue = asyncio.Queue(maxsize=STREAM_QUEUE_MAX)
+        self.visible = set()
+        self.resync = True
+
+    @property
+    def everything(self):
+        return not (self.routes or self.stations or self.bbox)
+
+    def wants(self, state, station_buses):
+        if self.everything or state["route_id"] in self.routes or state["bus_id"] in station_buses:
+            return True
+        if self.bbox:
+            lat, lng = state["location"]
+            return self.bbox[0] <= lat <= self.bbox[2] and self.bbox[1] <= lng <= self.bbox[3]
+        return False
+
+    def update(self, routes=None, stations=None, bbox=None):
+        self.routes = set(routes or [])
+        self.stations = set(stations or [])
+        self.bbox = bbox
+        self.resync = True
+
+
+class FleetBroadcaster:
+    """Single tick loop shared by every push subscriber"""
+
+    def __init__(self, tick_sec=None):
+        self.tick_sec = tick_sec or fleet.tick_sec
+        self.subscribers = set()
+        self.fragments = {}
+        self.states = {}
+        self.etas = {}
+        self.timestamp = None
+        self.ticks = 0
+        self._task = None
+
+    def subscribe(self, subscription):
+        self.subscribers.add(subscription)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        else:
+            # Newcomers get a snapshot straight away instead of waiting a tick
+            self._deliver(subscription, set(), set())
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+    async def _run(self):
+        while self.subscribers:
+            started = time.perf_counter()
+            self.tick()
+            await asyncio.sleep(max(0.0, self.tick_sec - (time.perf_counter() - started)))
+
+    def _fleet(self):
+        snapshot = fleet.snapshot()
+        buses = {bus["bus_id"]: bus for bus in snapshot.vehicles()}
+        for bus in vehicle_tracks.live_vehicles():
+            buses[bus["bus_id"]] = bus
+        return snapshot, buses
+
+    def _station_etas(self, snapshot, stations):
+        etas = {}
+        for station in stations:
+            found = [(eta, bus["bus_id"], bus["route_id"]) for eta, bus in vehicle_tracks.approaching(station)]
+            seen = {bus_id for _, bus_id, _ in found}
+            for eta, i in snapshot.approaching(station)[:STATION_ETA_LIMIT]:
+                if snapshot.bus_ids[i] not in seen:
+                    found.append((eta, snapshot.bus_ids[i], self._route_of(snapshot, i)))
+            found.sort()
+            etas[station] = [
+                {"bus_id": bus_id, "route_id": route_id, "eta_minutes": round(eta, 1)}
+                for eta, bus_id, route_id in found[:STATION_ETA_LIMIT]
+            ]
+        return etas
+
+    @staticmethod
+    def _route_of(snapshot, i):
+        return fleet.patterns[int(snapshot.pattern[i])].route_id
+
+    def tick(self):
+        """Advance one tick: compute the fleet diff once and queue it for every subscriber"""
+        snapshot, buses = self._fleet()
+        states = {bus_id: _bus_state(bus) for bus_id, bus in buses.items()}
+        changed = {bus_id for bus_id, state in states.items() if self.states.get(bus_id) != state}
+        for bus_id in changed:
+            self.fragments[bus_id] = json.dumps(states[bus_id], ensure_ascii=False, separators=(",", ":"))
+        for bus_id in set(self.fragments) - set(states):
+            del self.fragments[bus_id]
+
+        stations = set().union(*(s.stations for s in self.subscribers)) if self.subscribers else set()
+        etas = self._station_etas(snapshot, stations)
+        changed_stations = {station for station, rows in etas.items() if self.etas.get(station) != rows}
+
+        self.states, self.etas = states, etas
+        self.timestamp = snapshot.timestamp.isoformat()
+        self.ticks += 1
+        for subscription in list(self.subscribers):
+            self._deliver(subscription, changed, changed_stations)
+
+    def _deliver(self, subscription, changed, changed_stations):
+        if self.timestamp is None:
+            return
+        station_buses = {
+            row["bus_id"] for station in subscription.stations for row in self.etas.get(station, [])
+        }
+        visible = {bus_id for bus_id, state in self.states.items() if subscription.wants(state, station_buses)}
+
+        if subscription.resync:
+            kind, updated, removed = "snapshot", visible, set()
+            stations = subscription.stations
+        else:
+            kind = "diff"
+            updated = (visible & changed) | (visible - subscription.visible)
+            removed = subscription.visible - visible
+            stations = subscription.stations & changed_stations
+            if not (updated or removed or stations):
+                return
+
+        message = (
+            f'{{"type":"{kind}","timestamp":"{self.timestamp}",'
+            f'"updated":[{",".join(self.fragments[bus_id] for bus_id in sorted(updated))}],'
+            f'"removed":{json.dumps(sorted(removed))},'
+            f'"etas":{json.dumps({s: self.etas.get(s, []) for s in sorted(stations)}, ensure_ascii=False)}}}'
+        )
+        try:
+            subscription.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            subscription.resync = True
+            return
+        subscription.visible = visible
+        subscription.resync = False
+
+
+def validate_subscription(routes=None, stations=None, bbox=None, canonical=None):
+    """
+    Check and normalise subscription filters
+
+    Returns:
+        (routes, stations, bbox); raises ValueError naming the bad value
+    """
+    routes = [r for r in (routes or []) if r]
+    for route_id in routes:
+        if route_id not in ROUTES:
+            raise ValueError(f"Route {route_id} not found")
+    names = []
+    for station in stations or []:
+        name = canonical(station) if canonical else station
+        if not name:
+            raise ValueError(f"Station '{station}' not found")
+        names.append(name)
+    if isinstance(bbox, str):
+        bbox = parse_bbox(bbox)
+    elif bbox is not None:
+        bbox = parse_bbox(",".join(str(v) for v in bbox))
+    return routes, names, bbox
+
+
+broadcaster = FleetBroadcaster()
@@ -0,0 +1,166 @@
+"""
+📡 GTFS-REALTIME VEHICLE POSITIONS (WIRE FORMAT)
+Just enough of the protobuf wire format to read and write the VehiclePosition
+subset of a GTFS-Realtime FeedMessage, so AVL feeds can be ingested without a
+protobuf runtime dependency.
+
+Fields handled (numbers from gtfs-realtime.proto):
+    FeedMessage.entity (2) -> FeedEntity.id (1), FeedEntity.vehicle (4)
+    VehiclePosition.trip (1) -> TripDescriptor.trip_id (1), route_id (5), direction_id (6)
+    VehiclePosition.position (2) -> Position.latitude (1), longitude (2), bearing (3), speed m/s (5)
+    VehiclePosition.timestamp (5), VehiclePosition.vehicle (8) -> VehicleDescriptor.id (1)
+Everything else is skipped.
+"""
+
+import struct
+
+
+VARINT, FIXED64, LENGTH, FIXED32 = 0, 1, 2, 5
+
+
+def _varint(data, i):
+    shift = result = 0
+    while True:
+        byte = data[i]
+        i += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, i
+        shift += 7
+
+
+def _fields(data):
+    """Yield (field_number, wire_type, value) for one message"""
+    i, end = 0, len(data)
+    while i < end:
+        key, i = _varint(data, i)
+        number, wire = key >> 3, key & 7
+        if wire == VARINT:
+            value, i = _varint(data, i)
+        elif wire == LENGTH:
+            size, i = _varint(data, i)
+            value = data[i:i + size]
+            i += size
+        elif wire == FIXED32:
+            value = data[i:i + 4]
+            i += 4
+        elif wire == FIXED64:
+            value = data[i:i + 8]
+            i += 8
+        else:
+            raise ValueError(f"unsupported protobuf wire type {wire}")
+        yield number, wire, value
+
+
+def _float(raw):
+    return struct.unpack("<f", raw)[0]
+
+
+def _vehicle_position(data):
+    ping = {}
+    for number, wire, value in _fields(data):
+        if number == 1 and wire == LENGTH:
+            for n, w, v in _fields(value):
+                if n == 1 and w == LENGTH:
+                    ping["trip_id"] = bytes(v).decode("utf-8")
+                elif n == 5 and w == LENGTH:
+                    ping["route_id"] = bytes(v).decode("utf-8")
+                elif n == 6 and w == VARINT:
+                    ping["direction"] = v
+        elif number == 2 and wire == LENGTH:
+            for n, w, v in _fields(value):
+                if w != FIXED32:
+                    continue
+                if n == 1:
+                    ping["lat"] = _float(v)
+                elif n == 2:
+                    ping["lng"] = _float(v)
+                elif n == 5:
+                    ping["speed_kmh"] = _float(v) * 3.6
+        elif number == 5 and wire == VARINT:
+            ping["timestamp"] = float(value)
+        elif number == 8 and wire == LENGTH:
+            for n, w, v in _fields(value):
+                if n == 1 and w == LENGTH:
+                    ping["vehicle_id"] = bytes(v).decode("utf-8")
+    return ping
+
+
+def decode_vehicle_positions(data):
+    """
+    Vehicle pings from a serialized FeedMessage
+
+    Returns:
+        List of dicts with vehicle_id, route_id, lat, lng, timestamp and,
+        when present, direction, trip_id and speed_kmh
+    """
+    data = memoryview(data)
+    pings = []
+    for number, wire, entity in _fields(data):
+        if number != 2 or wire != LENGTH:
+            continue
+        entity_id = None
+        ping = None
+        for n, w, v in _fields(entity):
+            if n == 1 and w == LENGTH:
+                entity_id = bytes(v).decode("utf-8")
+            elif n == 4 and w == LENGTH:
+                ping = _vehicle_position(v)
+        if ping is None or "lat" not in ping or "lng" not in ping:
+            continue
+        ping.setdefault("vehicle_id", entity_id)
+        pings.append(ping)
+    return pings
+
+
+def _key(number, wire):
+    return _encode_varint(number << 3 | wire)
+
+
+def _encode_varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _length(number, payload):
+    return _key(number, LENGTH) + _encode_varint(len(payload)) + payload
+
+
+def _string(number, text):
+    return _length(number, text.encode("utf-8"))
+
+
+def _fixed_float(number, value):
+    return _key(number, FIXED32) + struct.pack("<f", value)
+
+
+def encode_vehicle_positions(pings, timestamp=None):
+    """Serialize pings (same dict shape as decode_vehicle_positions) as a FeedMessage"""
+    header = _string(1, "2.0")
+    if timestamp is not None:
+        header += _key(3, VARINT) + _encode_varint(int(timestamp))
+    out = [_length(1, header)]
+    for ping in pings:
+        trip = b""
+        if ping.get("trip_id"):
+            trip += _string(1, ping["trip_id"])
+        if ping.get("route_id"):
+            trip += _string(5, str(ping["route_id"]))
+        if ping.get("direction") is not None:
+            trip += _key(6, VARINT) + _encode_varint(int(ping["direction"]))
+        position = _fixed_float(1, ping["lat"]) + _fixed_float(2, ping["lng"])
+        if ping.get("speed_kmh") is not None:
+            position += _fixed_float(5, ping["speed_kmh"] / 3.6)
+        vehicle = _length(1, trip) + _length(2, position)
+        if ping.get("timestamp") is not None:
+            vehicle += _key(5, VARINT) + _encode_varint(int(ping["timestamp"]))
+        vehicle += _length(8, _string(1, ping["vehicle_id"]))
+        out.append(_length(2, _string(1, ping["vehicle_id"]) + _length(4, vehicle)))
+    return b"".join(out)
@@ -0,0 +1,188 @@
+"""
+🚦 HEADWAY REGULARITY MONITOR
+Streaming stage behind AVL ingestion. Each batch's newest fix per vehicle is
+checked for stops crossed since that vehicle's previous fix (a vectorised
+searchsorted per route); every crossing is a station passage. The gap to the
+previous bus through the same stop in the same direction is the actual
+headway, compared with the scheduled one.
+
+Per ping the work is O(1) amortised: each bus crosses each stop once, and
+per-route metrics are running sums over a fixed window of recent headways.
+"""
+
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from service_profile import service_profile, local_minute
+from transit_network import DIRECTION_LABELS
+
+
+BUNCHING_RATIO = float(os.getenv("HEADWAY_BUNCHING_RATIO", "0.5"))  # below this share of scheduled: bunched
+GAP_RATIO = float(os.getenv("HEADWAY_GAP_RATIO", "1.5"))            # above this share of scheduled: gap
+HEADWAY_WINDOW = 50         # recent headways per route/direction in the metrics
+ALERT_HISTORY = 200
+MAX_PASSAGE_GAP_MIN = 60    # longer gaps between buses are a service break, not a headway
+MAX_TRACK_GAP_SEC = 600     # fixes further apart than this do not interpolate passages
+
+
+class _RouteWindow:
+    """Running sums over the last HEADWAY_WINDOW headways of one route/direction"""
+
+    def __init__(self):
+        self.items = deque()
+        self.n = 0
+        self.sum_h = self.sum_h2 = self.sum_s = self.sum_s2 = 0.0
+        self.bunched = self.gaps = self.regular = 0
+
+    def push(self, headway, scheduled, kind):
+        item = (headway, scheduled, kind)
+        self.items.append(item)
+        self._apply(item, 1)
+        if len(self.items) > HEADWAY_WINDOW:
+            self._apply(self.items.popleft(), -1)
+
+    def _apply(self, item, sign):
+        headway, scheduled, kind = item
+        self.n += sign
+        self.sum_h += sign * headway
+        self.sum_h2 += sign * headway * headway
+        self.sum_s += sign * scheduled
+        self.sum_s2 += sign * scheduled * scheduled
+        if kind == "bunching":
+            self.bunched += sign
+        elif kind == "gap":
+            self.gaps += sign
+        else:
+            self.regular += sign
+
+    def metrics(self):
+        if self.n == 0:
+            return {"headways_observed": 0}
+        mean = self.sum_h / self.n
+        variance = max(0.0, self.sum_h2 / self.n - mean * mean)
+        # Excess wait: average wait of a randomly arriving rider beyond what the schedule promises
+        excess_wait = self.sum_h2 / (2 * self.sum_h) - self.sum_s2 / (2 * self.sum_s) if self.sum_h > 0 else 0.0
+        return {
+            "headways_observed": self.n,
+            "mean_headway_min": round(mean, 2),
+            "scheduled_headway_min": round(self.sum_s / self.n, 2),
+            "headway_cv": round(variance ** 0.5 / mean, 3) if mean > 0 else None,
+            "excess_wait_min": round(excess_wait, 2),
+            "regular_share": round(self.regular / self.n, 3),
+            "bunching_events": self.bunched,
+            "gap_events": self.gaps
+        }
+
+
+class HeadwayMonitor:
+    """Station passages, actual headways, bunching/gap alerts and regularity metrics"""
+
+    def __init__(self, route_ids, route_stops, capacity):
+        self.route_ids = list(route_ids)
+        self.stop_names = [[stop for stop, _ in route_stops[r]] for r in self.route_ids]
+        self.stop_km = [np.array([km for _, km in route_stops[r]]) for r in self.route_ids]
+        self._allocate(capacity)
+        self.last_passage = {}   # (route, direction, stop_seq) -> (minute_ts, vehicle_id)
+        self.windows = {}        # (route_id, direction) -> _RouteWindow
+        self.alerts = deque(maxlen=ALERT_HISTORY)
+        self.passages = 0
+
+    def _allocate(self, capacity):
+        self.last_km = np.zeros(capacity)
+        self.last_ts = np.zeros(capacity)
+        self.seen = np.zeros(capacity, dtype=bool)
+
+    def resize(self, capacity):
+        size = len(self.last_km)
+        old = (self.last_km, self.last_ts, self.seen)
+        self._allocate(capacity)
+        self.last_km[:size], self.last_ts[:size], self.seen[:size] = old
+
+    def observe(self, slots, ts, km, routes, directions, vehicle_ids):
+        """
+        Newest fix of each touched vehicle (distinct slots)
+
+        Args:
+            slots: Vehicle slot indices
+            ts: Fix times, epoch seconds
+            km: Chainage along the route trace
+            routes: Route index per slot (into route_ids)
+            directions: 0/1, or -1 while unknown
+            vehicle_ids: Slot -> vehicle id list
+        """
+        prev_km, prev_ts = self.last_km[slots], self.last_ts[slots]
+        usable = self.seen[slots] & (directions >= 0) & (ts > prev_ts) & (ts - prev_ts <= MAX_TRACK_GAP_SEC)
+        self.last_km[slots] = km
+        self.last_ts[slots] = ts
+        self.seen[slots] = True
+
+        for r in np.unique(routes[usable]).tolist():
+            rows = np.flatnonzero(usable & (routes == r))
+            stops = self.stop_km[r]
+            forward = directions[rows] == 0
+            lo = np.where(forward, np.searchsorted(stops, prev_km[rows], side="right"),
+                          np.searchsorted(stops, km[rows], side="left"))
+            hi = np.where(forward, np.searchsorted(stops, km[rows], side="right"),
+                          np.searchsorted(stops, prev_km[rows], side="left"))
+            for i in np.flatnonzero(hi > lo).tolist():
+                row = rows[i]
+                for seq in range(int(lo[i]), int(hi[i])):
+                    span = km[row] - prev_km[row]
+                    share = (stops[seq] - prev_km[row]) / span if span else 1.0
+                    passed = prev_ts[row] + share * (ts[row] - prev_ts[row])
+                    self._passage(r, int(directions[row]), seq, passed, vehicle_ids[slots[row]])
+
+    def _passage(self, r, direction, seq, passed_ts, vehicle_id):
+        self.passages += 1
+        key = (r, direction, seq)
+        previous = self.last_passage.get(key)
+        self.last_passage[key] = (passed_ts, vehicle_id)
+        if previous is None or previous[1] == vehicle_id:
+            return
+        headway = (passed_ts - previous[0]) / 60
+        if headway <= 0 or headway > MAX_PASSAGE_GAP_MIN:
+            return
+
+        route_id = self.route_ids[r]
+        scheduled = service_profile.headway(local_minute(passed_ts), route_id)
+        ratio = headway / scheduled
+        kind = "bunching" if ratio < BUNCHING_RATIO else "gap" if ratio > GAP_RATIO else "regular"
+        window = self.windows.get((route_id, direction))
+        if window is None:
+            window = self.windows[(route_id, direction)] = _RouteWindow()
+        window.push(headway, scheduled, kind)
+
+        if kind != "regular":
+            self.alerts.append({
+                "type": kind,
+                "route_id": route_id,
+                "direction": DIRECTION_LABELS[direction],
+                "station": self.stop_names[r][seq],
+                "bus_id": vehicle_id,
+                "leader_bus_id": previous[1],
+                "headway_min": round(headway, 2),
+                "scheduled_headway_min": round(scheduled, 2),
+                "ratio": round(ratio, 2),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(passed_ts))
+            })
+
+    def metrics(self, route_id=None):
+        """Regularity metrics per route and direction"""
+        return [
+            {"route_id": r, "direction": DIRECTION_LABELS[d], **window.metrics()}
+            for (r, d), window in sorted(self.windows.items())
+            if route_id is None or r == route_id
+        ]
+
+    def recent_alerts(self, route_id=None, limit=50):
+        """Newest alerts first"""
+        found = []
+        for alert in reversed(self.alerts):
+            if route_id is None or alert["route_id"] == route_id:
+                found.append(alert)
+                if len(found) >= limit:
+                    break
+        return found
@@ -0,0 +1,251 @@
+"""
+⚡ FAST-PATH INTENT ENGINE
+Classifies chat messages so questions answerable from official Janmarg data
+never leave the process. Only open-ended questions are forwarded to the LLM.
+"""
+
+import re
+import threading
+import time
+
+
+# ========== INTENTS ==========
+INTENT_ROUTE_GUIDANCE = "route_guidance"
+INTENT_FARE = "fare"
+INTENT_STOPS = "stops"
+INTENT_HEADWAY = "headway"
+INTENT_PEAK_HOURS = "peak_hours"
+INTENT_CAPACITY = "capacity"
+INTENT_GREETING = "greeting"
+
+# Highest priority first: a message like "fare from ISKCON to RTO, which route?"
+# is a fare question even though it also mentions a route.
+INTENT_PRIORITY = (
+    INTENT_FARE,
+    INTENT_ROUTE_GUIDANCE,
+    INTENT_STOPS,
+    INTENT_HEADWAY,
+    INTENT_PEAK_HOURS,
+    INTENT_CAPACITY,
+    INTENT_GREETING,
+)
+
+# Keyword → intent table fed into the automaton
+INTENT_KEYWORDS = {
+    INTENT_FARE: (
+        "fare", "fares", "ticket price", "ticket prices", "kitna", "charges"
+    ),
+    INTENT_STOPS: (
+        "station list", "list of stations", "list of stops", "stop list",
+        "which stations", "which stops", "all stations", "all stops"
+    ),
+    INTENT_HEADWAY: (
+        "headway", "frequency", "how often", "how frequent", "every how many",
+        "time between buses", "buses per hour"
+    ),
+    INTENT_PEAK_HOURS: (
+        "peak hour", "peak hours", "peak time", "peak times", "peak timings",
+        "rush hour", "rush hours", "busy hours"
+    ),
+    INTENT_CAPACITY: (
+        "capacity", "how many passengers", "how many people", "how many seats",
+        "number of seats", "articulated"
+    ),
+}
+
+# Phrase patterns that keywords cannot express. Bare words such as "how much",
+# "cost", "ticket", "peak" or "stations" only name a lookup when tied to it:
+# "how much time", "where can I buy tickets", "peak traffic delay" or "stop at
+# stations for wheelchair users" do not.
+INTENT_PATTERNS = {
+    INTENT_FARE: re.compile(
+        r"\bhow\s+much\s+(?:is|does|will|would|for|to)\b(?!.*\b(?:time|long|far|distance)\b)"
+        r"|\b(?:cost|price)\s+(?:of|for)\s+(?:a\s+|the\s+|my\s+)?(?:ticket|trip|journey|ride|travel)"
+        r"|\b(?:trip|journey|ride|ticket)\s+(?:cost|price)\b"
+        r"|\btickets?\s+(?:from|between)\b"
+    ),
+    INTENT_ROUTE_GUIDANCE: re.compile(
+        r"\b(?:how\s+(?:do|can|should)\s+i\s+(?:go|get|reach|travel)"
+        r"|how\s+to\s+(?:go|get|reach)"
+        r"|route\s+(?:from|to)"
+        r"|(?:go|get|travel)\s+from"
+        r"|directions?"
+        r"|which\s+(?:bus|route))\b"
+    ),
+    INTENT_STOPS: re.compile(
+        r"\b(?:stops?|stations?)\s+(?:on|of|in|along)\s+(?:route|r)\s*\d+\b"
+        r"|\broute\s*\d+\s+(?:stops|stations)\b"
+        r"|\bwhat\s+are\s+the\s+(?:stops|stations)\b"
+    ),
+    INTENT_PEAK_HOURS: re.compile(
+        r"\b(?:when|what)\s+(?:is|are)\s+(?:the\s+)?peak\b(?!\s+(?:load|traffic|demand|occupancy|crowd))"
+    ),
+    INTENT_GREETING: re.compile(
+        r"^\s*(?:hi|hello|hey|namaste|help|what\s+can\s+you\s+do)\W*$"
+    ),
+}
+
+# Markers of questions that need reasoning rather than a lookup
+OPEN_ENDED_PATTERN = re.compile(
+    r"\b(?:why|explain|compare|comparison|opinion|recommend|suggest|should\s+i"
+    r"|what\s+do\s+you\s+think|history|tell\s+me\s+about|difference)\b"
+)
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton matching every keyword in a single pass"""
+
+    def __init__(self, keyword_map):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for label, keywords in keyword_map.items():
+            for keyword in keywords:
+                self._add(keyword.lower(), label)
+        self._build_failure_links()
+
+    def _add(self, keyword, label):
+        node = 0
+        for char in keyword:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = nxt
+        self._output[node].append((len(keyword), label))
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def labels(self, text):
+        """
+        Return the set of labels whose keywords occur in text on word boundaries
+
+        Args:
+            text: Lower-cased message
+
+        Returns:
+            Set of matched labels
+        """
+        found = set()
+        node = 0
+        length = len(text)
+        for i, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for size, label in self._output[node]:
+                start = i - size + 1
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if i + 1 < length and text[i + 1].isalnum():
+                    continue
+                found.add(label)
+        return found
+
+
+class IntentEngine:
+    """Compiled intent classifier with fast-path traffic accounting"""
+
+    def __init__(self):
+        self._automaton = KeywordAutomaton(INTENT_KEYWORDS)
+        self._lock = threading.Lock()
+        self._total = 0
+        self._local = 0
+        self._by_intent = {}
+        self._classified = 0
+        self._classify_ns = 0
+
+    def classify(self, message):
+        """
+        Classify a chat message into a locally answerable intent
+
+        Args:
+            message: Raw user message
+
+        Returns:
+            Intent name, or None when the question should go to the LLM
+        """
+        started = time.perf_counter_ns()
+        intent = self._classify(message)
+        elapsed = time.perf_counter_ns() - started
+        with self._lock:
+            self._classified += 1
+            self._classify_ns += elapsed
+        return intent
+
+    def _classify(self, message):
+        text = (message or "").lower()
+        if not text.strip():
+            return None
+
+        matched = self._automaton.labels(text)
+        for intent, pattern in INTENT_PATTERNS.items():
+            if intent not in matched and pattern.search(text):
+                matched.add(intent)
+
+        if not matched:
+            return None
+        if OPEN_ENDED_PATTERN.search(text) and INTENT_ROUTE_GUIDANCE not in matched:
+            return None
+
+        for intent in INTENT_PRIORITY:
+            if intent in matched:
+                return intent
+        return None
+
+    def record(self, intent, served_locally):
+        """Count one chat request and whether the fast path answered it"""
+        key = intent or "open_ended"
+        with self._lock:
+            self._total += 1
+            if served_locally:
+                self._local += 1
+            bucket = self._by_intent.setdefault(key, {"local": 0, "llm": 0})
+            bucket["local" if served_locally else "llm"] += 1
+
+    def stats(self):
+        """
+        Snapshot of fast-path traffic
+
+        Returns:
+            {
+                "total_requests": 120,
+                "served_locally": 96,
+                "local_share": 0.8,
+                "avg_classify_us": 14.2,
+                "by_intent": {"fare": {"local": 40, "llm": 0}, ...}
+            }
+        """
+        with self._lock:
+            total = self._total
+            return {
+                "total_requests": total,
+                "served_locally": self._local,
+                "forwarded_to_llm": total - self._local,
+                "local_share": round(self._local / total, 4) if total else 0.0,
+                "avg_classify_us": (
+                    round(self._classify_ns / self._classified / 1000, 2) if self._classified else 0.0
+                ),
+                "by_intent": {key: dict(value) for key, value in self._by_intent.items()}
+            }
+
+
+# Initialize engine
+intent_engine = IntentEngine()
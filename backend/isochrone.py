@@ -0,0 +1,68 @@
+"""
+🟢 ISOCHRONE GEOMETRY
+Turns "stations reachable within N minutes" into a simplified polygon: each
+station contributes a small walking circle sized by the minutes left, and the
+convex hull of all circle points is the isochrone.
+"""
+
+import math
+
+
+WALK_SPEED_KMH = 4.5
+WALK_RADIUS_MAX_KM = 0.8   # nobody walks further than this from a BRTS stop
+CIRCLE_POINTS = 8
+KM_PER_DEG_LAT = 111.32
+
+
+def _circle(lat, lng, radius_km, points=CIRCLE_POINTS):
+    if radius_km <= 0:
+        return [(lat, lng)]
+    dlat = radius_km / KM_PER_DEG_LAT
+    dlng = radius_km / (KM_PER_DEG_LAT * math.cos(math.radians(lat)))
+    return [
+        (lat + dlat * math.sin(2 * math.pi * k / points), lng + dlng * math.cos(2 * math.pi * k / points))
+        for k in range(points)
+    ]
+
+
+def convex_hull(points):
+    """Andrew's monotone chain; points are (lat, lng), hull is counter-clockwise"""
+    pts = sorted(set(points), key=lambda p: (p[1], p[0]))
+    if len(pts) <= 2:
+        return pts
+
+    def cross(o, a, b):
+        return (a[1] - o[1]) * (b[0] - o[0]) - (a[0] - o[0]) * (b[1] - o[1])
+
+    lower, upper = [], []
+    for p in pts:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in reversed(pts):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return lower[:-1] + upper[:-1]
+
+
+def isochrone_polygon(stops):
+    """
+    Simplified isochrone as a GeoJSON Polygon
+
+    Args:
+        stops: [(lat, lng, minutes_left), ...] for every reached station
+
+    Returns:
+        GeoJSON geometry dict (coordinates are [lng, lat]), or None if empty
+    """
+    points = []
+    for lat, lng, minutes_left in stops:
+        radius = min(WALK_RADIUS_MAX_KM, max(0.0, minutes_left) / 60 * WALK_SPEED_KMH)
+        points.extend(_circle(lat, lng, radius))
+    hull = convex_hull(points)
+    if not hull:
+        return None
+    ring = [[round(lng, 6), round(lat, 6)] for lat, lng in hull]
+    ring.append(ring[0])
+    return {"type": "Polygon", "coordinates": [ring]}
@@ -31,12 +31,26 @@ BUS_CAPACITY_ART = 150  # Articulated bus capacity (passengers)
 FARE_BASE_INR = 5
 FARE_PER_KM_INR = 2
 
+# Distance slabs used by the Janmarg ticket counters: (up to km, fare in INR)
+FARE_BANDS_INR = (
+    (3, 5),
+    (5, 10),
+    (8, 15),
+    (14, 20),
+    (20, 25),
+    (None, 30)   # beyond 20 km
+)
+
 # ============================================================================
 # 4. PEAK HOURS DEFINITION (Hour of day, 24-hour format)
 # ============================================================================
 PEAK_HOURS_MORNING = (8, 11)   # Morning peak: 8:00 AM to 11:00 AM
 PEAK_HOURS_EVENING = (17, 20)  # Evening peak: 5:00 PM to 8:00 PM
 
+# Service day: first departure from each terminal and last departure (hour of day)
+SERVICE_START_HOUR = 6
+SERVICE_END_HOUR = 23
+
 # ============================================================================
 # 5. ROUTE DISTANCES (Approximate distances in kilometers)
 # ============================================================================
@@ -561,68 +575,8 @@ OCCUPANCY_CRITICAL = 0.90  # 90% capacity during peak hours
 OCCUPANCY_MODERATE = 0.65  # 65% capacity during moderate hours
 OCCUPANCY_LOW = 0.40       # 40% capacity during off-peak hours
 
-# ============================================================================
-# HELPER FUNCTIONS
-# ============================================================================
-
-def is_peak_hour(hour: int) -> bool:
-    """
-    Determine if given hour falls within peak hours
-    
-    Args:
-        hour: Hour of day (0-23)
-    
-    Returns:
-        True if peak hour, False otherwise
-    """
-    return (PEAK_HOURS_MORNING[0] <= hour <= PEAK_HOURS_MORNING[1] or 
-            PEAK_HOURS_EVENING[0] <= hour <= PEAK_HOURS_EVENING[1])
-
-def get_traffic_factor(hour: int) -> float:
-    """
-    Get traffic congestion multiplier for given hour
-    
-    Args:
-        hour: Hour of day (0-23)
-    
-    Returns:
-        Traffic congestion multiplier
-    """
-    if is_peak_hour(hour):
-        return TRAFFIC_FACTOR_PEAK
-    elif 22 <= hour or hour <= 6:  # Night hours
-        return TRAFFIC_FACTOR_NIGHT
-    else:
-        return TRAFFIC_FACTOR_OFFPEAK
-
-def get_occupancy_level(hour: int) -> tuple[str, float]:
-    """
-    Get occupancy level and percentage for given hour
-    
-    Args:
-        hour: Hour of day (0-23)
-    
-    Returns:
-        Tuple of (level_name, occupancy_percentage)
-    """
-    if is_peak_hour(hour):
-        return ("High (CRITICAL)", OCCUPANCY_CRITICAL)
-    elif 12 <= hour <= 16:
-        return ("Moderate", OCCUPANCY_MODERATE)
-    else:
-        return ("Low", OCCUPANCY_LOW)
-
-def get_headway(hour: int) -> float:
-    """
-    Get bus frequency (headway) for given hour
-    
-    Args:
-        hour: Hour of day (0-23)
-    
-    Returns:
-        Minutes between consecutive buses
-    """
-    return HEADWAY_PEAK if is_peak_hour(hour) else HEADWAY_OFFPEAK
+# Peak flags, headway, traffic factor, occupancy and dwell by minute of day
+# are compiled from these constants in service_profile.py
 
 # ============================================================================
 # SYSTEM INFORMATION (For API endpoints)
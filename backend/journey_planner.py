@@ -0,0 +1,459 @@
+"""
+🧭 TIME-DEPENDENT JOURNEY PLANNER
+Connection Scan Algorithm over the generated timetable. Every trip is broken
+into elementary connections (stop → next stop), sorted once at startup; a
+query is a single forward scan from the requested departure time.
+
+- depart_at: earliest-arrival itinerary (forward scan)
+- arrive_by: latest departure that still makes it (backward scan), then the
+  earliest-arrival itinerary from that departure
+
+`python journey_planner.py --queries 400` plans random station pairs at random
+times and fails if plan() arrives later than the fastest Pareto alternative.
+"""
+
+import argparse
+import sys
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from fares import fare_engine
+from timetable import timetable, MINUTES_PER_DAY, MIN_TRANSFER_MIN, format_clock
+from transit_network import STATIONS, DIRECTION_LABELS
+
+
+INF = float("inf")
+PLANNER_DAYS = 2  # today plus tomorrow, so late-evening queries roll over
+PARETO_WINDOW_MIN = 45  # how much later than the fastest option an alternative may arrive
+MAX_ALTERNATIVES = 10
+
+
+def leg_fare(distance_km):
+    """Ticket price for one boarding (each bus is a separate ticket)"""
+    return fare_engine.fare(distance_km)
+
+
+def _dominates(a, b):
+    return a[0] <= b[0] and a[1] <= b[1] and a[2] <= b[2]
+
+
+def _insert_label(bag, label):
+    """Add label to a Pareto bag of (arrival, legs, fare, ...) unless dominated"""
+    for other in bag:
+        if _dominates(other, label):
+            return False
+    bag[:] = [other for other in bag if not _dominates(label, other)]
+    bag.append(label)
+    return True
+
+
+class JourneyPlanner:
+    """Earliest-arrival / latest-departure queries over all scheduled trips"""
+
+    def __init__(self, source=timetable):
+        self.timetable = source
+        self.stations = list(STATIONS)
+        self.station_id = {name: i for i, name in enumerate(self.stations)}
+        self._build()
+
+    def _build(self):
+        dep_stop, arr_stop, dep_time, arr_time, trip = [], [], [], [], []
+        dep_km, arr_km = [], []
+        self.trips = []  # global trip id -> (pattern, trip_index, day)
+        self.trip_pattern = []  # global trip id -> pattern number
+
+        for day in range(PLANNER_DAYS):
+            shift = day * MINUTES_PER_DAY
+            for pattern_id, pattern in enumerate(self.timetable.patterns.values()):
+                stop_ids = np.array([self.station_id[s] for s in pattern.stops])
+                n_trips = len(pattern.departures)
+                first = len(self.trips)
+                self.trips.extend((pattern, k, day) for k in range(n_trips))
+                self.trip_pattern.extend([pattern_id] * n_trips)
+                trip_ids = np.arange(first, first + n_trips)
+                for seq in range(len(pattern.stops) - 1):
+                    dep_stop.append(np.full(n_trips, stop_ids[seq]))
+                    arr_stop.append(np.full(n_trips, stop_ids[seq + 1]))
+                    dep_time.append(pattern.departures[:, seq] + shift)
+                    arr_time.append(pattern.arrivals[:, seq + 1] + shift)
+                    dep_km.append(np.full(n_trips, pattern.chainage_km[seq]))
+                    arr_km.append(np.full(n_trips, pattern.chainage_km[seq + 1]))
+                    trip.append(trip_ids)
+
+        dep_stop = np.concatenate(dep_stop)
+        arr_stop = np.concatenate(arr_stop)
+        dep_time = np.concatenate(dep_time)
+        arr_time = np.concatenate(arr_time)
+        trip = np.concatenate(trip)
+        dep_km = np.concatenate(dep_km)
+        arr_km = np.concatenate(arr_km)
+
+        # Forward scan order: by departure; a trip's own connections stay in sequence
+        order = np.lexsort((arr_time, dep_time))
+        self.dep_stop = dep_stop[order].tolist()
+        self.arr_stop = arr_stop[order].tolist()
+        self.dep_time = dep_time[order].tolist()
+        self.arr_time = arr_time[order].tolist()
+        self.trip = trip[order].tolist()
+        self.dep_km = dep_km[order].tolist()
+        self.arr_km = arr_km[order].tolist()
+
+        # Backward scan order: by arrival, latest first
+        self.by_arrival = np.lexsort((-np.asarray(self.dep_time), np.asarray(self.arr_time)))[::-1].tolist()
+        self.arr_sorted = [self.arr_time[c] for c in reversed(self.by_arrival)]
+
+    @property
+    def connection_count(self):
+        return len(self.dep_time)
+
+    def _earliest_arrival(self, origin, target, depart_min):
+        n = len(self.stations)
+        ready = [INF] * n
+        arrival = [INF] * n
+        journey = [None] * n
+        trip_enter = {}
+        # arrival too, or a trip looping back through the origin would reset ready
+        ready[origin] = arrival[origin] = depart_min
+
+        dep_stop, arr_stop = self.dep_stop, self.arr_stop
+        dep_time, arr_time, trips = self.dep_time, self.arr_time, self.trip
+
+        for c in range(bisect_left(dep_time, depart_min), len(dep_time)):
+            dt = dep_time[c]
+            if dt >= arrival[target]:
+                break
+            t = trips[c]
+            entered = trip_enter.get(t)
+            if entered is None:
+                if ready[dep_stop[c]] > dt:
+                    continue
+                trip_enter[t] = entered = c
+            a = arr_stop[c]
+            at = arr_time[c]
+            if at < arrival[a]:
+                arrival[a] = at
+                ready[a] = at + MIN_TRANSFER_MIN
+                journey[a] = (entered, c)
+
+        if journey[target] is None:
+            return None
+
+        legs = []
+        station = target
+        while station != origin:
+            enter, exit_ = journey[station]
+            legs.append((enter, exit_))
+            station = dep_stop[enter]
+        legs.reverse()
+        return legs
+
+    def reachable(self, origin, depart_at, budget_min):
+        """
+        One-to-all earliest arrival within a time budget
+
+        A single connection scan from depart_at that stops once departures pass
+        depart_at + budget_min.
+
+        Args:
+            origin: Canonical station name
+            depart_at: Minute of day the passenger is at the origin
+            budget_min: Travel time budget in minutes
+
+        Returns:
+            {station: {"arrive_min", "travel_minutes", "transfers"}} for every
+            station reached within the budget (the origin included), or None
+            if origin is unknown
+        """
+        o = self.station_id.get(origin)
+        if o is None:
+            return None
+        deadline = depart_at + budget_min
+        n = len(self.stations)
+        ready = [INF] * n
+        arrival = [INF] * n
+        legs = [0] * n
+        trip_enter = {}
+        ready[o] = arrival[o] = depart_at
+
+        dep_stop, arr_stop = self.dep_stop, self.arr_stop
+        dep_time, arr_time, trips = self.dep_time, self.arr_time, self.trip
+
+        for c in range(bisect_left(dep_time, depart_at), len(dep_time)):
+            dt = dep_time[c]
+            if dt > deadline:
+                break
+            t = trips[c]
+            entered = trip_enter.get(t)
+            if entered is None:
+                if ready[dep_stop[c]] > dt:
+                    continue
+                trip_enter[t] = entered = (legs[dep_stop[c]] + 1)
+            a = arr_stop[c]
+            at = arr_time[c]
+            if at <= deadline and at < arrival[a]:
+                arrival[a] = at
+                ready[a] = at + MIN_TRANSFER_MIN
+                legs[a] = entered
+
+        return {
+            self.stations[i]: {
+                "arrive_min": round(arrival[i], 2),
+                "travel_minutes": round(arrival[i] - depart_at, 1),
+                "transfers": max(0, legs[i] - 1)
+            }
+            for i in range(n) if arrival[i] < INF
+        }
+
+    def _latest_departure(self, origin, target, arrive_by):
+        n = len(self.stations)
+        latest = [-INF] * n
+        latest[target] = arrive_by
+        trip_ok = set()
+
+        dep_stop, arr_stop = self.dep_stop, self.arr_stop
+        dep_time, arr_time, trips = self.dep_time, self.arr_time, self.trip
+        by_arrival = self.by_arrival
+
+        start = len(by_arrival) - bisect_right(self.arr_sorted, arrive_by)
+        for k in range(start, len(by_arrival)):
+            c = by_arrival[k]
+            at = arr_time[c]
+            if at < latest[origin]:
+                break
+            t = trips[c]
+            if t not in trip_ok:
+                a = arr_stop[c]
+                need = latest[a] if a == target else latest[a] - MIN_TRANSFER_MIN
+                if at > need:
+                    continue
+                trip_ok.add(t)
+            d = dep_stop[c]
+            if dep_time[c] > latest[d]:
+                latest[d] = dep_time[c]
+
+        return latest[origin] if latest[origin] > -INF else None
+
+    def _pareto_labels(self, origin, target, depart_min):
+        """
+        One connection scan keeping, per station, every label not dominated on
+        (arrival, legs, fare). Returns the target bag.
+        """
+        n = len(self.stations)
+        bags = [[] for _ in range(n)]
+        trip_bags = {}
+        # label: (arrival, legs, fare, ready, leg, previous, boarded patterns)
+        bags[origin].append((depart_min, 0, 0, depart_min, None, None, set()))
+        target_bag = bags[target]
+
+        dep_stop, arr_stop = self.dep_stop, self.arr_stop
+        dep_time, arr_time, trips = self.dep_time, self.arr_time, self.trip
+        dep_km, arr_km = self.dep_km, self.arr_km
+        trip_pattern = self.trip_pattern
+        horizon = INF
+
+        for c in range(bisect_left(dep_time, depart_min), len(dep_time)):
+            dt = dep_time[c]
+            if dt > horizon:
+                break
+            t = trips[c]
+            on_trip = trip_bags.get(t)
+            pattern_id = trip_pattern[t]
+
+            # Board from every station label that is ready in time. Buses of
+            # one pattern never overtake, so a label only boards the first.
+            for label in bags[dep_stop[c]]:
+                if label[3] > dt or pattern_id in label[6]:
+                    continue
+                label[6].add(pattern_id)
+                boarded = (label[1] + 1, label[2], dep_km[c], c, label)
+                if on_trip is None:
+                    on_trip = trip_bags[t] = []
+                if any(o[0] <= boarded[0] and o[1] <= boarded[1] and o[2] >= boarded[2] for o in on_trip):
+                    continue
+                on_trip[:] = [
+                    o for o in on_trip
+                    if not (boarded[0] <= o[0] and boarded[1] <= o[1] and boarded[2] >= o[2])
+                ]
+                on_trip.append(boarded)
+
+            if not on_trip:
+                continue
+
+            # Alight at the next stop
+            a = arr_stop[c]
+            at = arr_time[c]
+            for legs, fare_before, board_km, enter, previous in on_trip:
+                fare = fare_before + leg_fare(arr_km[c] - board_km)
+                label = (at, legs, fare, at + MIN_TRANSFER_MIN, (enter, c), previous, set())
+                if any(_dominates(o, label) for o in target_bag):
+                    continue
+                if _insert_label(bags[a], label) and a == target and horizon == INF:
+                    horizon = at + PARETO_WINDOW_MIN
+
+        return target_bag
+
+    def _unwind(self, label):
+        legs = []
+        while label is not None and label[4] is not None:
+            legs.append(label[4])
+            label = label[5]
+        legs.reverse()
+        return legs
+
+    def _describe(self, legs, requested_min):
+        result = []
+        previous_arrival = requested_min
+        for enter, exit_ in legs:
+            pattern, trip_index, _ = self.trips[self.trip[enter]]
+            depart = self.dep_time[enter]
+            arrive = self.arr_time[exit_]
+            from_station = self.stations[self.dep_stop[enter]]
+            to_station = self.stations[self.arr_stop[exit_]]
+            distance_km = self.arr_km[exit_] - self.dep_km[enter]
+            result.append({
+                "route_id": pattern.route_id,
+                "direction": DIRECTION_LABELS[pattern.direction],
+                "headsign": pattern.headsign,
+                "trip_id": pattern.trip_id(trip_index),
+                "from_station": from_station,
+                "to_station": to_station,
+                "stops": pattern.stop_index[to_station] - pattern.stop_index[from_station],
+                "distance_km": round(distance_km, 2),
+                "fare_inr": leg_fare(distance_km),
+                "depart_min": round(depart, 2),
+                "arrive_min": round(arrive, 2),
+                "departs": format_clock(depart),
+                "arrives": format_clock(arrive),
+                "wait_minutes": round(depart - previous_arrival, 1),
+                "ride_minutes": round(arrive - depart, 1)
+            })
+            previous_arrival = arrive
+        return result
+
+    def _summary(self, origin, destination, requested, legs):
+        described = self._describe(legs, requested)
+        depart = described[0]["depart_min"]
+        arrive = described[-1]["arrive_min"]
+        return {
+            "origin": origin,
+            "destination": destination,
+            "requested": format_clock(requested),
+            "depart_min": depart,
+            "arrive_min": arrive,
+            "departs": described[0]["departs"],
+            "arrives": described[-1]["arrives"],
+            "next_day": depart >= MINUTES_PER_DAY,
+            "duration_minutes": round(arrive - depart, 1),
+            "total_wait_minutes": round(sum(leg["wait_minutes"] for leg in described), 1),
+            "transfers": len(described) - 1,
+            "fare_inr": sum(leg["fare_inr"] for leg in described),
+            "legs": described
+        }
+
+    def _requested_minute(self, o, d, depart_at, arrive_by):
+        if depart_at is not None:
+            return depart_at
+        return self._latest_departure(o, d, arrive_by)
+
+    def plan(self, origin, destination, depart_at=None, arrive_by=None):
+        """
+        Timed itinerary between two stations
+
+        Args:
+            origin: Canonical origin station
+            destination: Canonical destination station
+            depart_at: Minute of day the passenger is at the origin
+            arrive_by: Minute of day the passenger must arrive by (used when
+                depart_at is None)
+
+        Returns:
+            {"legs", "depart_min", "arrive_min", "duration_minutes",
+             "transfers", "fare_inr", ...} or None if no service connects them in time
+        """
+        o = self.station_id.get(origin)
+        d = self.station_id.get(destination)
+        if o is None or d is None or o == d:
+            return None
+
+        requested = self._requested_minute(o, d, depart_at, arrive_by)
+        if requested is None:
+            return None
+        legs = self._earliest_arrival(o, d, requested)
+        if legs is None:
+            return None
+        return self._summary(origin, destination, requested, legs)
+
+    def alternatives(self, origin, destination, depart_at=None, arrive_by=None, max_alternatives=3):
+        """
+        Pareto-optimal itineraries on travel time, transfers and fare
+
+        All non-dominated journeys come out of one multi-criteria connection
+        scan (labels per station instead of a single arrival time). Options
+        arriving more than PARETO_WINDOW_MIN after the fastest are not kept.
+
+        Args:
+            origin: Canonical origin station
+            destination: Canonical destination station
+            depart_at: Minute of day the passenger is at the origin
+            arrive_by: Minute of day the passenger must arrive by (used when
+                depart_at is None; options arriving later are dropped)
+            max_alternatives: Maximum number of itineraries returned
+
+        Returns:
+            List of itineraries (see plan()), fastest first; empty if none
+        """
+        o = self.station_id.get(origin)
+        d = self.station_id.get(destination)
+        if o is None or d is None or o == d:
+            return []
+
+        requested = self._requested_minute(o, d, depart_at, arrive_by)
+        if requested is None:
+            return []
+        labels = sorted(self._pareto_labels(o, d, requested), key=lambda label: label[:3])
+        if depart_at is None:
+            labels = [label for label in labels if label[0] <= arrive_by]
+        return [
+            self._summary(origin, destination, requested, self._unwind(label))
+            for label in labels[:max(1, min(max_alternatives, MAX_ALTERNATIVES))]
+        ]
+
+
+# Build connections at import (startup)
+journey_planner = JourneyPlanner()
+
+
+def check(queries, seed):
+    """Random (origin, destination, depart_at) where plan() and alternatives() disagree"""
+    rng = np.random.default_rng(seed)
+    stations = journey_planner.stations
+    mismatches = []
+    for _ in range(queries):
+        o, d = rng.choice(len(stations), size=2, replace=False)
+        depart_at = round(float(rng.uniform(0, MINUTES_PER_DAY)), 2)
+        origin, destination = stations[o], stations[d]
+        plan = journey_planner.plan(origin, destination, depart_at=depart_at)
+        labels = journey_planner.alternatives(origin, destination, depart_at=depart_at)
+        fastest = labels[0]["arrive_min"] if labels else None
+        if (plan["arrive_min"] if plan else None) != fastest:
+            mismatches.append((origin, destination, depart_at, plan and plan["arrive_min"], fastest))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check plan() against the fastest Pareto alternative")
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    mismatches = check(args.queries, args.seed)
+    for origin, destination, depart_at, planned, fastest in mismatches:
+        print(f"{origin} -> {destination} at {depart_at}: plan arrives {planned}, fastest label {fastest}")
+    print(f"{args.queries} queries, {len(mismatches)} mismatches")
+    if mismatches:
+        sys.exit("plan() is not earliest-arrival")
+
+
+if __name__ == "__main__":
+    main()
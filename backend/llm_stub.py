@@ -0,0 +1,284 @@
+"""
+🧪 LOCAL LLM STAND-IN SERVER
+OpenAI-compatible chat completions stub for load and latency testing of /api/chat
+without a Groq key or internet access.
+
+Usage:
+    python llm_stub.py --port 8090 --latency-ms 250 --tokens-per-sec 120
+    GROQ_BASE_URL=http://127.0.0.1:8090/openai/v1 GROQ_API_KEY=stub python server.py
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_PORT = int(os.getenv("LLM_STUB_PORT", "8090"))
+DEFAULT_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "200"))
+DEFAULT_JITTER_MS = float(os.getenv("LLM_STUB_JITTER_MS", "0"))
+DEFAULT_TOKENS_PER_SEC = float(os.getenv("LLM_STUB_TOKENS_PER_SEC", "0"))
+DEFAULT_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+DEFAULT_RATE_LIMIT_RATE = float(os.getenv("LLM_STUB_429_RATE", "0"))
+DEFAULT_REPLY = os.getenv(
+    "LLM_STUB_REPLY",
+    "Per the official Janmarg operating data, buses run every 2.5 minutes at peak "
+    "and every 8 minutes off-peak at a commercial speed of 26 km/h."
+)
+
+
+class StubConfig:
+    """Runtime behaviour of the stub; shared by all handler threads"""
+
+    def __init__(
+        self,
+        latency_ms=DEFAULT_LATENCY_MS,
+        jitter_ms=DEFAULT_JITTER_MS,
+        tokens_per_sec=DEFAULT_TOKENS_PER_SEC,
+        error_rate=DEFAULT_ERROR_RATE,
+        rate_limit_rate=DEFAULT_RATE_LIMIT_RATE,
+        reply=DEFAULT_REPLY,
+        seed=None
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.reply = reply
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    def draw(self):
+        """Pick the outcome and first-byte delay for one request"""
+        with self._lock:
+            self.requests += 1
+            roll = self._rng.random()
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            if roll < self.rate_limit_rate:
+                self.rate_limited += 1
+                outcome = 429
+            elif roll < self.rate_limit_rate + self.error_rate:
+                self.errors += 1
+                outcome = 500
+            else:
+                outcome = 200
+        return outcome, max(0.0, self.latency_ms + jitter) / 1000
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "rate_limited": self.rate_limited,
+                "latency_ms": self.latency_ms,
+                "jitter_ms": self.jitter_ms,
+                "tokens_per_sec": self.tokens_per_sec,
+                "error_rate": self.error_rate,
+                "rate_limit_rate": self.rate_limit_rate
+            }
+
+
+def _reply_tokens(reply, max_tokens):
+    words = reply.split(" ")
+    tokens = [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+    if max_tokens:
+        tokens = tokens[:max_tokens]
+    return tokens
+
+
+def _prompt_tokens(messages):
+    chars = sum(len(str(item.get("content", ""))) for item in messages if isinstance(item, dict))
+    return max(1, chars // 4)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves /v1/chat/completions, /openai/v1/chat/completions and /v1/models"""
+
+    server_version = "JanmargLLMStub/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def config(self):
+        return self.server.stub_config
+
+    def log_message(self, format, *args):
+        if os.getenv("LLM_STUB_VERBOSE"):
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path.endswith("/models"):
+            self._send_json(200, {
+                "object": "list",
+                "data": [{"id": "llama3-70b-8192", "object": "model", "owned_by": "stub"}]
+            })
+        elif path == "/stats":
+            self._send_json(200, self.config.stats())
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Request body is not valid JSON"}})
+            return
+
+        messages = payload.get("messages") or []
+        if not messages:
+            self._send_json(400, {"error": {"message": "messages is required"}})
+            return
+
+        outcome, delay = self.config.draw()
+        time.sleep(delay)
+
+        if outcome == 429:
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_exceeded"}},
+                headers={"Retry-After": "1"}
+            )
+            return
+        if outcome == 500:
+            self._send_json(500, {"error": {"message": "Internal error (stub)", "type": "server_error"}})
+            return
+
+        model = payload.get("model") or "llama3-70b-8192"
+        tokens = _reply_tokens(self.config.reply, payload.get("max_tokens"))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": _prompt_tokens(messages),
+            "completion_tokens": len(tokens),
+            "total_tokens": _prompt_tokens(messages) + len(tokens)
+        }
+        token_delay = 1.0 / self.config.tokens_per_sec if self.config.tokens_per_sec > 0 else 0.0
+
+        if payload.get("stream"):
+            self._stream(completion_id, created, model, tokens, token_delay)
+            return
+
+        time.sleep(token_delay * len(tokens))
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+
+    def _stream(self, completion_id, created, model, tokens, token_delay):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def emit(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            emit({"role": "assistant"})
+            for token in tokens:
+                if token_delay:
+                    time.sleep(token_delay)
+                emit({"content": token})
+            emit({}, finish_reason="stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def create_stub_server(host="127.0.0.1", port=DEFAULT_PORT, config=None):
+    """
+    Build (but do not start) a stub server
+
+    Args:
+        host: Bind address
+        port: Bind port (0 picks a free port)
+        config: Optional StubConfig
+
+    Returns:
+        ThreadingHTTPServer; call serve_forever() or run it in a thread
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.stub_config = config or StubConfig()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible LLM stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_LATENCY_MS,
+                        help="Delay before the first byte of each response")
+    parser.add_argument("--jitter-ms", type=float, default=DEFAULT_JITTER_MS,
+                        help="Uniform +/- jitter added to the latency")
+    parser.add_argument("--tokens-per-sec", type=float, default=DEFAULT_TOKENS_PER_SEC,
+                        help="Generation rate; 0 returns the whole reply at once")
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_ERROR_RATE,
+                        help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=DEFAULT_RATE_LIMIT_RATE,
+                        help="Fraction of requests answered with HTTP 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed
+    )
+    server = create_stub_server(args.host, args.port, config)
+    print(f"LLM stub listening on http://{args.host}:{server.server_address[1]}/openai/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+📊 ORIGIN-DESTINATION MATRIX
+Station × station travel time, distance, transfers and fare for each
+time-of-day bucket. One connection scan per bucket runs every origin at
+once: the per-station state is an (arrival station × origin) array, so each
+connection updates all origins with a single vector operation.
+
+CLI:
+    python od_matrix.py --format csv --bucket-minutes 60 --output od.csv
+"""
+
+import argparse
+import io
+import json
+import sys
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from fares import fare_engine
+from journey_planner import journey_planner
+from timetable import MIN_TRANSFER_MIN, SERVICE_START_MIN, SERVICE_END_MIN, format_clock
+
+
+OD_HORIZON_MIN = 180      # longest journey considered from the bucket start
+OD_BUCKET_MIN_DEFAULT = 60
+OD_FORMATS = ("csv", "ndjson", "npz")
+CSV_HEADER = "bucket,origin,destination,travel_minutes,distance_km,transfers,fare_inr\n"
+
+
+class ODMatrix:
+    """All-pairs earliest-arrival matrices over the planner's connections"""
+
+    def __init__(self, planner=journey_planner, fares=fare_engine):
+        self.planner = planner
+        self.fares = fares
+        self.stations = list(planner.stations)
+        self._buckets = {}
+
+    def bucket(self, start_min, horizon_min=OD_HORIZON_MIN):
+        """
+        Matrices for passengers leaving every station at start_min
+
+        Returns:
+            Dict of (origin × destination) arrays: travel_minutes (float32,
+            NaN when unreachable), distance_km (float32), transfers (int16,
+            -1 when unreachable) and fare_inr (int32, -1 when unreachable)
+        """
+        key = (start_min, horizon_min)
+        cached = self._buckets.get(key)
+        if cached is not None:
+            return cached
+
+        p = self.planner
+        fares = self.fares.policy.fares
+        n = len(self.stations)
+        origins = np.arange(n)
+
+        # Rows are stations, columns are origins, so p[:, station] reads are contiguous rows
+        arrival = np.full((n, n), np.inf)
+        ready = np.full((n, n), np.inf)
+        legs = np.zeros((n, n), dtype=np.int16)
+        dist = np.zeros((n, n))
+        fare = np.zeros((n, n), dtype=np.int64)
+        arrival[origins, origins] = start_min
+        ready[origins, origins] = start_min
+
+        on_trip = {}  # trip -> (on, legs, km offset, fare so far, boarding km)
+        dep_stop, arr_stop, trips = p.dep_stop, p.arr_stop, p.trip
+        dep_time, arr_time, dep_km, arr_km = p.dep_time, p.arr_time, p.dep_km, p.arr_km
+
+        lo = bisect_left(dep_time, start_min)
+        hi = bisect_right(dep_time, start_min + horizon_min)
+        for c in range(lo, hi):
+            d = dep_stop[c]
+            dt = dep_time[c]
+            t = trips[c]
+            state = on_trip.get(t)
+            board = ready[d] <= dt
+            if state is None:
+                if not board.any():
+                    continue
+                state = on_trip[t] = (
+                    np.zeros(n, dtype=bool), np.zeros(n, dtype=np.int16),
+                    np.zeros(n), np.zeros(n, dtype=np.int64), np.zeros(n)
+                )
+            on, trip_legs, km_offset, fare_paid, board_km = state
+            new = board & ~on
+            if new.any():
+                on |= new
+                trip_legs[new] = legs[d, new] + 1
+                km_offset[new] = dist[d, new] - dep_km[c]
+                fare_paid[new] = fare[d, new]
+                board_km[new] = dep_km[c]
+
+            a = arr_stop[c]
+            at = arr_time[c]
+            if at > start_min + horizon_min:
+                continue
+            better = on & (at < arrival[a])
+            if better.any():
+                arrival[a, better] = at
+                ready[a, better] = at + MIN_TRANSFER_MIN
+                legs[a, better] = trip_legs[better]
+                dist[a, better] = km_offset[better] + arr_km[c]
+                fare[a, better] = fare_paid[better] + fares(arr_km[c] - board_km[better])
+
+        reached = np.isfinite(arrival).T
+        result = {
+            "travel_minutes": np.where(reached, arrival.T - start_min, np.nan).astype(np.float32),
+            "distance_km": np.where(reached, dist.T, np.nan).astype(np.float32),
+            "transfers": np.where(reached, np.maximum(legs.T - 1, 0), -1).astype(np.int16),
+            "fare_inr": np.where(reached, fare.T, -1).astype(np.int32)
+        }
+        self._buckets[key] = result
+        return result
+
+    def bucket_starts(self, bucket_min=OD_BUCKET_MIN_DEFAULT, start=SERVICE_START_MIN, end=SERVICE_END_MIN):
+        return list(range(int(start), int(end), int(bucket_min)))
+
+    def rows(self, starts):
+        """(bucket, origin, destination, minutes, km, transfers, fare) for each reachable pair"""
+        for start in starts:
+            m = self.bucket(start)
+            label = format_clock(start)
+            for i, origin in enumerate(self.stations):
+                for j, destination in enumerate(self.stations):
+                    if i == j or m["transfers"][i, j] < 0:
+                        continue
+                    yield (
+                        label, origin, destination,
+                        round(float(m["travel_minutes"][i, j]), 1),
+                        round(float(m["distance_km"][i, j]), 2),
+                        int(m["transfers"][i, j]),
+                        int(m["fare_inr"][i, j])
+                    )
+
+    def stream_csv(self, starts):
+        yield CSV_HEADER
+        for row in self.rows(starts):
+            yield ",".join(f'"{v}"' if isinstance(v, str) and "," in v else str(v) for v in row) + "\n"
+
+    def stream_ndjson(self, starts):
+        fields = CSV_HEADER.strip().split(",")
+        for row in self.rows(starts):
+            yield json.dumps(dict(zip(fields, row)), ensure_ascii=False) + "\n"
+
+    def npz_bytes(self, starts):
+        """All buckets stacked into (bucket × origin × destination) arrays, as .npz"""
+        matrices = [self.bucket(start) for start in starts]
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            stations=np.array(self.stations),
+            bucket_start_min=np.array(starts, dtype=np.int32),
+            **{name: np.stack([m[name] for m in matrices]) for name in matrices[0]}
+        )
+        return buffer.getvalue()
+
+
+od_matrix = ODMatrix()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the station × station OD matrix")
+    parser.add_argument("--format", choices=OD_FORMATS, default="csv")
+    parser.add_argument("--bucket-minutes", type=int, default=OD_BUCKET_MIN_DEFAULT)
+    parser.add_argument("--start", type=int, default=SERVICE_START_MIN, help="First bucket, minute of day")
+    parser.add_argument("--end", type=int, default=SERVICE_END_MIN, help="End of the last bucket, minute of day")
+    parser.add_argument("--output", default="-", help="File path, or - for stdout")
+    args = parser.parse_args()
+
+    starts = od_matrix.bucket_starts(args.bucket_minutes, args.start, args.end)
+    if not starts:
+        parser.error("no buckets between --start and --end")
+
+    if args.format == "npz":
+        data = od_matrix.npz_bytes(starts)
+        if args.output == "-":
+            sys.stdout.buffer.write(data)
+        else:
+            with open(args.output, "wb") as f:
+                f.write(data)
+        return
+
+    stream = od_matrix.stream_csv(starts) if args.format == "csv" else od_matrix.stream_ndjson(starts)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for chunk in stream:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
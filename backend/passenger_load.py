@@ -0,0 +1,205 @@
+"""
+🧍 PASSENGER LOAD MODEL
+Boardings, alightings and on-board load of every scheduled trip at every
+stop, for the whole service day, propagated from an origin-destination
+demand matrix.
+
+Demand is passengers per hour for each station pair and hour of day, read
+from a CSV (OD_DEMAND_PATH with origin,destination,hour,passengers) or
+synthesised with a gravity model: station weight is the number of routes
+serving it, decaying with in-vehicle distance, over an hourly profile that
+reproduces the official occupancy levels at the scheduled headways. Each
+station pair is split evenly between the route directions that serve it
+without a transfer (transfer flows are not assigned).
+
+Per route direction, riders for a stop pair arrive at a steady rate between
+consecutive buses, so trip k boards rate × headway_k there. Boardings form
+one (trips × stops × stops) array; load leaving each stop is the running sum
+of boardings minus alightings along the stop axis. Synthetic demand is scaled
+per route so the busiest point of an average peak-hour trip sits at the
+official peak occupancy.
+"""
+
+import csv
+import os
+
+import numpy as np
+
+from janmarg_data import (
+    BUS_CAPACITY_STD,
+    OCCUPANCY_CRITICAL,
+    OCCUPANCY_MODERATE,
+    OCCUPANCY_LOW
+)
+from service_profile import service_profile
+from timetable import timetable, MINUTES_PER_DAY
+from transit_network import STATIONS, STATION_ROUTES
+
+
+OD_DEMAND_PATH = os.getenv("OD_DEMAND_PATH")
+DISTANCE_DECAY_KM = 6.0     # gravity model: demand falls by 1/e every 6 km of riding
+
+CROWD_LEVELS = ["High (CRITICAL)", "Moderate", "Low"]
+# Halfway between the official occupancy levels
+CROWD_HIGH_RATIO = (OCCUPANCY_CRITICAL + OCCUPANCY_MODERATE) / 2
+CROWD_MODERATE_RATIO = (OCCUPANCY_MODERATE + OCCUPANCY_LOW) / 2
+
+
+def crowd_index(ratio):
+    """Index into CROWD_LEVELS for occupancy ratios (scalar or array)"""
+    ratio = np.asarray(ratio)
+    return np.where(ratio >= CROWD_HIGH_RATIO, 0, np.where(ratio >= CROWD_MODERATE_RATIO, 1, 2)).astype(np.int8)
+
+
+def crowd_level(ratio):
+    return CROWD_LEVELS[int(crowd_index(ratio))]
+
+
+def hourly_demand():
+    """
+    Relative riders per hour for synthetic demand: the service profile's
+    occupancy divided by its headway (hourly means), so an average trip in
+    each hour carries that hour's typical load
+    """
+    profile = service_profile.table()
+    return profile.hourly("occupancy") / profile.hourly("headway_min")
+
+
+def read_demand(path):
+    """CSV rows -> {(origin, destination): 24 passengers-per-hour values}"""
+    demand = {}
+    with open(path, encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            hours = demand.setdefault((row["origin"], row["destination"]), np.zeros(24))
+            hours[int(row["hour"]) % 24] += float(row["passengers"])
+    return demand
+
+
+class PassengerLoad:
+    """Per-trip, per-stop boardings, alightings and load for every pattern"""
+
+    def __init__(self, source=timetable, demand_path=OD_DEMAND_PATH):
+        self.source = source
+        self.synthetic = not demand_path
+        self.demand = read_demand(demand_path) if demand_path else self._gravity_demand()
+        self.boardings = {}
+        self.alightings = {}
+        self.load = {}       # pattern key -> (trips × stops) passengers leaving each stop
+        self._build()
+
+    def _gravity_demand(self):
+        """Unscaled passengers per hour for every station pair sharing a route direction"""
+        weight = {station: len(STATION_ROUTES[station]) for station in STATIONS}
+        profile = hourly_demand()
+        demand = {}
+        for pattern in self.source.patterns.values():
+            km = pattern.chainage_km
+            for o, origin in enumerate(pattern.stops):
+                for d in range(o + 1, len(pattern.stops)):
+                    key = (origin, pattern.stops[d])
+                    if key not in demand:
+                        gravity = weight[origin] * weight[key[1]] * np.exp(-(km[d] - km[o]) / DISTANCE_DECAY_KM)
+                        demand[key] = gravity * profile
+        return demand
+
+    def _build(self):
+        patterns = list(self.source.patterns.values())
+        serving = {}
+        for pattern in patterns:
+            for o, origin in enumerate(pattern.stops):
+                for destination in pattern.stops[o + 1:]:
+                    serving[(origin, destination)] = serving.get((origin, destination), 0) + 1
+
+        for pattern in patterns:
+            n = len(pattern.stops)
+            # Riders per minute for each (origin seq, destination seq, hour)
+            rate = np.zeros((n, n, 24))
+            for o, origin in enumerate(pattern.stops):
+                for d in range(o + 1, n):
+                    key = (origin, pattern.stops[d])
+                    if key in self.demand:
+                        rate[o, d] = self.demand[key] / serving[key] / 60
+
+            departures = pattern.departures
+            headway = np.diff(departures, axis=0, prepend=2 * departures[:1] - departures[1:2])
+            hour = (departures // 60).astype(np.intp) % 24
+            seqs = np.arange(n)
+            boarded = rate[seqs[None, :, None], seqs[None, None, :], hour[:, :, None]] * headway[:, :, None]
+            self.boardings[pattern.key] = boarded.sum(axis=2)
+            self.alightings[pattern.key] = boarded.sum(axis=1)
+            self.load[pattern.key] = np.cumsum(self.boardings[pattern.key] - self.alightings[pattern.key], axis=1)
+
+        if self.synthetic:
+            self._calibrate(patterns)
+
+    def _calibrate(self, patterns):
+        """Scale each route so its average peak-hour trip peaks at the official peak occupancy"""
+        peaks = {}
+        for pattern in patterns:
+            minutes = pattern.departures[:, 0].astype(np.intp) % MINUTES_PER_DAY
+            peak = service_profile.table(pattern.route_id).peak[minutes]
+            if peak.any():
+                peaks.setdefault(pattern.route_id, []).append(self.load[pattern.key][peak].max(axis=1))
+        for pattern in patterns:
+            found = peaks.get(pattern.route_id)
+            mean_peak = float(np.concatenate(found).mean()) if found else 0.0
+            if mean_peak <= 0:
+                continue
+            scale = OCCUPANCY_CRITICAL * BUS_CAPACITY_STD / mean_peak
+            for table in (self.boardings, self.alightings, self.load):
+                table[pattern.key] = table[pattern.key] * scale
+
+    def occupancy(self, route_id, direction, trip_index, stop_seq):
+        """Share of capacity on board when the trip leaves stop_seq (capped at 1.0)"""
+        load = self.load[(route_id, direction)][trip_index, stop_seq]
+        return min(float(load) / BUS_CAPACITY_STD, 1.0)
+
+    def departure_crowding(self, departures):
+        """(crowd_level, occupancy_ratio) for timetable departure dicts"""
+        crowding = []
+        for departure in departures:
+            ratio = self.occupancy(
+                departure["route_id"], departure["direction"],
+                departure["trip_index"], departure["stop_sequence"]
+            )
+            crowding.append((crowd_level(ratio), ratio))
+        return crowding
+
+    def trip_profile(self, route_id, direction, trip_index):
+        """Boardings, alightings and load leaving each stop of one trip"""
+        key = (route_id, direction)
+        pattern = self.source.patterns[key]
+        return [
+            {
+                "station": station,
+                "boardings": round(float(self.boardings[key][trip_index, seq]), 1),
+                "alightings": round(float(self.alightings[key][trip_index, seq]), 1),
+                "load": round(float(self.load[key][trip_index, seq]), 1)
+            }
+            for seq, station in enumerate(pattern.stops)
+        ]
+
+    def route_minute_occupancy(self, route_id):
+        """
+        Occupancy at the busiest stop of the route's trips in service, averaged
+        over those trips, for each minute of the day (0 when nothing runs)
+        """
+        minutes = np.arange(MINUTES_PER_DAY, dtype=float)
+        total = np.zeros(MINUTES_PER_DAY)
+        trips = np.zeros(MINUTES_PER_DAY)
+        for direction in (0, 1):
+            key = (route_id, direction)
+            pattern = self.source.patterns.get(key)
+            if pattern is None:
+                continue
+            peak = np.minimum(self.load[key].max(axis=1), BUS_CAPACITY_STD) / BUS_CAPACITY_STD
+            for shift in (0, MINUTES_PER_DAY):
+                m = minutes + shift
+                running = (pattern.departures[:, :1] <= m) & (pattern.arrivals[:, -1:] > m)
+                total += peak @ running
+                trips += running.sum(axis=0)
+        return np.divide(total, trips, out=np.zeros(MINUTES_PER_DAY), where=trips > 0)
+
+
+# Build at import (startup)
+passenger_load = PassengerLoad()
@@ -0,0 +1,170 @@
+"""
+📊 PRECOMPUTED PREDICTION TABLES
+Route × minute-of-day tables for /api/predict, built once at startup from the
+per-minute service profile and the passenger load model. A request is a
+single array lookup.
+
+Real-time variation comes from a seeded, smoothed noise model instead of a
+per-request RNG, so identical requests within a minute get identical answers
+and runs are comparable across restarts.
+"""
+
+import os
+import zlib
+
+import numpy as np
+
+from janmarg_data import (
+    COMMERCIAL_SPEED_KMH,
+    ROUTE_DISTANCES,
+    ROUTE_STATIONS,
+    BUS_CAPACITY_STD
+)
+from service_profile import service_profile
+from passenger_load import passenger_load, crowd_index, CROWD_LEVELS
+
+
+MINUTES_PER_DAY = 1440
+PREDICTION_SEED = int(os.getenv("PREDICTION_SEED", "42"))
+VARIATION_AMPLITUDE = 0.1   # ±10% for unpredictable events
+VARIATION_SMOOTHING_MIN = 15  # minutes over which variation drifts
+
+CROWD_STATUS = {
+    "High (CRITICAL)": "Heavy Traffic - High Demand",
+    "Moderate": "Normal Flow",
+    "Low": "Light Traffic - Low Demand"
+}
+
+
+def _route_seed(seed, route_id):
+    return (seed * 1_000_003 + zlib.crc32(str(route_id).encode("utf-8"))) & 0xFFFFFFFF
+
+
+def variation_curve(seed, route_id, size=MINUTES_PER_DAY):
+    """
+    Smooth, reproducible multiplier in [1 - amplitude, 1 + amplitude] per minute
+
+    Args:
+        seed: Global prediction seed
+        route_id: Route identifier (mixed into the seed)
+        size: Number of minutes
+
+    Returns:
+        float64 array of length size
+    """
+    rng = np.random.default_rng(_route_seed(seed, route_id))
+    noise = rng.standard_normal(size + VARIATION_SMOOTHING_MIN)
+    kernel = np.ones(VARIATION_SMOOTHING_MIN) / VARIATION_SMOOTHING_MIN
+    smooth = np.convolve(noise, kernel, mode="valid")[:size]
+    peak = np.max(np.abs(smooth)) or 1.0
+    return 1.0 + VARIATION_AMPLITUDE * (smooth / peak)
+
+
+class PredictionTable:
+    """Precomputed per-route, per-minute arrival/crowd/headway predictions"""
+
+    def __init__(self, seed=PREDICTION_SEED):
+        self.seed = seed
+        self.route_ids = list(ROUTE_DISTANCES.keys())
+        self.route_index = {route_id: i for i, route_id in enumerate(self.route_ids)}
+        self._build()
+
+    def _build(self):
+        n_routes = len(self.route_ids)
+        shape = (n_routes, MINUTES_PER_DAY)
+        profiles = [service_profile.table(r) for r in self.route_ids]
+
+        distance = np.array([ROUTE_DISTANCES[r] for r in self.route_ids])
+        stations = np.array([ROUTE_STATIONS[r] for r in self.route_ids])
+
+        self.base_travel_minutes = distance / COMMERCIAL_SPEED_KMH * 60
+        self.dwell_minutes = stations[:, None] * np.vstack([p.dwell_sec for p in profiles]) / 60
+
+        self.traffic_factor = np.round(np.vstack([p.traffic_factor for p in profiles]), 3)
+        self.headway = np.round(np.vstack([p.headway_min for p in profiles]), 2)
+        # Crowding from the passenger load model: peak-point occupancy of the trips in service
+        self.occupancy = np.vstack([passenger_load.route_minute_occupancy(r) for r in self.route_ids])
+        self.crowd_level = crowd_index(self.occupancy)
+        self.is_peak = np.vstack([p.peak for p in profiles])
+
+        self.variation = np.vstack([variation_curve(self.seed, r) for r in self.route_ids])
+        travel = self.base_travel_minutes[:, None] + self.dwell_minutes
+        self.arrival_minutes = np.rint(travel * self.traffic_factor * self.variation).astype(np.int32)
+
+        # Confidence: peak patterns are more predictable (88-96%) than off-peak (75-88%).
+        # Drawn once per route-minute from the seeded generator.
+        rng = np.random.default_rng(_route_seed(self.seed, "confidence"))
+        peak_conf = rng.integers(88, 97, size=shape)
+        offpeak_conf = rng.integers(75, 89, size=shape)
+        self.confidence = np.where(self.is_peak, peak_conf, offpeak_conf).astype(np.int16)
+
+    def has_route(self, route_id):
+        return route_id in self.route_index
+
+    def lookup(self, route_id, minute_of_day):
+        """
+        Prediction row for one route at one minute
+
+        Args:
+            route_id: Route identifier
+            minute_of_day: 0-1439
+
+        Returns:
+            Dict of plain Python values
+        """
+        return self.lookup_many([route_id], minute_of_day)[0]
+
+    def lookup_many(self, route_ids, minute_of_day):
+        """
+        Prediction rows for many routes at one minute, gathered in one pass
+
+        Args:
+            route_ids: Sequence of route identifiers (repeats allowed)
+            minute_of_day: 0-1439
+
+        Returns:
+            List of dicts, one per route_id, in input order
+        """
+        r = np.fromiter((self.route_index[route_id] for route_id in route_ids), dtype=np.intp)
+        m = int(minute_of_day) % MINUTES_PER_DAY
+
+        occupancy = self.occupancy[r, m]
+        columns = zip(
+            route_ids,
+            self.arrival_minutes[r, m].tolist(),
+            self.crowd_level[r, m].tolist(),
+            self.confidence[r, m].tolist(),
+            self.base_travel_minutes[r].tolist(),
+            self.dwell_minutes[r, m].tolist(),
+            self.traffic_factor[r, m].tolist(),
+            self.variation[r, m].tolist(),
+            occupancy.tolist(),
+            (BUS_CAPACITY_STD * occupancy).astype(np.int32).tolist(),
+            self.headway[r, m].tolist()
+        )
+
+        rows = []
+        for (route_id, arrival, crowd, confidence, base_travel, dwell,
+             traffic, variation, occupancy_ratio, passengers, headway) in columns:
+            crowd_level = CROWD_LEVELS[crowd]
+            rows.append({
+                "arrival_minutes": arrival,
+                "crowd_level": crowd_level,
+                "status": CROWD_STATUS[crowd_level],
+                "confidence": confidence,
+                "distance_km": ROUTE_DISTANCES[route_id],
+                "stations_count": ROUTE_STATIONS[route_id],
+                "base_travel_time": base_travel,
+                "dwell_time_total": dwell,
+                "traffic_factor": traffic,
+                "variation_factor": variation,
+                "occupancy_ratio": occupancy_ratio,
+                "current_passengers": passengers,
+                "capacity": BUS_CAPACITY_STD,
+                "headway": headway
+            })
+        return rows
+
+
+# Build tables at import (startup)
+prediction_table = PredictionTable()
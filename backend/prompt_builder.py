@@ -0,0 +1,201 @@
+"""
+📐 TOKEN-BUDGETED PROMPT BUILDER
+Assembles the Groq chat prompt under a hard token budget so prompt size (and
+therefore LLM latency) stays bounded no matter how long a conversation runs.
+"""
+
+import os
+import re
+
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("CHAT_PROMPT_TOKEN_BUDGET", "1200"))
+HISTORY_RECENT_TURNS = int(os.getenv("CHAT_HISTORY_RECENT_TURNS", "4"))
+HISTORY_TURN_MAX_TOKENS = 120     # cap for each verbatim recent turn
+HISTORY_SUMMARY_MAX_TOKENS = 80   # cap for the one-line digest of older turns
+HISTORY_BUDGET_SHARE = 0.35       # share of the free budget history may use
+USER_CONTEXT_BUDGET_SHARE = 0.2   # share of the whole budget the trip context may use
+
+CHARS_PER_TOKEN = 4
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset((
+    "the", "a", "an", "is", "are", "to", "of", "in", "on", "for", "and", "or",
+    "what", "how", "i", "me", "my", "do", "does", "from", "at", "by", "it", "be"
+))
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)"""
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to roughly max_tokens, on a word boundary when possible"""
+    text = text or ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens - 1) * CHARS_PER_TOKEN
+    cut = text[:limit]
+    space = cut.rfind(" ")
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "…"
+
+
+def _words(text):
+    return {w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS}
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+class PromptBuilder:
+    """Builds Groq chat messages that never exceed the configured token budget"""
+
+    def __init__(self, budget=PROMPT_TOKEN_BUDGET, recent_turns=HISTORY_RECENT_TURNS):
+        self.budget = budget
+        self.recent_turns = recent_turns
+
+    def _select_history(self, history, budget):
+        turns = []
+        seen = set()
+        for item in history or []:
+            if not isinstance(item, dict):
+                continue
+            role = item.get("role")
+            content = str(item.get("content") or "").strip()
+            if role not in ("user", "assistant") or not content:
+                continue
+            key = (role, _normalize(content))
+            if key in seen:
+                continue
+            seen.add(key)
+            turns.append({"role": role, "content": content})
+
+        recent = turns[-self.recent_turns:] if self.recent_turns else []
+        older = turns[:len(turns) - len(recent)]
+
+        kept = []
+        used = 0
+        for turn in reversed(recent):
+            content = truncate_to_tokens(turn["content"], HISTORY_TURN_MAX_TOKENS)
+            cost = estimate_tokens(content)
+            if used + cost > budget:
+                older = turns[:turns.index(turn) + 1]
+                break
+            kept.insert(0, {"role": turn["role"], "content": content})
+            used += cost
+
+        summary = ""
+        questions = [t["content"] for t in older if t["role"] == "user"]
+        if questions and budget - used >= 16:
+            digest = "; ".join(truncate_to_tokens(q, 16) for q in questions[-6:])
+            summary = truncate_to_tokens(
+                f"Earlier in this conversation the user asked: {digest}",
+                min(HISTORY_SUMMARY_MAX_TOKENS, budget - used)
+            )
+            used += estimate_tokens(summary)
+
+        return kept, summary, used, len(older)
+
+    def _select_context(self, official_context, query, exclude, budget):
+        lines = []
+        seen = set(exclude)
+        for line in (official_context or "").splitlines():
+            clean = " ".join(line.split())
+            key = _normalize(clean)
+            if not clean or key in seen:
+                continue
+            seen.add(key)
+            lines.append(clean)
+
+        query_words = _words(query)
+        ranked = sorted(
+            range(len(lines)),
+            key=lambda i: (-len(query_words & _words(lines[i])), i)
+        )
+
+        chosen = []
+        used = 0
+        for i in ranked:
+            cost = estimate_tokens(lines[i]) + 1
+            if used + cost > budget:
+                continue
+            chosen.append(i)
+            used += cost
+
+        return [lines[i] for i in sorted(chosen)], len(lines)
+
+    def build(self, query, official_context, user_context=None, history=None):
+        """
+        Assemble chat messages under the token budget
+
+        Args:
+            query: Current user question
+            official_context: Extracted report text (one fact per line)
+            user_context: Optional trip context string
+            history: Prior turns [{"role": "user"|"assistant", "content": "..."}]
+
+        Returns:
+            (messages, stats) where stats reports the estimated prompt tokens,
+            budget, and how much context/history was kept or compacted
+        """
+        # A single oversized message must not be able to blow the budget
+        query = truncate_to_tokens(query, max(32, self.budget // 2))
+
+        context_block = ""
+        user_context_cut = False
+        if user_context:
+            kept_context = truncate_to_tokens(user_context, int(self.budget * USER_CONTEXT_BUDGET_SHARE))
+            user_context_cut = kept_context != user_context
+            context_block = f"\nUSER CONTEXT (not authoritative): {kept_context}"
+
+        preamble = (
+            "You are the Janmarg AI Assistant. Answer the user's question strictly "
+            "using the following context from the World Bank GEF Report. CONTEXT: "
+        )
+        closing = (
+            f" {context_block} "
+            "If the answer is not in the text, say "
+            "\"I can only answer based on official BRTS protocols.\""
+        )
+
+        fixed_tokens = estimate_tokens(preamble) + estimate_tokens(closing) + estimate_tokens(query)
+        free = max(0, self.budget - fixed_tokens)
+
+        history_turns, summary, history_tokens, compacted = self._select_history(
+            history, int(free * HISTORY_BUDGET_SHARE)
+        )
+
+        history_text = {_normalize(t["content"]) for t in history_turns}
+        context_lines, total_lines = self._select_context(
+            official_context, query, history_text, free - history_tokens
+        )
+
+        context_text = "\n".join(context_lines)
+        if summary:
+            context_text = f"{context_text}\n{summary}" if context_text else summary
+        system_prompt = f"{preamble}{context_text}{closing}"
+
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(history_turns)
+        messages.append({"role": "user", "content": query})
+
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        stats = {
+            "prompt_tokens": prompt_tokens,
+            "budget": self.budget,
+            "context_lines": len(context_lines),
+            "context_lines_available": total_lines,
+            "history_turns": len(history_turns),
+            "history_compacted": compacted,
+            "truncated": len(context_lines) < total_lines or compacted > 0 or user_context_cut
+        }
+        return messages, stats
+
+
+# Initialize builder
+prompt_builder = PromptBuilder()
@@ -0,0 +1,179 @@
+"""
+🔀 K-SHORTEST ROUTE ALTERNATIVES
+Static network graph (one node per station on each route) and Yen's
+algorithm for the k best loopless journeys. Ride edges use stop-to-stop
+run time at the hour's mean traffic factor from the service profile;
+changing routes costs the platform change plus half a headway (the
+expected wait) plus a fixed penalty, so a transfer only wins when it
+actually saves time.
+"""
+
+import heapq
+
+from janmarg_data import COMMERCIAL_SPEED_KMH
+from service_profile import service_profile
+from timetable import MIN_TRANSFER_MIN
+from transit_network import ROUTES, STOP_CHAINAGE_KM, STATION_ROUTES
+
+
+SOURCE = ("__source__", None)
+SINK = ("__sink__", None)
+MAX_K = 10
+TRANSFER_PENALTY_MIN = 5.0  # perceived cost of changing buses
+
+
+class RouteGraph:
+    """Station-on-route graph for one hour of the day"""
+
+    def __init__(self, hour):
+        self.hour = hour
+        self.edges = {}
+        headway = {}
+
+        for route_id, route in ROUTES.items():
+            profile = service_profile.table(route_id)
+            traffic = profile.hourly("traffic_factor")[hour]
+            dwell_min = profile.hourly("dwell_sec")[hour] / 60
+            headway[route_id] = profile.hourly("headway_min")[hour]
+            stops = route['stops']
+            chainage = STOP_CHAINAGE_KM[route_id]
+            for i in range(len(stops) - 1):
+                km = abs(chainage[i + 1] - chainage[i])
+                minutes = km / COMMERCIAL_SPEED_KMH * 60 * traffic + dwell_min
+                a, b = (stops[i], route_id), (stops[i + 1], route_id)
+                self._add(a, b, minutes)
+                self._add(b, a, minutes)
+
+        for station, served in STATION_ROUTES.items():
+            for route_a, _ in served:
+                for route_b, _ in served:
+                    if route_a != route_b:
+                        transfer_min = MIN_TRANSFER_MIN + headway[route_b] / 2 + TRANSFER_PENALTY_MIN
+                        self._add((station, route_a), (station, route_b), transfer_min)
+
+    def _add(self, a, b, weight):
+        self.edges.setdefault(a, {})[b] = weight
+
+    def _neighbours(self, node, origin, destination):
+        if node == SOURCE:
+            return {(origin, route_id): 0.0 for route_id, _ in STATION_ROUTES[origin]}
+        neighbours = dict(self.edges.get(node, {}))
+        if node[0] == destination:
+            neighbours[SINK] = 0.0
+        return neighbours
+
+    def _shortest(self, origin, destination, start, banned_edges, banned_nodes):
+        dist = {start: 0.0}
+        previous = {}
+        heap = [(0.0, 0, start)]
+        counter = 1
+        while heap:
+            d, _, node = heapq.heappop(heap)
+            if node == SINK:
+                path = [node]
+                while path[-1] in previous:
+                    path.append(previous[path[-1]])
+                path.reverse()
+                return d, path
+            if d > dist.get(node, float("inf")):
+                continue
+            for neighbour, weight in self._neighbours(node, origin, destination).items():
+                if neighbour in banned_nodes or (node, neighbour) in banned_edges:
+                    continue
+                nd = d + weight
+                if nd < dist.get(neighbour, float("inf")):
+                    dist[neighbour] = nd
+                    previous[neighbour] = node
+                    heapq.heappush(heap, (nd, counter, neighbour))
+                    counter += 1
+        return None
+
+    def _cost(self, path, origin, destination):
+        return sum(
+            self._neighbours(a, origin, destination)[b]
+            for a, b in zip(path, path[1:])
+        )
+
+    def k_shortest(self, origin, destination, k):
+        """
+        Yen's k shortest loopless paths from origin to destination
+
+        Args:
+            origin: Canonical station name
+            destination: Canonical station name
+            k: Number of paths (capped at MAX_K)
+
+        Returns:
+            List of (cost_minutes, node_path), cheapest first
+        """
+        k = max(1, min(k, MAX_K))
+        first = self._shortest(origin, destination, SOURCE, set(), set())
+        if first is None:
+            return []
+        found = [first]
+        candidates = []
+        seen = {tuple(first[1])}
+        # Node paths that only differ by a zero-length hop are the same journey
+        seen_legs = {tuple(path_legs(first[1]))}
+
+        while len(found) < k:
+            _, last_path = found[-1]
+            for i in range(len(last_path) - 1):
+                spur_node = last_path[i]
+                root = last_path[:i + 1]
+                banned_edges = {
+                    (path[i], path[i + 1])
+                    for _, path in found
+                    if len(path) > i + 1 and path[:i + 1] == root
+                }
+                banned_nodes = set(root[:-1])
+                spur = self._shortest(origin, destination, spur_node, banned_edges, banned_nodes)
+                if spur is None:
+                    continue
+                path = root[:-1] + spur[1]
+                key = tuple(path)
+                if key in seen:
+                    continue
+                seen.add(key)
+                heapq.heappush(candidates, (self._cost(path, origin, destination), len(seen), path))
+            while candidates:
+                cost, _, path = heapq.heappop(candidates)
+                legs = tuple(path_legs(path))
+                if legs not in seen_legs:
+                    seen_legs.add(legs)
+                    found.append((cost, path))
+                    break
+            else:
+                break
+        return found
+
+
+def path_legs(path):
+    """
+    Collapse a node path into rides
+
+    Returns:
+        [(route_id, from_station, to_station), ...]
+    """
+    nodes = [node for node in path if node not in (SOURCE, SINK)]
+    legs = []
+    start = nodes[0]
+    for previous, node in zip(nodes, nodes[1:]):
+        if node[1] != previous[1]:
+            if previous[0] != start[0]:
+                legs.append((start[1], start[0], previous[0]))
+            start = node
+    if nodes[-1][0] != start[0]:
+        legs.append((start[1], start[0], nodes[-1][0]))
+    return legs
+
+
+_GRAPHS = {}
+
+
+def graph_for_hour(hour):
+    """Graphs are tiny; build one per hour on first use and keep it"""
+    graph = _GRAPHS.get(hour)
+    if graph is None:
+        graph = _GRAPHS[hour] = RouteGraph(hour)
+    return graph
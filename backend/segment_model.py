@@ -0,0 +1,310 @@
+"""
+📈 LEARNED SEGMENT TRAVEL TIMES
+Offline pipeline from recorded vehicle tracks to a compact per-segment,
+per-15-minute travel-time table.
+
+1. Tracks (CSV or JSON lines, same fields as AVL pings) are map-matched to
+   the route traces and split into trips.
+2. Stop passages are interpolated on each trip's monotone chainage; the
+   time between consecutive stops is one segment sample (run + dwell).
+3. Samples go into log-spaced histogram sketches, one per segment and
+   15-minute bucket (relative error ~2%). Sketches only ever add counts, so
+   new files are folded into the saved state without touching history.
+4. The table written for the server holds p10/p50/p90 and the sample count
+   per segment and bucket.
+
+CLI:
+    python segment_model.py tracks_2026_10.csv more_tracks.ndjson
+    python segment_model.py --reset tracks.csv        # start a fresh sketch
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+from timetable import timetable, MINUTES_PER_DAY
+from vehicle_tracks import RouteMatcher
+from transit_network import STOP_CHAINAGE_KM
+
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+SEGMENT_SKETCH_PATH = os.getenv("SEGMENT_SKETCH_PATH", os.path.join(MODEL_DIR, "segment_sketch.npz"))
+SEGMENT_TIMES_PATH = os.getenv("SEGMENT_TIMES_PATH", os.path.join(MODEL_DIR, "segment_times.npz"))
+
+BUCKET_MIN = 15
+BUCKETS = MINUTES_PER_DAY // BUCKET_MIN
+SKETCH_MIN_MINUTES = 0.05
+SKETCH_GAMMA = 1.04            # bin width ratio: ~2% relative error
+SKETCH_BINS = 220              # covers 0.05 .. ~280 minutes
+MIN_SAMPLES = int(os.getenv("SEGMENT_MIN_SAMPLES", "5"))
+TRIP_GAP_SEC = 600             # a silence this long starts a new trip
+STOP_TOLERANCE_KM = 0.03       # a track starting/ending this close to a stop still passes it
+TURNAROUND_KM = 0.3            # backing off this far from the running extreme starts a new trip
+QUANTILES = (0.1, 0.5, 0.9)
+
+
+def segment_keys():
+    """Segment order shared by the sketch and the table: (route_id, direction, seq in travel order)"""
+    return [
+        (pattern.route_id, pattern.direction, seq)
+        for pattern in timetable.patterns.values()
+        for seq in range(len(pattern.stops) - 1)
+    ]
+
+
+def _bin_values():
+    edges = SKETCH_MIN_MINUTES * SKETCH_GAMMA ** np.arange(SKETCH_BINS + 1)
+    return np.sqrt(edges[:-1] * edges[1:])
+
+
+def sketch_bins(minutes):
+    minutes = np.maximum(np.asarray(minutes, dtype=float), SKETCH_MIN_MINUTES)
+    bins = np.floor(np.log(minutes / SKETCH_MIN_MINUTES) / np.log(SKETCH_GAMMA)).astype(np.intp)
+    return np.clip(bins, 0, SKETCH_BINS - 1)
+
+
+def read_tracks(path):
+    """Rows with vehicle_id, timestamp, lat, lng and optionally route_id, direction, trip_id"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".ndjson", ".jsonl", ".json")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    for row in rows:
+        row["timestamp"] = float(row["timestamp"])
+        row["lat"] = float(row["lat"])
+        row["lng"] = float(row["lng"])
+        if row.get("direction") not in (None, ""):
+            row["direction"] = int(row["direction"])
+        else:
+            row["direction"] = None
+    return rows
+
+
+def _split_trips(ts, km, stated):
+    """Index ranges of single-direction runs within one vehicle's time-ordered track"""
+    trips = []
+    start = 0
+    high = low = km[0]
+    for i in range(1, len(ts)):
+        boundary = ts[i] - ts[i - 1] > TRIP_GAP_SEC or (stated[i] != stated[i - 1])
+        if not boundary and stated[i] is None:
+            high, low = max(high, km[i]), min(low, km[i])
+            rising = km[i - 1] >= km[start]
+            boundary = (high - km[i] > TURNAROUND_KM) if rising else (km[i] - low > TURNAROUND_KM)
+        if boundary:
+            trips.append((start, i))
+            start = i
+            high = low = km[i]
+    trips.append((start, len(ts)))
+    return trips
+
+
+class SegmentSketch:
+    """Per-segment, per-bucket log histograms of stop-to-stop times"""
+
+    def __init__(self):
+        self.keys = segment_keys()
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.counts = np.zeros((len(self.keys), BUCKETS, SKETCH_BINS), dtype=np.uint32)
+        self.samples = 0
+        self.matcher = RouteMatcher()
+
+    @classmethod
+    def load(cls, path=SEGMENT_SKETCH_PATH):
+        sketch = cls()
+        if os.path.exists(path):
+            with np.load(path) as data:
+                saved_keys = [tuple(k.split(":")) for k in data["keys"].tolist()]
+                for i, (route_id, direction, seq) in enumerate(saved_keys):
+                    j = sketch.index.get((route_id, int(direction), int(seq)))
+                    if j is not None:
+                        sketch.counts[j] += data["counts"][i]
+                sketch.samples = int(data["samples"])
+        return sketch
+
+    def save(self, path=SEGMENT_SKETCH_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(
+            path,
+            keys=np.array([f"{r}:{d}:{s}" for r, d, s in self.keys]),
+            counts=self.counts,
+            samples=np.int64(self.samples)
+        )
+
+    def add(self, segments, start_minutes, minutes):
+        """Fold samples in: segments (index), start minute of day, duration in minutes"""
+        buckets = (np.asarray(start_minutes, dtype=np.intp) % MINUTES_PER_DAY) // BUCKET_MIN
+        np.add.at(self.counts, (np.asarray(segments, dtype=np.intp), buckets, sketch_bins(minutes)), 1)
+        self.samples += len(segments)
+
+    def ingest_rows(self, rows):
+        """Map-match recorded rows, extract stop-to-stop samples and add them"""
+        if not rows:
+            return 0
+        route_index, chainage, _ = self.matcher.match(
+            [str(row.get("route_id", "")) for row in rows],
+            [row["lat"] for row in rows],
+            [row["lng"] for row in rows]
+        )
+        tracks = {}
+        for row, r, km in zip(rows, route_index.tolist(), chainage.tolist()):
+            if r < 0:
+                continue
+            key = (row["vehicle_id"], row.get("trip_id") or "")
+            tracks.setdefault(key, []).append((row["timestamp"], km, r, row["direction"]))
+
+        segments, starts, durations = [], [], []
+        for points in tracks.values():
+            points.sort()
+            ts = np.array([p[0] for p in points])
+            km = np.array([p[1] for p in points])
+            stated = [p[3] for p in points]
+            for a, b in _split_trips(ts, km, stated):
+                if b - a < 2:
+                    continue
+                route_id = self.matcher.route_ids[points[a][2]]
+                direction = stated[a] if stated[a] is not None else (0 if km[b - 1] > km[a] else 1)
+                self._trip_samples(route_id, direction, ts[a:b], km[a:b], segments, starts, durations)
+
+        if segments:
+            self.add(segments, starts, durations)
+        return len(segments)
+
+    def _trip_samples(self, route_id, direction, ts, km, segments, starts, durations):
+        stops = STOP_CHAINAGE_KM[route_id]
+        n = len(stops)
+        # Monotone chainage in the direction of travel hides GPS jitter backwards
+        if direction == 0:
+            along = np.maximum.accumulate(km)
+            covered = (stops >= along[0] - STOP_TOLERANCE_KM) & (stops <= along[-1] + STOP_TOLERANCE_KM)
+            passed = np.interp(stops, along, ts)
+        else:
+            along = np.minimum.accumulate(km)
+            covered = (stops <= along[0] + STOP_TOLERANCE_KM) & (stops >= along[-1] - STOP_TOLERANCE_KM)
+            passed = np.interp(-stops, -along, ts)
+        for k in np.flatnonzero(covered).tolist():
+            nxt = k + 1 if direction == 0 else k - 1
+            if not (0 <= nxt < n) or not covered[nxt]:
+                continue
+            seq = k if direction == 0 else n - 1 - k
+            duration = (passed[nxt] - passed[k]) / 60
+            if duration <= 0:
+                continue
+            segments.append(self.index[(route_id, direction, seq)])
+            local = time.localtime(passed[k])
+            starts.append(local.tm_hour * 60 + local.tm_min)
+            durations.append(duration)
+
+    def table(self):
+        """(quantiles (segments × buckets × len(QUANTILES)) float32, counts (segments × buckets) uint32)"""
+        cumulative = np.cumsum(self.counts, axis=2, dtype=np.int64)
+        totals = cumulative[:, :, -1]
+        values = _bin_values()
+        quantiles = np.full(totals.shape + (len(QUANTILES),), np.nan, dtype=np.float32)
+        for i, q in enumerate(QUANTILES):
+            target = np.maximum(np.ceil(q * totals), 1)[:, :, None]
+            first = (cumulative >= target).argmax(axis=2)
+            quantiles[:, :, i] = np.where(totals > 0, values[first], np.nan)
+        return quantiles, totals.astype(np.uint32)
+
+    def write_table(self, path=SEGMENT_TIMES_PATH):
+        quantiles, counts = self.table()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(
+            path,
+            keys=np.array([f"{r}:{d}:{s}" for r, d, s in self.keys]),
+            quantiles=quantiles,
+            counts=counts,
+            bucket_minutes=np.int32(BUCKET_MIN)
+        )
+
+
+class SegmentTimes:
+    """Learned lookup table used by the ETA endpoints (empty if not trained)"""
+
+    def __init__(self, path=SEGMENT_TIMES_PATH):
+        self.index = {}
+        self.quantiles = None
+        self.counts = None
+        if os.path.exists(path):
+            with np.load(path) as data:
+                for i, key in enumerate(data["keys"].tolist()):
+                    route_id, direction, seq = key.split(":")
+                    self.index[(route_id, int(direction), int(seq))] = i
+                self.quantiles = data["quantiles"]
+                self.counts = data["counts"]
+
+    @property
+    def available(self):
+        return self.quantiles is not None
+
+    def segment(self, route_id, direction, seq, minute_of_day):
+        """
+        Learned (p10, p50, p90, samples) for one segment at one time, or None
+        when untrained or with fewer than MIN_SAMPLES samples in the bucket
+        """
+        if not self.available:
+            return None
+        i = self.index.get((route_id, direction, seq))
+        if i is None:
+            return None
+        bucket = (int(minute_of_day) % MINUTES_PER_DAY) // BUCKET_MIN
+        samples = int(self.counts[i, bucket])
+        if samples < MIN_SAMPLES:
+            return None
+        p10, p50, p90 = (float(v) for v in self.quantiles[i, bucket])
+        return p10, p50, p90, samples
+
+    def ride(self, route_id, direction, from_seq, to_seq, minute_of_day):
+        """
+        Summed learned quantiles over consecutive segments (travel order),
+        advancing the clock segment by segment; None if any segment is unknown
+
+        Returns:
+            (p10_sum, p50_sum, p90_sum, min_samples)
+        """
+        total = [0.0, 0.0, 0.0]
+        fewest = None
+        clock = minute_of_day
+        for seq in range(from_seq, to_seq):
+            found = self.segment(route_id, direction, seq, clock)
+            if found is None:
+                return None
+            for i in range(3):
+                total[i] += found[i]
+            fewest = found[3] if fewest is None else min(fewest, found[3])
+            clock += found[1]
+        return total[0], total[1], total[2], fewest
+
+
+segment_times = SegmentTimes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold recorded vehicle tracks into the segment travel-time model")
+    parser.add_argument("files", nargs="+", help="CSV or JSON-lines track files")
+    parser.add_argument("--sketch", default=SEGMENT_SKETCH_PATH, help="Sketch state to update")
+    parser.add_argument("--output", default=SEGMENT_TIMES_PATH, help="Lookup table for the server")
+    parser.add_argument("--reset", action="store_true", help="Ignore the saved sketch and start over")
+    args = parser.parse_args()
+
+    sketch = SegmentSketch() if args.reset else SegmentSketch.load(args.sketch)
+    before = sketch.samples
+    for path in args.files:
+        added = sketch.ingest_rows(read_tracks(path))
+        print(f"{path}: {added} segment samples")
+    sketch.save(args.sketch)
+    sketch.write_table(args.output)
+    _, counts = sketch.table()
+    trained = int((counts >= MIN_SAMPLES).sum())
+    print(f"Samples: {before} -> {sketch.samples}; segment-buckets with >= {MIN_SAMPLES} samples: {trained}")
+    print(f"Wrote {args.sketch} and {args.output}")
+
+
+if __name__ == "__main__":
+    main()
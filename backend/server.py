@@ -1,13 +1,15 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
-import random
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from math import radians, sin, cos, sqrt, atan2
 import os
 import json
+import asyncio
 import socket
 import time
 import re
+import hashlib
 from urllib import request as urllib_request
 from urllib.error import URLError
 from janmarg_data import (
@@ -21,11 +23,6 @@ from janmarg_data import (
     ROUTE_7_STOPS,
     ROUTE_15_STOPS,
     ROUTE_4_STOPS,
-    AVG_DIST_BETWEEN_STOPS_KM,
-    is_peak_hour,
-    get_traffic_factor,
-    get_occupancy_level,
-    get_headway,
     ROUTE_1_FULL_TRACE,
     ROUTE_1_INDICES,
     ROUTE_15_FULL_TRACE,
@@ -34,17 +31,49 @@ from janmarg_data import (
     ROUTE_7_INDICES,
     ROUTE_4_FULL_TRACE,
     ROUTE_4_INDICES,
-    FARE_BASE_INR,
-    FARE_PER_KM_INR
-)
-from janmarg_config import (
-    is_peak_hour as is_peak_hour_config,
-    get_headway as get_headway_config,
-    get_traffic_factor as get_traffic_factor_config,
-    get_crowd_level
+    HEADWAY_PEAK,
+    HEADWAY_OFFPEAK,
+    BUS_CAPACITY_STD,
+    BUS_CAPACITY_ART
 )
+from janmarg_config import get_crowd_level
+from service_profile import service_profile, DAY_TYPES, WEEKDAY, FIELDS as PROFILE_FIELDS
 from ai_agent import transit_ai
 from ai_engine import JanmargBrain
+from chat_sessions import chat_sessions
+from prediction_tables import prediction_table, MINUTES_PER_DAY
+from passenger_load import passenger_load
+from timetable import timetable, minute_of_day, format_clock, SERVICE_START_MIN, SERVICE_END_MIN
+from transit_network import (
+    ROUTES,
+    DIRECTION_LABELS,
+    STATIONS,
+    STATION_ROUTES,
+    STATION_COORDS,
+    canonical_station,
+    direction_between
+)
+from journey_planner import journey_planner
+from eta_distribution import itinerary_distribution, ETA_SAMPLES, ETA_SAMPLES_MAX
+from determinism import clock, seed_for, stable_uniform, seconds_left_in_bucket, DETERMINISTIC_MODE
+from fares import fare_engine
+from isochrone import isochrone_polygon
+from fleet_simulator import fleet
+from fleet_stream import broadcaster, Subscription, validate_subscription
+from gtfs_realtime import decode_vehicle_positions
+from vehicle_tracks import vehicle_tracks, parse_json_lines
+from od_matrix import od_matrix, OD_FORMATS, OD_BUCKET_MIN_DEFAULT
+from route_graph import graph_for_hour, path_legs
+from intent_engine import (
+    intent_engine,
+    INTENT_ROUTE_GUIDANCE,
+    INTENT_FARE,
+    INTENT_STOPS,
+    INTENT_HEADWAY,
+    INTENT_PEAK_HOURS,
+    INTENT_CAPACITY,
+    INTENT_GREETING
+)
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -57,6 +86,13 @@ app = FastAPI(
 
 janmarg_brain = JanmargBrain()
 
+ROUTE_STOPS_MAP = {
+    '1': ROUTE_1_STOPS,
+    '7': ROUTE_7_STOPS,
+    '15': ROUTE_15_STOPS,
+    '4': ROUTE_4_STOPS
+}
+
 # Enable CORS for all origins (allows React frontend to communicate)
 app.add_middleware(
     CORSMiddleware,
@@ -66,13 +102,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+if DETERMINISTIC_MODE:
+    @app.middleware("http")
+    async def etag_responses(request: Request, call_next):
+        """
+        Deterministic mode: JSON GET responses are stable within a time bucket,
+        so tag them with a body hash, answer If-None-Match with 304 and let
+        clients cache until the bucket ends
+        """
+        response = await call_next(request)
+        if (request.method != "GET" or response.status_code != 200
+                or response.headers.get("content-type") != "application/json"):
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        tagged = Response(content=body, status_code=200, headers=dict(response.headers))
+        # MutableHeaders match case-insensitively: an endpoint's own
+        # cache-control (e.g. no-cache for live data) wins, nothing is doubled
+        tagged.headers["ETag"] = etag
+        tagged.headers.setdefault("Cache-Control", f"max-age={max(0, int(seconds_left_in_bucket()))}")
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={
+                "ETag": etag, "Cache-Control": tagged.headers["cache-control"]
+            })
+        return tagged
+
+
 @app.get("/")
 def root():
     """Health check endpoint"""
     return {
         "status": "Transit Flow AI Backend is running",
         "version": "2.0.0 - Knowledge-Driven Physics Engine",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": clock().isoformat()
     }
 
 @app.get("/api/predict/{route_id}")
@@ -90,79 +153,41 @@ def predict_route(route_id: str):
     if route_id not in ROUTE_DISTANCES:
         raise HTTPException(status_code=404, detail=f"Route {route_id} not found")
     
-    # Get current real-time hour
-    current_hour = datetime.now().hour
-    
-    # ========== PHYSICS-BASED CALCULATION ==========
-    # Get route distance from knowledge base
-    distance_km = ROUTE_DISTANCES[route_id]
-    num_stations = ROUTE_STATIONS[route_id]
-    
-    # Calculate base travel time using commercial speed
-    # Formula: Time = Distance / Speed
-    travel_time_hours = distance_km / COMMERCIAL_SPEED_KMH
-    travel_time_minutes = travel_time_hours * 60
-    
-    # Add dwell time for all stations (convert seconds to minutes)
-    total_dwell_minutes = (num_stations * DWELL_TIME_SEC) / 60
-    
-    # Apply traffic congestion factor based on time of day
-    traffic_factor = get_traffic_factor(current_hour)
-    
-    # Add random real-time variation (±10% for unpredictable events)
-    random_factor = random.uniform(0.9, 1.1)
-    
-    # Calculate final arrival time
-    arrival_time = (travel_time_minutes + total_dwell_minutes) * traffic_factor * random_factor
-    arrival_minutes = int(round(arrival_time))
-    
-    # ========== CROWD PREDICTION ==========
-    crowd_level, occupancy_ratio = get_occupancy_level(current_hour)
-    
-    # Calculate actual passenger count
-    bus_capacity = 80  # Standard bus
-    current_passengers = int(bus_capacity * occupancy_ratio)
-    
-    # Determine status based on crowd level
-    if "CRITICAL" in crowd_level:
-        status = "Heavy Traffic - High Demand"
-    elif crowd_level == "Moderate":
-        status = "Normal Flow"
-    else:
-        status = "Light Traffic - Low Demand"
-    
-    # ========== CONFIDENCE CALCULATION ==========
-    # Higher confidence during peak hours (more predictable patterns)
-    if is_peak_hour(current_hour):
-        confidence = random.randint(88, 96)
-    else:
-        confidence = random.randint(75, 88)
-    
-    # Get next bus frequency
-    headway = get_headway(current_hour)
-    
-    # Return physics-based prediction
+    # Get current real-time minute of day
+    now = clock()
+
+    # ========== PRECOMPUTED PHYSICS LOOKUP ==========
+    # Travel time = distance / commercial speed + dwell at every station,
+    # scaled by the traffic factor and a seeded variation for this minute
+    row = prediction_table.lookup(route_id, now.hour * 60 + now.minute)
+    return _prediction_payload(route_id, row, now)
+
+
+def _prediction_payload(route_id, row, now):
+    """Shape one prediction table row as the /api/predict response"""
+    headway = row["headway"]
     return {
         "route_id": route_id,
-        "arrival_time": f"{arrival_minutes} min",
-        "crowd_level": crowd_level,
-        "status": status,
-        "confidence": f"{confidence}%",
-        "timestamp": datetime.now().isoformat(),
-        "current_hour": current_hour,
+        "arrival_time": f"{row['arrival_minutes']} min",
+        "crowd_level": row["crowd_level"],
+        "status": row["status"],
+        "confidence": f"{row['confidence']}%",
+        "timestamp": now.isoformat(),
+        "current_hour": now.hour,
         # Additional physics data
         "physics": {
-            "distance_km": distance_km,
+            "distance_km": row["distance_km"],
             "commercial_speed": f"{COMMERCIAL_SPEED_KMH} km/h",
-            "base_travel_time": round(travel_time_minutes, 1),
-            "dwell_time_total": round(total_dwell_minutes, 1),
-            "traffic_factor": traffic_factor,
-            "stations_count": num_stations
+            "base_travel_time": round(row["base_travel_time"], 1),
+            "dwell_time_total": round(row["dwell_time_total"], 1),
+            "traffic_factor": row["traffic_factor"],
+            "variation_factor": round(row["variation_factor"], 3),
+            "stations_count": row["stations_count"]
         },
         "occupancy": {
-            "current_passengers": current_passengers,
-            "capacity": bus_capacity,
-            "percentage": f"{int(occupancy_ratio * 100)}%"
+            "current_passengers": row["current_passengers"],
+            "capacity": row["capacity"],
+            "percentage": f"{int(row['occupancy_ratio'] * 100)}%"
         },
         "frequency": {
             "next_bus_in": f"{headway} min",
@@ -170,6 +195,45 @@ def predict_route(route_id: str):
         }
     }
 
+
+@app.post("/api/predict/batch")
+def predict_batch(request_data: dict):
+    """
+    Predictions for many routes in one call
+
+    Request:
+    {
+        "routes": ["1", "15"]      # or "all"
+    }
+
+    Returns:
+        One shared timestamp and a prediction per route (same shape as /api/predict/{route_id});
+        unknown routes are reported in "errors" instead of failing the batch
+    """
+    requested = request_data.get("routes", "all")
+    if requested == "all" or requested is None:
+        requested = prediction_table.route_ids
+    if not isinstance(requested, list):
+        raise HTTPException(status_code=400, detail="routes must be a list of route ids or \"all\"")
+
+    route_ids = [str(route_id) for route_id in requested]
+    known = [route_id for route_id in route_ids if prediction_table.has_route(route_id)]
+    errors = [
+        {"route_id": route_id, "detail": f"Route {route_id} not found"}
+        for route_id in route_ids if not prediction_table.has_route(route_id)
+    ]
+
+    now = clock()
+    rows = prediction_table.lookup_many(known, now.hour * 60 + now.minute)
+    return {
+        "count": len(rows),
+        "current_hour": now.hour,
+        "timestamp": now.isoformat(),
+        "predictions": [_prediction_payload(route_id, row, now) for route_id, row in zip(known, rows)],
+        "errors": errors
+    }
+
+
 @app.get("/api/station-info")
 def get_station_info():
     """
@@ -200,10 +264,339 @@ def get_station_info():
                 "color": "Purple"
             }
         },
-        "current_time": datetime.now().isoformat(),
-        "is_peak_hour": is_peak_hour(datetime.now().hour)
+        "current_time": clock().isoformat(),
+        "is_peak_hour": service_profile.is_peak(minute_of_day(clock()))
+    }
+
+DEPARTURE_BOARD_MAX = 50
+DEPARTURE_BOARD_CACHE_MAX = int(os.getenv("DEPARTURE_BOARD_CACHE_MAX", "512"))
+_DEPARTURE_BOARD_CACHE = {}
+
+
+def _parse_clock(value):
+    """'HH:MM' (or minutes of day) to minutes of day; 400 on anything else"""
+    text = str(value).strip()
+    try:
+        if ":" in text:
+            hours, minutes = text.split(":", 1)
+            total = int(hours) * 60 + int(minutes)
+        else:
+            total = float(text)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid time '{value}', expected HH:MM")
+    if not 0 <= total < MINUTES_PER_DAY:
+        raise HTTPException(status_code=400, detail=f"Invalid time '{value}', expected HH:MM")
+    return total
+
+
+def _departure_board(station, minute, limit):
+    """Next departures from one station for one whole minute, with crowding"""
+    key = (station, minute, limit)
+    board = _DEPARTURE_BOARD_CACHE.get(key)
+    if board is not None:
+        return board
+
+    departures = timetable.next_departures(station, minute, limit)
+    crowding = passenger_load.departure_crowding(departures)
+    board = []
+    for departure, (crowd_level, occupancy) in zip(departures, crowding):
+        board.append({
+            "route_id": departure["route_id"],
+            "direction": departure["direction_label"],
+            "headsign": departure["headsign"],
+            "trip_id": departure["trip_id"],
+            "scheduled": departure["scheduled"],
+            "departs_in_min": departure["wait_min"],
+            "crowd_level": crowd_level,
+            "occupancy_percent": int(occupancy * 100)
+        })
+
+    if len(_DEPARTURE_BOARD_CACHE) >= DEPARTURE_BOARD_CACHE_MAX:
+        _DEPARTURE_BOARD_CACHE.clear()
+    _DEPARTURE_BOARD_CACHE[key] = board
+    return board
+
+
+_DIRECTION_IDS = {label: direction for direction, label in DIRECTION_LABELS.items()}
+
+
+def _live_departures(station, board):
+    """
+    Overlay Kalman ETAs of live-tracked buses on a scheduled board
+
+    The n-th live bus of a route/direction heading to the station is paired
+    with the n-th scheduled row of that route/direction. Returns the board
+    unchanged (same object) when no tracked bus is approaching.
+    """
+    live = {}
+    for eta, bus in vehicle_tracks.approaching(station):
+        key = (bus["route_id"], _DIRECTION_IDS.get(bus["direction"]))
+        live.setdefault(key, []).append((eta, bus))
+    if not live:
+        return board
+
+    rows = []
+    for row in board:
+        queue = live.get((row["route_id"], _DIRECTION_IDS[row["direction"]]))
+        if queue:
+            eta, bus = queue.pop(0)
+            row = {**row, "expected_in_min": eta, "eta_interval": bus["eta_interval"],
+                   "live_bus_id": bus["bus_id"], "source": "avl"}
+        rows.append(row)
+    return rows
+
+
+@app.get("/api/stations/{station_name}/departures")
+def station_departures(station_name: str, response: Response, limit: int = 10, at: str = None):
+    """
+    Departure board for one station across every route and direction
+
+    Args:
+        station_name: Station name (case-insensitive, common aliases accepted)
+        limit: Number of departures (1-50)
+        at: Optional 'HH:MM'; defaults to now
+
+    Returns:
+        Time-ordered departures with headsign, scheduled time, wait and
+        predicted crowding. Identical for every request within the same minute.
+    """
+    station = canonical_station(station_name) or _resolve_station_name(station_name, STATIONS)
+    if not station:
+        raise HTTPException(status_code=404, detail=f"Station '{station_name}' not found")
+    if not 1 <= limit <= DEPARTURE_BOARD_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {DEPARTURE_BOARD_MAX}")
+
+    now = clock()
+    minute = int(_parse_clock(at)) if at is not None else now.hour * 60 + now.minute
+    if at is None:
+        # clock() is the bucket start in deterministic mode, so its seconds say nothing
+        max_age = int(seconds_left_in_bucket()) if DETERMINISTIC_MODE else 60 - now.second
+        response.headers["Cache-Control"] = f"public, max-age={max(0, max_age)}"
+    else:
+        response.headers["Cache-Control"] = "public, max-age=60"
+
+    board = _departure_board(station, minute, limit)
+    if at is None:
+        live_board = _live_departures(station, board)
+        if live_board is not board:
+            board = live_board
+            response.headers["Cache-Control"] = "no-cache"
+    return {
+        "station": station,
+        "at": format_clock(minute),
+        "routes": sorted({route_id for route_id, _ in STATION_ROUTES[station]}),
+        "count": len(board),
+        "departures": board
+    }
+
+
+REACHABLE_MAX_MINUTES = 180
+
+
+@app.get("/api/reachable")
+def get_reachable(
+    from_station: str = Query(..., alias="from"),
+    minutes: float = 30,
+    at: str = None
+):
+    """
+    Every station reachable from one station within a time budget
+
+    Args:
+        from: Origin station name
+        minutes: Travel budget (1-180)
+        at: Optional 'HH:MM' departure; defaults to now
+
+    Returns:
+        Reached stations with arrival time, travel minutes and transfers,
+        plus a simplified isochrone polygon (GeoJSON)
+    """
+    origin = canonical_station(from_station) or _resolve_station_name(from_station, STATIONS)
+    if not origin:
+        raise HTTPException(status_code=404, detail=f"Station '{from_station}' not found")
+    if not 1 <= minutes <= REACHABLE_MAX_MINUTES:
+        raise HTTPException(status_code=400, detail=f"minutes must be between 1 and {REACHABLE_MAX_MINUTES}")
+
+    depart_at = _parse_clock(at) if at is not None else minute_of_day(clock())
+    reached = journey_planner.reachable(origin, depart_at, minutes)
+
+    stations = []
+    for station, info in sorted(reached.items(), key=lambda item: item[1]["arrive_min"]):
+        lat, lng = STATION_COORDS[station]
+        stations.append({
+            "station": station,
+            "arrives": format_clock(info["arrive_min"]),
+            "travel_minutes": info["travel_minutes"],
+            "transfers": info["transfers"],
+            "location": [lat, lng]
+        })
+
+    polygon = isochrone_polygon([
+        (s["location"][0], s["location"][1], minutes - s["travel_minutes"]) for s in stations
+    ])
+    return {
+        "from": origin,
+        "at": format_clock(depart_at),
+        "minutes": minutes,
+        "count": len(stations),
+        "stations": stations,
+        "isochrone": {"type": "Feature", "properties": {"minutes": minutes}, "geometry": polygon}
     }
 
+
+@app.get("/api/eta-distribution")
+def get_eta_distribution(
+    origin: str,
+    destination: str,
+    depart_at: str = None,
+    arrive_by: str = None,
+    samples: int = ETA_SAMPLES,
+    seed: int = None
+):
+    """
+    Door-to-door ETA percentiles for the planned itinerary (Monte Carlo)
+
+    Args:
+        origin, destination: Station names
+        depart_at / arrive_by: Optional 'HH:MM'; defaults to departing now
+        samples: Number of draws (1-100000)
+        seed: Optional seed for reproducible draws (derived from the request
+            in deterministic mode)
+
+    Returns:
+        p50/p80/p95 of travel minutes and arrival time, per-leg wait and ride
+        percentiles, and how often each planned trip is actually caught
+    """
+    if not 1 <= samples <= ETA_SAMPLES_MAX:
+        raise HTTPException(status_code=400, detail=f"samples must be between 1 and {ETA_SAMPLES_MAX}")
+    origin_station, destination_station, when = _journey_request(origin, destination, depart_at, arrive_by)
+    plan = journey_planner.plan(origin_station, destination_station, **when)
+    if plan is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No scheduled service from {origin_station} to {destination_station} at that time"
+        )
+    if seed is None:
+        seed = seed_for("eta-distribution", origin_station, destination_station, depart_at, arrive_by, samples)
+    return itinerary_distribution(plan, samples, seed)
+
+
+@app.get("/api/od-matrix")
+def get_od_matrix(format: str = "csv", bucket_minutes: int = OD_BUCKET_MIN_DEFAULT, start: str = None, end: str = None):
+    """
+    Station × station travel time, distance, transfers and fare per time bucket
+
+    Args:
+        format: 'csv' or 'ndjson' (streamed row by row), or 'npz' (stacked arrays)
+        bucket_minutes: Bucket width (15-240)
+        start: Optional 'HH:MM' first bucket (default start of service)
+        end: Optional 'HH:MM' end of the last bucket (default end of service)
+    """
+    if format not in OD_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(OD_FORMATS)}")
+    if not 15 <= bucket_minutes <= 240:
+        raise HTTPException(status_code=400, detail="bucket_minutes must be between 15 and 240")
+    first = _parse_clock(start) if start is not None else SERVICE_START_MIN
+    last = _parse_clock(end) if end is not None else SERVICE_END_MIN
+    starts = od_matrix.bucket_starts(bucket_minutes, first, last)
+    if not starts:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    if format == "npz":
+        return Response(
+            content=od_matrix.npz_bytes(starts),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": "attachment; filename=janmarg_od_matrix.npz"}
+        )
+    if format == "ndjson":
+        return StreamingResponse(od_matrix.stream_ndjson(starts), media_type="application/x-ndjson")
+    return StreamingResponse(
+        od_matrix.stream_csv(starts),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=janmarg_od_matrix.csv"}
+    )
+
+
+@app.get("/api/fares")
+def get_fare(origin: str, destination: str):
+    """
+    Fare between two stations from the precomputed fare matrix
+
+    Returns:
+        origin, destination, shortest network distance_km, fare_inr and the
+        active fare policy
+    """
+    origin_station = canonical_station(origin) or _resolve_station_name(origin, STATIONS)
+    destination_station = canonical_station(destination) or _resolve_station_name(destination, STATIONS)
+    if not origin_station or not destination_station:
+        missing = origin if not origin_station else destination
+        raise HTTPException(status_code=404, detail=f"Station '{missing}' not found")
+    return fare_engine.lookup(origin_station, destination_station)
+
+
+@app.get("/api/fares/matrix")
+def get_fare_matrix(format: str = "json"):
+    """
+    Full station × station fare matrix
+
+    Args:
+        format: "json" (stations + nested arrays) or "csv" (one row per pair)
+    """
+    if format == "json":
+        return fare_engine.matrix()
+    if format != "csv":
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'csv'")
+
+    stations = fare_engine.stations
+    lines = ["origin,destination,distance_km,fare_inr"]
+    for i, origin in enumerate(stations):
+        for j, destination in enumerate(stations):
+            lines.append(
+                f"\"{origin}\",\"{destination}\","
+                f"{fare_engine.distance_km[i, j]:.2f},{int(fare_engine.fare_matrix[i, j])}"
+            )
+    return Response(
+        content="\n".join(lines) + "\n",
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=janmarg_fares.csv"}
+    )
+
+
+@app.get("/api/service-profile")
+def get_service_profile(route_id: str = None, at: str = None, day: str = WEEKDAY):
+    """
+    Headway, traffic factor, occupancy and dwell from the service profile
+
+    Args:
+        route_id: Optional route (network default profile otherwise)
+        at: Optional 'HH:MM'; without it, hourly means for the whole day
+        day: Day type (weekday, saturday or sunday)
+
+    Returns:
+        Profile values at that minute, or one row per hour
+    """
+    if route_id is not None and route_id not in ROUTE_DISTANCES:
+        raise HTTPException(status_code=404, detail=f"Route {route_id} not found")
+    if day not in DAY_TYPES:
+        raise HTTPException(status_code=400, detail=f"day must be one of {', '.join(DAY_TYPES)}")
+    if at is not None:
+        return {"at": format_clock(_parse_clock(at)), **service_profile.describe(_parse_clock(at), route_id, day)}
+    table = service_profile.table(route_id, day)
+    hourly = {field: table.hourly(field) for field in PROFILE_FIELDS}
+    return {
+        "route_id": route_id,
+        "day_type": day,
+        "hours": [
+            {
+                "hour": hour,
+                "peak_minutes": int(table.peak[hour * 60:(hour + 1) * 60].sum()),
+                **{field: round(float(values[hour]), 3) for field, values in hourly.items()}
+            }
+            for hour in range(24)
+        ]
+    }
+
+
 @app.get("/api/health")
 def health_check():
     """Health check endpoint for monitoring"""
@@ -211,7 +604,7 @@ def health_check():
         "status": "healthy",
         "service": "Transit Flow AI Agent",
         "version": "1.0.0",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": clock().isoformat()
     }
 
 @app.get("/api/insight")
@@ -233,14 +626,16 @@ def get_insight(
     Returns:
         JSON object with origin-based ETA, status, crowd, frequency
     """
-    current_hour = datetime.now().hour
-    current_minute = datetime.now().minute
+    now = clock()
+    current_hour = now.hour
+    current_minute = now.minute
+    minute = minute_of_day(now)
     
     # Determine if we're in peak hours
-    is_peak = is_peak_hour_config(current_hour)
+    is_peak = service_profile.is_peak(minute, route_id)
     
     # Get headway (minutes between buses)
-    frequency = get_headway_config(current_hour)
+    frequency = round(service_profile.headway(minute, route_id), 2)
     
     # Initialize response
     response = {
@@ -248,20 +643,12 @@ def get_insight(
         "current_minute": current_minute,
         "is_peak_hour": is_peak,
         "frequency": frequency,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now.isoformat()
     }
     
     # === ORIGIN-BASED ETA LOGIC ===
     if origin_station_name and route_id:
-        # Map route IDs to station sequences
-        route_stops_map = {
-            '1': ROUTE_1_STOPS,
-            '7': ROUTE_7_STOPS,
-            '15': ROUTE_15_STOPS,
-            '4': ROUTE_4_STOPS
-        }
-        
-        route_stops = route_stops_map.get(route_id)
+        route_stops = ROUTE_STOPS_MAP.get(route_id)
         
         if not route_stops:
             raise HTTPException(status_code=404, detail=f"Route {route_id} not found")
@@ -279,35 +666,10 @@ def get_insight(
                 detail=f"Station '{origin_station_name}' not found on Route {route_id}"
             )
         
-        # === CALCULATE DISTANCE FROM DEPOT TO ORIGIN ===
-        distance_from_start = origin_index * AVG_DIST_BETWEEN_STOPS_KM
-        
-        # === CALCULATE TRAVEL TIME TO ORIGIN ===
-        time_to_station = (distance_from_start / COMMERCIAL_SPEED_KMH) * 60  # in minutes
-        
-        # === LIVE ADJUSTMENT: Calculate wait time ===
-        # The bus leaves the depot every HEADWAY minutes
-        # Calculate the next arrival slot relative to time_to_station
-        current_total_minutes = current_hour * 60 + current_minute
-        
-        # Find when the next bus arrives at this station
-        # Formula: wait_time = (HEADWAY - (current_minute % HEADWAY))
-        wait_at_depot = (frequency - (current_minute % frequency)) if (current_minute % frequency) != 0 else 0
-        
-        # ETA to origin = time from depot to station + wait for next bus
-        eta_to_origin = round(wait_at_depot + time_to_station, 1)
-        
-        response.update({
-            "route_id": route_id,
-            "origin_station": origin_station_name,
-            "origin_index": origin_index,
-            "distance_from_start_km": round(distance_from_start, 1),
-            "travel_time_to_station": round(time_to_station, 1),
-            "wait_for_next_bus": round(wait_at_depot, 1),
-            "eta": eta_to_origin,
-            "status": "Incoming from Depot",
-            "message": f"Next bus arriving at {origin_station_name} in {eta_to_origin} minutes"
-        })
+        response.update(_origin_insights(
+            [(route_id, route_stops[origin_index], origin_index)],
+            minute_of_day(now)
+        )[0])
     
     # === FALLBACK: Route-based calculation (for backwards compatibility) ===
     elif route_length_km:
@@ -315,15 +677,15 @@ def get_insight(
         travel_time_minutes = (route_length_km / COMMERCIAL_SPEED_KMH) * 60
         
         # Predict next bus arrival
-        next_bus_in = round(random.uniform(0.3, frequency), 1)
+        next_bus_in = round(stable_uniform(0.3, frequency, "insight", route_length_km), 1)
         
         # Get crowd level
-        crowd_level, occupancy_ratio = get_crowd_level(current_hour)
+        crowd_level, occupancy_ratio = get_crowd_level(minute)
         
         # Determine status
         if is_peak:
             status = "Peak Hour - Heavy Demand"
-        elif 12 <= current_hour < 17:
+        elif crowd_level.startswith("Moderate"):
             status = "Moderate Traffic"
         else:
             status = "Light Traffic"
@@ -345,8 +707,242 @@ def get_insight(
     
     return response
 
+def _origin_insights(entries, now_minutes):
+    """
+    Timetabled ETAs for many boarding points
+
+    Each entry boards the next scheduled trip of its route at that station,
+    onward unless the station is the onward terminus. When a live-tracked bus
+    is approaching, its Kalman ETA and interval replace the scheduled one.
+
+    Args:
+        entries: [(route_id, station_name, origin_index), ...]
+        now_minutes: Minute of day (seconds as a fraction)
+
+    Returns:
+        List of insight fields, one per entry
+    """
+    results = []
+    for route_id, station, origin_index in entries:
+        direction = 0 if origin_index < len(ROUTE_STOPS_MAP[route_id]) - 1 else 1
+        departure = timetable.next_departure(route_id, direction, station, now_minutes)
+        pattern = timetable.pattern(route_id, direction)
+        eta = departure["wait_min"]
+        dispatch = departure["dispatch_min"]
+        # Trips that wrapped to the next service day are still in the depot
+        if departure["departure_min"] >= MINUTES_PER_DAY:
+            dispatch += MINUTES_PER_DAY
+        results.append({
+            "route_id": route_id,
+            "origin_station": station,
+            "origin_index": origin_index,
+            "direction": DIRECTION_LABELS[direction],
+            "trip_id": departure["trip_id"],
+            "scheduled_departure": departure["scheduled"],
+            "distance_from_start_km": round(float(pattern.chainage_km[departure["stop_sequence"]]), 1),
+            "travel_time_to_station": round(departure["departure_min"] - dispatch, 1),
+            "wait_for_next_bus": eta,
+            "eta": eta,
+            "status": "Incoming from Depot" if dispatch > now_minutes else "En Route",
+            "message": f"Next bus arriving at {station} in {eta} minutes",
+            "source": "timetable"
+        })
+
+        # A tracked bus on its way beats the schedule
+        live = vehicle_tracks.approaching(station, route_id, direction)
+        if live:
+            live_eta, bus = live[0]
+            results[-1].update({
+                "eta": live_eta,
+                "eta_interval": bus["eta_interval"],
+                "live_bus_id": bus["bus_id"],
+                "status": "Live - En Route",
+                "message": f"Bus {bus['bus_id']} arriving at {station} in {live_eta} minutes "
+                           f"({bus['eta_interval'][0]}-{bus['eta_interval'][1]})",
+                "source": "avl"
+            })
+    return results
+
+
+@app.post("/api/insight/batch")
+def get_insight_batch(request_data: dict):
+    """
+    Origin-based ETAs for many (route, station) pairs in one call
+
+    Request:
+    {
+        "pairs": [{"route_id": "1", "station": "Shivranjani"}, ...]   # or "all"
+    }
+
+    Returns:
+        Shared time/headway fields and one insight per resolvable pair;
+        unknown routes or stations are listed in "errors"
+    """
+    now = clock()
+    current_hour = now.hour
+    current_minute = now.minute
+    frequency = round(service_profile.headway(minute_of_day(now)), 2)
+
+    requested = request_data.get("pairs", "all")
+    if requested == "all" or requested is None:
+        requested = [
+            {"route_id": route_id, "station": stop}
+            for route_id, stops in ROUTE_STOPS_MAP.items()
+            for stop in stops
+        ]
+    if not isinstance(requested, list):
+        raise HTTPException(status_code=400, detail="pairs must be a list or \"all\"")
+
+    entries = []
+    errors = []
+    for pair in requested:
+        if not isinstance(pair, dict):
+            errors.append({"pair": pair, "detail": "Expected {\"route_id\", \"station\"}"})
+            continue
+        route_id = str(pair.get("route_id") or "")
+        station = pair.get("station") or pair.get("origin_station_name") or ""
+        if not isinstance(station, str):
+            errors.append({"pair": pair, "detail": "station must be a string"})
+            continue
+        station = station.strip()
+        stops = ROUTE_STOPS_MAP.get(route_id)
+        if not stops:
+            errors.append({"route_id": route_id, "station": station, "detail": f"Route {route_id} not found"})
+            continue
+        lowered = [stop.lower() for stop in stops]
+        if station.lower() not in lowered:
+            errors.append({
+                "route_id": route_id,
+                "station": station,
+                "detail": f"Station '{station}' not found on Route {route_id}"
+            })
+            continue
+        origin_index = lowered.index(station.lower())
+        entries.append((route_id, stops[origin_index], origin_index))
+
+    return {
+        "current_hour": current_hour,
+        "current_minute": current_minute,
+        "is_peak_hour": service_profile.is_peak(minute_of_day(now)),
+        "frequency": frequency,
+        "timestamp": now.isoformat(),
+        "count": len(entries),
+        "insights": _origin_insights(entries, minute_of_day(now)),
+        "errors": errors
+    }
+
+
 @app.post("/api/calculate-journey")
-def calculate_journey(request_data: dict):
+def calculate_journey(request_data: dict, alternatives: int = None):
+    """
+    Journey between two stations, optionally with k ranked alternatives
+
+    ?alternatives=k adds "route_alternatives": the k fastest of the loopless
+    journeys found by Yen's algorithm on the station-on-route graph, timed on
+    the scheduled trips from depart_at (or from the arrive_by plan's departure,
+    else now). The one taking the same rides as the main journey is marked
+    "primary". Alternatives reuse the cached segment geometry and
+    reference it by key in "segment_paths" instead of repeating polylines.
+    """
+    journey = _calculate_journey(request_data)
+    if alternatives is None:
+        return journey
+    if not 1 <= alternatives <= ROUTE_ALTERNATIVES_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"alternatives must be between 1 and {ROUTE_ALTERNATIVES_MAX}"
+        )
+
+    depart_at = request_data.get("depart_at")
+    if depart_at is not None:
+        start_min = _parse_clock(depart_at)
+    elif request_data.get("arrive_by") is not None:
+        # Time the alternatives from when the arrive_by plan leaves, not from now
+        start_min = journey["itinerary"]["depart_min"] % MINUTES_PER_DAY
+    else:
+        start_min = minute_of_day(clock())
+    hour = int(start_min // 60)
+    ranked, segment_paths = _route_alternatives(
+        journey["origin"], journey["destination"], alternatives, hour, start_min, _journey_legs(journey)
+    )
+    journey["route_alternatives"] = ranked
+    journey["segment_paths"] = segment_paths
+    return journey
+
+
+def _journey_legs(journey):
+    """Rides of a calculate-journey response as [(route_id, from_station, to_station), ...]"""
+    segments = journey.get("segments") or [
+        {"route_id": journey.get("route_id"), "from_station": journey["origin"], "to_station": journey["destination"]}
+    ]
+    return [
+        (str(s["route_id"]), canonical_station(s["from_station"]), canonical_station(s["to_station"]))
+        for s in segments
+    ]
+
+
+def _route_alternatives(origin, destination, k, hour, start_min, primary_legs=None):
+    """
+    k fastest of the graph's cheapest journeys, timed on scheduled trips
+
+    Candidates come from the hour's RouteGraph (twice as many as asked for),
+    but each one's ETA is its timetable itinerary from start_min, so ETAs agree
+    with the planner; candidates no scheduled trip serves are dropped.
+    """
+    origin_station = canonical_station(origin) or _resolve_station_name(origin, STATIONS)
+    destination_station = canonical_station(destination) or _resolve_station_name(destination, STATIONS)
+    if not origin_station or not destination_station:
+        return [], {}
+
+    timed = []
+    for cost, node_path in graph_for_hour(hour).k_shortest(origin_station, destination_station, 2 * k):
+        legs = path_legs(node_path)
+        if not legs:
+            continue
+        rides = timetable.itinerary(
+            [(route_id, direction_between(route_id, a, b), a, b) for route_id, a, b in legs],
+            start_min
+        )
+        if rides is not None:
+            timed.append((rides[-1]["arrive_min"] - start_min, cost, legs, rides))
+    timed.sort(key=lambda item: (item[0], item[1]))
+
+    segment_paths = {}
+    ranked = []
+    for eta, cost, legs, rides in timed[:k]:
+        segments = []
+        for (route_id, from_station, to_station), ride in zip(legs, rides):
+            stops = ROUTES[route_id]['stops']
+            from_idx, to_idx = stops.index(from_station), stops.index(to_station)
+            segment = _segment_info(route_id, from_idx, to_idx, ROUTES)
+            key = f"{route_id}:{from_idx}-{to_idx}"
+            segment_paths.setdefault(key, segment["path"])
+            segments.append({
+                "route_id": route_id,
+                "from_station": from_station,
+                "to_station": to_station,
+                "distance_km": segment["distance_km"],
+                "trip_id": ride["trip_id"],
+                "departs": format_clock(ride["depart_min"]),
+                "arrives": format_clock(ride["arrive_min"]),
+                "wait_minutes": ride["wait_min"],
+                "duration_minutes": round(ride["arrive_min"] - ride["depart_min"], 1),
+                "path_key": key
+            })
+
+        ranked.append({
+            "rank": len(ranked) + 1,
+            "primary": legs == primary_legs,
+            "eta_minutes": int(round(eta)),
+            "total_distance_km": round(sum(s["distance_km"] for s in segments), 2),
+            "transfers": len(legs) - 1,
+            "generalized_cost": round(cost, 1),
+            "segments": segments
+        })
+    return ranked, segment_paths
+
+
+def _calculate_journey(request_data: dict):
     """
     Calculate exact journey path from origin to destination.
     Handles both single-route and multi-route (transfer) journeys.
@@ -373,6 +969,14 @@ def calculate_journey(request_data: dict):
         "transfer_station": "Jodhpur Char Rasta",
         ...
     }
+    
+    Optional "depart_at": "HH:MM" or "arrive_by": "HH:MM" switches to the
+    time-dependent planner: the response then follows actual scheduled trips
+    and adds an "itinerary" with departure/arrival times and waits.
+    
+    Optional "max_alternatives": k (departing now unless a time is given)
+    also returns up to k "alternatives" that are Pareto-optimal on travel
+    time, transfers and fare; the main response is the fastest of them.
     """
     origin = request_data.get("origin", "").strip()
     destination = request_data.get("destination", "").strip()
@@ -380,6 +984,12 @@ def calculate_journey(request_data: dict):
     if not origin or not destination:
         raise HTTPException(status_code=400, detail="Missing origin or destination")
     
+    depart_at = request_data.get("depart_at")
+    arrive_by = request_data.get("arrive_by")
+    max_alternatives = request_data.get("max_alternatives")
+    if depart_at is not None or arrive_by is not None or max_alternatives is not None:
+        return _timed_journey(origin, destination, depart_at, arrive_by, max_alternatives)
+    
     # Define route mappings
     routes_map = {
         '1': {
@@ -423,6 +1033,110 @@ def calculate_journey(request_data: dict):
     raise HTTPException(status_code=404, detail=f"No route found between {origin} and {destination}")
 
 
+def _journey_request(origin, destination, depart_at, arrive_by):
+    """Canonical stations plus the planner time argument; 404/400 on bad input"""
+    origin_station = canonical_station(origin) or _resolve_station_name(origin, STATIONS)
+    destination_station = canonical_station(destination) or _resolve_station_name(destination, STATIONS)
+    if not origin_station or not destination_station:
+        missing = origin if not origin_station else destination
+        raise HTTPException(status_code=404, detail=f"Station '{missing}' not found")
+    if origin_station == destination_station:
+        raise HTTPException(status_code=400, detail="Origin and destination are the same station")
+
+    if depart_at is not None:
+        when = {"depart_at": _parse_clock(depart_at)}
+    elif arrive_by is not None:
+        when = {"arrive_by": _parse_clock(arrive_by)}
+    else:
+        when = {"depart_at": minute_of_day(clock())}
+    return origin_station, destination_station, when
+
+
+def _timed_journey(origin, destination, depart_at, arrive_by, max_alternatives=None):
+    """Earliest-arrival (or latest-departure) journey on scheduled trips"""
+    origin_station, destination_station, when = _journey_request(origin, destination, depart_at, arrive_by)
+
+    if max_alternatives is None:
+        plan = journey_planner.plan(origin_station, destination_station, **when)
+        alternatives = [plan] if plan else []
+    else:
+        try:
+            max_alternatives = int(max_alternatives)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="max_alternatives must be an integer")
+        if max_alternatives < 1:
+            raise HTTPException(status_code=400, detail="max_alternatives must be at least 1")
+        alternatives = journey_planner.alternatives(
+            origin_station, destination_station, max_alternatives=max_alternatives, **when
+        )
+
+    if not alternatives:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No scheduled service from {origin_station} to {destination_station} at that time"
+        )
+    response = _itinerary_response(alternatives[0])
+    if max_alternatives is not None:
+        response["alternatives"] = alternatives
+    return response
+
+
+def _itinerary_response(plan):
+    """Shape a planner itinerary like the calculate-journey response, plus timings"""
+    segments = []
+    path = []
+    distance_total = 0.0
+    for i, leg in enumerate(plan["legs"]):
+        stops = ROUTES[leg["route_id"]]['stops']
+        segment = _segment_info(
+            leg["route_id"],
+            stops.index(leg["from_station"]),
+            stops.index(leg["to_station"]),
+            ROUTES
+        )
+        path = path[:-1] + segment["path"] if path else list(segment["path"])
+        distance_total += segment["distance_km"]
+        entry = {
+            "route_id": leg["route_id"],
+            "from_station": leg["from_station"],
+            "to_station": leg["to_station"],
+            "distance_km": segment["distance_km"],
+            "duration_minutes": leg["ride_minutes"],
+            "trip_id": leg["trip_id"],
+            "departs": leg["departs"],
+            "arrives": leg["arrives"]
+        }
+        if i > 0:
+            entry["wait_minutes"] = leg["wait_minutes"]
+        segments.append(entry)
+
+    legs = plan["legs"]
+    response = {
+        "path": path,
+        "total_nodes": len(path),
+        "total_distance_km": round(distance_total, 2),
+        "eta_minutes": int(round(plan["duration_minutes"])),
+        "origin": plan["origin"],
+        "destination": plan["destination"],
+        "transfer": len(legs) > 1,
+        "segments": segments,
+        "itinerary": plan,
+        "timestamp": clock().isoformat()
+    }
+    if len(legs) == 1:
+        response["route_id"] = legs[0]["route_id"]
+        response["direction"] = legs[0]["direction"]
+    else:
+        for i, leg in enumerate(legs, start=1):
+            response[f"route_{i}"] = leg["route_id"]
+        if len(legs) == 2:
+            response["transfer_station"] = legs[0]["to_station"]
+        else:
+            for i, leg in enumerate(legs[:-1], start=1):
+                response[f"transfer_station_{i}"] = leg["to_station"]
+    return response
+
+
 def _haversine_km(a, b):
     """Great-circle distance between two [lat, lng] points in km."""
     lat1, lon1 = a
@@ -534,6 +1248,9 @@ SEGMENT_CACHE_TTL_SEC = int(os.getenv("SEGMENT_CACHE_TTL_SEC", "900"))
 SEGMENT_CACHE_MAX = int(os.getenv("SEGMENT_CACHE_MAX", "128"))
 _SEGMENT_CACHE = {}
 
+TRANSFER_FALLBACK_WAIT_MIN = 3  # only when the timetable cannot serve a leg
+ROUTE_ALTERNATIVES_MAX = 10
+
 
 def _cache_get_segment(key):
     entry = _SEGMENT_CACHE.get(key)
@@ -940,12 +1657,34 @@ def _calculate_direct_path(route_id, origin_idx, dest_idx, origin, destination,
                 "duration_minutes": eta_minutes
             }
         ],
-        "timestamp": datetime.now().isoformat()
+        "timestamp": clock().isoformat()
     }
 
 
-def _find_transfer_route(origin, destination, routes_map):
+def _transfer_waits(legs, start_min):
+    """
+    Scheduled waits at each transfer for consecutive legs
+
+    Args:
+        legs: [(route_id, from_station, to_station), ...]
+        start_min: Minute of day the passenger reaches the first stop
+
+    Returns:
+        One wait (minutes) per transfer, i.e. len(legs) - 1 values
+    """
+    rides = timetable.itinerary(
+        [(route_id, direction_between(route_id, a, b), a, b) for route_id, a, b in legs],
+        start_min
+    )
+    if rides is None:
+        return [TRANSFER_FALLBACK_WAIT_MIN] * (len(legs) - 1)
+    return [ride["wait_min"] for ride in rides[1:]]
+
+
+def _find_transfer_route(origin, destination, routes_map, start_min=None):
     """Find multi-route transfer path (supports up to 2 transfers for multi-hop journeys)"""
+    if start_min is None:
+        start_min = minute_of_day(clock())
     
     # Find all routes containing origin and destination
     routes_with_origin = []
@@ -999,8 +1738,14 @@ def _find_transfer_route(origin, destination, routes_map):
                     if not (segment1 and segment2):
                         continue
 
+                    # Wait for the connecting bus from the timetable
+                    waits = _transfer_waits([
+                        (origin_route['route_id'], origin_stops[origin_route['index']], transfer_station),
+                        (dest_route['route_id'], transfer_station, dest_stops[dest_route['index']])
+                    ], start_min)
+
                     distance_km = segment1["distance_km"] + segment2["distance_km"]
-                    eta_minutes = segment1["eta_minutes"] + segment2["eta_minutes"] + 3  # +3min for transfer
+                    eta_minutes = int(round(segment1["eta_minutes"] + segment2["eta_minutes"] + waits[0]))
                     score = (eta_minutes, distance_km)
 
                     if best is None or score < best["score"]:
@@ -1008,6 +1753,7 @@ def _find_transfer_route(origin, destination, routes_map):
                             "transfer_station": transfer_station,
                             "segment1": segment1,
                             "segment2": segment2,
+                            "waits": waits,
                             "distance_km": distance_km,
                             "eta_minutes": eta_minutes,
                             "score": score
@@ -1046,10 +1792,11 @@ def _find_transfer_route(origin, destination, routes_map):
                                 "from_station": transfer_station,
                                 "to_station": destination,
                                 "distance_km": segment2["distance_km"],
-                                "duration_minutes": segment2["eta_minutes"]
+                                "duration_minutes": segment2["eta_minutes"],
+                                "wait_minutes": best["waits"][0]
                             }
                         ],
-                        "timestamp": datetime.now().isoformat()
+                        "timestamp": clock().isoformat()
                     }
     
     # ========== TRY DOUBLE TRANSFER (origin_route → mid1 → mid_route → mid2 → dest_route) ==========
@@ -1114,8 +1861,19 @@ def _find_transfer_route(origin, destination, routes_map):
                         if not (segment1 and segment2 and segment3):
                             continue
 
+                        if transfer_1 == transfer_2:
+                            continue
+
+                        waits = _transfer_waits([
+                            (origin_route['route_id'], origin_stops[origin_route['index']], transfer_1),
+                            (mid_route_id, transfer_1, transfer_2),
+                            (dest_route['route_id'], transfer_2, dest_stops[dest_route['index']])
+                        ], start_min)
+
                         distance_km = segment1["distance_km"] + segment2["distance_km"] + segment3["distance_km"]
-                        eta_minutes = segment1["eta_minutes"] + segment2["eta_minutes"] + segment3["eta_minutes"] + 6
+                        eta_minutes = int(round(
+                            segment1["eta_minutes"] + segment2["eta_minutes"] + segment3["eta_minutes"] + sum(waits)
+                        ))
                         score = (eta_minutes, distance_km)
 
                         if best is None or score < best["score"]:
@@ -1125,6 +1883,7 @@ def _find_transfer_route(origin, destination, routes_map):
                                 "segment1": segment1,
                                 "segment2": segment2,
                                 "segment3": segment3,
+                                "waits": waits,
                                 "distance_km": distance_km,
                                 "eta_minutes": eta_minutes,
                                 "score": score
@@ -1168,17 +1927,19 @@ def _find_transfer_route(origin, destination, routes_map):
                                 "from_station": transfer_1,
                                 "to_station": transfer_2,
                                 "distance_km": segment2["distance_km"],
-                                "duration_minutes": segment2["eta_minutes"]
+                                "duration_minutes": segment2["eta_minutes"],
+                                "wait_minutes": best["waits"][0]
                             },
                             {
                                 "route_id": dest_route['route_id'],
                                 "from_station": transfer_2,
                                 "to_station": destination,
                                 "distance_km": segment3["distance_km"],
-                                "duration_minutes": segment3["eta_minutes"]
+                                "duration_minutes": segment3["eta_minutes"],
+                                "wait_minutes": best["waits"][1]
                             }
                         ],
-                        "timestamp": datetime.now().isoformat()
+                        "timestamp": clock().isoformat()
                     }
     
     return None
@@ -1228,70 +1989,61 @@ def _format_stops(stops):
     return ", ".join(stops)
 
 
-def _build_chat_answer(message, origin, destination, journey, routes_map):
-    text = message.lower()
-    sources = []
+def _fare_chat_answer(route_id, journey, origin=None, destination=None):
+    journey = journey or {}
+    origin = canonical_station(journey.get("origin") or origin)
+    destination = canonical_station(journey.get("destination") or destination)
+    distance_km = None
+    if journey.get("total_distance_km"):
+        distance_km = journey.get("total_distance_km")
+    elif route_id and route_id in ROUTE_DISTANCES:
+        distance_km = ROUTE_DISTANCES[route_id]
 
-    route_id = _resolve_route_id_from_text(message, journey, routes_map)
-    if not route_id and origin and destination:
-        route_id = _find_route_id_by_stations(origin, destination, routes_map)
+    if distance_km is None and not (origin and destination):
+        return {
+            "answer": "Provide a route or origin and destination so I can estimate the fare based on official distance data.",
+            "sources": []
+        }
 
-    if any(word in text for word in ("fare", "price", "ticket")):
-        distance_km = None
-        if journey and journey.get("total_distance_km"):
-            distance_km = journey.get("total_distance_km")
-        elif route_id and route_id in ROUTE_DISTANCES:
-            distance_km = ROUTE_DISTANCES[route_id]
+    return {
+        "answer": fare_engine.answer(distance_km=distance_km, origin=origin, destination=destination),
+        "sources": ["FARE_BASE_INR", "FARE_PER_KM_INR", "FARE_BANDS_INR", "ROUTE_DISTANCES"]
+    }
 
-        if distance_km is None:
-            return {
-                "answer": "Provide a route or origin and destination so I can estimate the fare based on official distance data.",
-                "sources": []
-            }
 
-        fare = int(round(FARE_BASE_INR + (distance_km * FARE_PER_KM_INR)))
-        sources.extend([
-            "FARE_BASE_INR",
-            "FARE_PER_KM_INR",
-            "ROUTE_DISTANCES"
-        ])
+def _stops_chat_answer(route_id, routes_map):
+    if not route_id or route_id not in routes_map:
         return {
-            "answer": f"Estimated fare: ₹{fare} (base ₹{FARE_BASE_INR} + ₹{FARE_PER_KM_INR}/km for {round(distance_km, 1)} km).",
-            "sources": sources
+            "answer": "Tell me a route number (1, 7, 15) or select stations so I can list the official stops.",
+            "sources": []
         }
+    stops = routes_map[route_id]["stops"]
+    distance = ROUTE_DISTANCES.get(route_id)
+    return {
+        "answer": f"Route {route_id} stops: {_format_stops(stops)}. Distance ≈ {distance} km.",
+        "sources": ["ROUTE_1_STOPS", "ROUTE_7_STOPS", "ROUTE_15_STOPS", "ROUTE_DISTANCES"]
+    }
 
-    if any(word in text for word in ("route", "stations", "stops", "station list")):
-        if not route_id:
-            return {
-                "answer": "Tell me a route number (1, 7, 15) or select stations so I can list the official stops.",
-                "sources": []
-            }
-        stops = routes_map[route_id]["stops"]
-        distance = ROUTE_DISTANCES.get(route_id)
-        sources.extend(["ROUTE_1_STOPS", "ROUTE_7_STOPS", "ROUTE_15_STOPS", "ROUTE_DISTANCES"])
-        return {
-            "answer": f"Route {route_id} stops: {_format_stops(stops)}. Distance ≈ {distance} km.",
-            "sources": sources
-        }
 
-    if any(word in text for word in ("bus", "capacity", "headway", "frequency", "peak")):
-        sources.extend([
+def _service_info_chat_answer():
+    return {
+        "answer": (
+            f"Official service info: peak headway ≈ {HEADWAY_PEAK} min, off-peak ≈ {HEADWAY_OFFPEAK} min. "
+            f"Standard bus capacity {BUS_CAPACITY_STD} passengers (articulated {BUS_CAPACITY_ART}). "
+            "Peak hours are 8–11 AM and 5–8 PM."
+        ),
+        "sources": [
             "HEADWAY_PEAK",
             "HEADWAY_OFFPEAK",
             "BUS_CAPACITY_STD",
             "BUS_CAPACITY_ART",
             "PEAK_HOURS_MORNING",
             "PEAK_HOURS_EVENING"
-        ])
-        return {
-            "answer": (
-                f"Official service info: peak headway ≈ {HEADWAY_PEAK} min, off-peak ≈ {HEADWAY_OFFPEAK} min. "
-                f"Standard bus capacity {BUS_CAPACITY_STD} passengers (articulated {BUS_CAPACITY_ART}). "
-                "Peak hours are 8–11 AM and 5–8 PM."
-            ),
-            "sources": sources
-        }
+        ]
+    }
 
+
+def _help_chat_answer():
     return {
         "answer": (
             "I can share official Janmarg data on routes, stops, headways, capacity, and fares. "
@@ -1301,6 +2053,73 @@ def _build_chat_answer(message, origin, destination, journey, routes_map):
     }
 
 
+def _build_chat_answer(message, origin, destination, journey, routes_map):
+    text = message.lower()
+
+    route_id = _resolve_route_id_from_text(message, journey, routes_map)
+    if not route_id and origin and destination:
+        route_id = _find_route_id_by_stations(origin, destination, routes_map)
+
+    if any(word in text for word in ("fare", "price", "ticket")):
+        return _fare_chat_answer(route_id, journey, origin, destination)
+
+    if any(word in text for word in ("route", "stations", "stops", "station list")):
+        return _stops_chat_answer(route_id, routes_map)
+
+    if any(word in text for word in ("bus", "capacity", "headway", "frequency", "peak")):
+        return _service_info_chat_answer()
+
+    return _help_chat_answer()
+
+
+def _chat_fare_trip(origin, destination, journey):
+    """Canonical stations and journey distance for a fare answer (None where unknown)"""
+    distance_km = (journey or {}).get("total_distance_km")
+    if distance_km is None and origin and destination:
+        distance_km, _ = _estimate_distance_from_stations(origin, destination)
+    return {
+        "origin": canonical_station(origin) if origin else None,
+        "destination": canonical_station(destination) if destination else None,
+        "distance_km": distance_km
+    }
+
+
+def _fast_path_answer(intent, message, origin, destination, journey, routes_map):
+    """
+    Answer a classified chat intent from local data
+
+    Returns:
+        Answer string, or None when the intent lacks the data to answer locally
+    """
+    if intent == INTENT_ROUTE_GUIDANCE:
+        if not (origin and destination):
+            return None
+        return _route_guidance(origin, destination, routes_map) or None
+
+    if intent == INTENT_FARE:
+        trip = _chat_fare_trip(origin, destination, journey)
+        # Without stations or a journey distance there is nothing to quote: let the LLM answer
+        if not (trip["origin"] and trip["destination"]) and trip["distance_km"] is None:
+            return None
+        return fare_engine.answer(**trip)
+
+    if intent == INTENT_STOPS:
+        route_id = _resolve_route_id_from_text(message, journey, routes_map)
+        if not route_id and origin and destination:
+            route_id = _find_route_id_by_stations(origin, destination, routes_map)
+        if not route_id or route_id not in routes_map:
+            return None
+        return _stops_chat_answer(route_id, routes_map)["answer"]
+
+    if intent in (INTENT_HEADWAY, INTENT_PEAK_HOURS, INTENT_CAPACITY):
+        return _service_info_chat_answer()["answer"]
+
+    if intent == INTENT_GREETING:
+        return _help_chat_answer()["answer"]
+
+    return None
+
+
 # ============================================================================
 # 🤖 AI AGENT ENDPOINTS - Smart Transit Intelligence
 # ============================================================================
@@ -1329,15 +2148,213 @@ def nearest_bus(
 def live_bus_position(
     route_id: str,
     bus_id: str,
-    progress_percent: float = 0
+    progress_percent: float = None
 ):
     """
     Get real-time position of a bus moving along route
-    
+
+    progress_percent is accepted for older clients but no longer needed: the
+    position comes from live AVL fixes when the bus reports, otherwise from
+    the shared fleet snapshot.
+
     Returns:
         Current GPS location, speed, and progress
     """
-    return transit_ai.get_live_bus_position(route_id, bus_id, progress_percent)
+    position = transit_ai.get_live_bus_position(route_id, bus_id, progress_percent)
+    if position is None:
+        raise HTTPException(status_code=404, detail=f"Bus '{bus_id}' is not in service on route {route_id}")
+    return position
+
+
+@app.post("/api/vehicle-positions")
+async def ingest_vehicle_positions(request: Request):
+    """
+    Ingest a batch of AVL/GPS position reports
+
+    Body is either a GTFS-Realtime FeedMessage (Content-Type
+    application/x-protobuf or application/octet-stream) or JSON lines, one
+    {"vehicle_id", "route_id", "lat", "lng", "timestamp"} object per line.
+
+    Returns:
+        Received / accepted / rejected counts (rejected pings did not match
+        any route trace)
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    try:
+        if "protobuf" in content_type or "octet-stream" in content_type:
+            pings = decode_vehicle_positions(body)
+        else:
+            pings = parse_json_lines(body.decode("utf-8"))
+    except (ValueError, IndexError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse position batch: {e}")
+    # Map matching and ring-buffer updates are numpy work; keep them off the event loop
+    return await run_in_threadpool(vehicle_tracks.ingest, pings)
+
+
+@app.get("/api/vehicle-positions/stats")
+def vehicle_position_stats():
+    """Ingestion counters and the number of vehicles with buffered fixes"""
+    return {**vehicle_tracks.stats, "vehicles": len(vehicle_tracks.vehicle_ids), "ring_size": vehicle_tracks.ring_size}
+
+
+@app.get("/api/vehicles/{vehicle_id}/track")
+def vehicle_track(vehicle_id: str):
+    """Buffered fixes of one vehicle, oldest first"""
+    track = vehicle_tracks.track(vehicle_id)
+    if track is None:
+        raise HTTPException(status_code=404, detail=f"No fixes for vehicle '{vehicle_id}'")
+    return {"vehicle_id": vehicle_id, "count": len(track), "fixes": track}
+
+
+SSE_KEEPALIVE_SEC = 15
+
+
+def _subscription_filters(routes, stations, bbox):
+    split = lambda value: [part.strip() for part in value.split(",") if part.strip()] if isinstance(value, str) else value
+    return validate_subscription(split(routes), split(stations), bbox, canonical_station)
+
+
+@app.get("/api/stream/fleet")
+async def stream_fleet(request: Request, routes: str = None, stations: str = None, bbox: str = None):
+    """
+    Server-Sent Events feed of fleet diffs, one event per tick
+
+    Args:
+        routes: Optional comma-separated route ids
+        stations: Optional comma-separated station names (adds their ETAs)
+        bbox: Optional 'min_lat,min_lng,max_lat,max_lng'
+
+    Events are JSON: the first is {"type": "snapshot", ...} with every
+    matching bus, then {"type": "diff", "updated", "removed", "etas"}.
+    """
+    try:
+        filters = _subscription_filters(routes, stations, bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    subscription = Subscription(*filters)
+    broadcaster.subscribe(subscription)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), timeout=SSE_KEEPALIVE_SEC)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.websocket("/ws/fleet")
+async def fleet_socket(websocket: WebSocket, routes: str = None, stations: str = None, bbox: str = None):
+    """
+    WebSocket feed with the same messages as /api/stream/fleet
+
+    Filters come from the query string and can be replaced at any time by
+    sending {"routes": [...], "stations": [...], "bbox": [min_lat, min_lng, max_lat, max_lng]}.
+    """
+    await websocket.accept()
+    try:
+        filters = _subscription_filters(routes, stations, bbox)
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1008)
+        return
+    subscription = Subscription(*filters)
+    broadcaster.subscribe(subscription)
+
+    async def send():
+        while True:
+            await websocket.send_text(await subscription.queue.get())
+
+    async def receive():
+        while True:
+            request_data = await websocket.receive_json()
+            try:
+                subscription.update(*_subscription_filters(
+                    request_data.get("routes"), request_data.get("stations"), request_data.get("bbox")
+                ))
+            except (ValueError, AttributeError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+
+    tasks = [asyncio.ensure_future(send()), asyncio.ensure_future(receive())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        broadcaster.unsubscribe(subscription)
+
+
+@app.get("/api/vehicles/{vehicle_id}/predictions")
+def vehicle_predictions(vehicle_id: str):
+    """
+    Kalman-filtered arrival predictions at every stop still ahead of a
+    live-tracked vehicle, with 90% intervals
+    """
+    found = vehicle_tracks.predictions(vehicle_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"No live fixes for vehicle '{vehicle_id}'")
+    bus, stops = found
+    return {**bus, "stops": stops}
+
+
+@app.get("/api/headways")
+def headway_regularity(route_id: str = None):
+    """
+    Actual vs scheduled headways from live station passages, per route and
+    direction, with the current vehicle chain of each
+
+    Args:
+        route_id: Optional - one route only
+    """
+    if route_id is not None and route_id not in ROUTES:
+        raise HTTPException(status_code=404, detail=f"Route {route_id} not found")
+    routes = [route_id] if route_id else list(ROUTES)
+    return {
+        "station_passages": vehicle_tracks.headways.passages,
+        "routes": vehicle_tracks.headways.metrics(route_id),
+        "chains": [
+            {"route_id": r, "direction": DIRECTION_LABELS[d], "buses": vehicle_tracks.chain(r, d)}
+            for r in routes for d in DIRECTION_LABELS
+        ]
+    }
+
+
+@app.get("/api/headways/alerts")
+def headway_alerts(route_id: str = None, limit: int = 50):
+    """Newest bunching and gap alerts first"""
+    if not 1 <= limit <= 200:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 200")
+    alerts = vehicle_tracks.headways.recent_alerts(route_id, limit)
+    return {"count": len(alerts), "alerts": alerts}
+
+
+@app.get("/api/fleet")
+def fleet_positions(route_id: str = None):
+    """
+    Every bus in service at the current simulation tick
+
+    Args:
+        route_id: Optional - only buses on this route
+    """
+    if route_id is not None and route_id not in ROUTES:
+        raise HTTPException(status_code=404, detail=f"Route {route_id} not found")
+    snapshot = fleet.snapshot()
+    buses = snapshot.vehicles(route_id)
+    return {
+        "timestamp": snapshot.timestamp.isoformat(),
+        "tick_seconds": fleet.tick_sec,
+        "count": len(buses),
+        "buses": buses
+    }
 
 
 @app.post("/api/transfer-recommendations")
@@ -1362,15 +2379,21 @@ def transfer_recommendations(request_data: dict):
 def transfer_wait_time(
     transfer_station: str,
     from_route: str,
-    to_route: str
+    to_route: str,
+    to_direction: int = None
 ):
     """
     Predict waiting time at a transfer station
     
+    Args:
+        to_direction: Optional direction of the connecting route (0 onward, 1 return)
+    
     Returns:
         Wait time estimate with confidence and amenities info
     """
-    return transit_ai.predict_transfer_wait_time(transfer_station, from_route, to_route)
+    return transit_ai.predict_transfer_wait_time(
+        transfer_station, from_route, to_route, to_direction=to_direction
+    )
 
 
 @app.get("/api/traffic-aware-eta")
@@ -1534,23 +2557,6 @@ def _extract_stations_from_message(message: str, routes_map):
     return ordered
 
 
-def _is_route_question(message: str) -> bool:
-    q = (message or "").lower()
-    return any(phrase in q for phrase in (
-        "how do i go",
-        "how to go",
-        "how to reach",
-        "route from",
-        "route to",
-        "go from",
-        "get from",
-        "directions",
-        "which bus",
-        "which route",
-        "travel from"
-    ))
-
-
 def _route_guidance(origin: str, destination: str, routes_map):
     routes_with_origin = []
     routes_with_dest = []
@@ -1696,21 +2702,8 @@ def _estimate_distance_from_stations(origin: str, destination: str):
 
 
 
-@app.post("/api/chat")
-def janmarg_ai_chat(request_data: dict):
-    """
-    RAG-powered chat endpoint using the World Bank GEF report.
-    """
-    message = (request_data.get("message") or "").strip()
-    if not message:
-        raise HTTPException(status_code=400, detail="Message is required")
-
-    origin = (request_data.get("origin") or "").strip()
-    destination = (request_data.get("destination") or "").strip()
-    journey = request_data.get("journey") or {}
-    history = request_data.get("history") or []
-
-    routes_map = {
+def _chat_routes_map():
+    return {
         '1': {
             'stops': ROUTE_1_STOPS,
             'trace': ROUTE_1_FULL_TRACE,
@@ -1733,20 +2726,16 @@ def janmarg_ai_chat(request_data: dict):
         }
     }
 
-    if (not origin or not destination) and message:
-        extracted = _extract_stations_from_message(message, routes_map)
-        if len(extracted) >= 2:
-            origin = origin or extracted[0]
-            destination = destination or extracted[1]
 
-    if _is_route_question(message) and origin and destination:
-        guidance = _route_guidance(origin, destination, routes_map)
-        if guidance:
-            return {
-                "response": guidance,
-                "timestamp": datetime.now().isoformat()
-            }
+def _journey_summary(journey):
+    """Keep only the journey fields chat uses, never the geometry"""
+    if not isinstance(journey, dict) or not journey:
+        return {}
+    keys = ("total_distance_km", "eta_minutes", "route_id", "route_1", "route_2", "route_3", "route", "transfer")
+    return {key: journey[key] for key in keys if journey.get(key) is not None}
 
+
+def _build_user_context(origin, destination, journey):
     user_context = ""
     if origin or destination:
         user_context = f"origin={origin}, destination={destination}"
@@ -1763,18 +2752,115 @@ def janmarg_ai_chat(request_data: dict):
             user_context = f"{user_context}, distance_km={estimated_distance:.2f}" if user_context else f"distance_km={estimated_distance:.2f}"
         if estimated_route:
             user_context = f"{user_context}, route={estimated_route}" if user_context else f"route={estimated_route}"
+    return user_context
+
+
+def _save_chat_turn(session, message, answer):
+    session.add_turn("user", message)
+    session.add_turn("assistant", answer)
+    chat_sessions.save(session)
+
+
+@app.post("/api/chat")
+def janmarg_ai_chat(request_data: dict):
+    """
+    RAG-powered chat endpoint using the World Bank GEF report.
 
-    response = janmarg_brain.ask_llama(
+    Pass the "session_id" from a previous response and only "message" is needed;
+    history, stations and trip context are kept server-side.
+    """
+    message = (request_data.get("message") or "").strip()
+    if not message:
+        raise HTTPException(status_code=400, detail="Message is required")
+
+    session = chat_sessions.get_or_create(request_data.get("session_id"))
+
+    # Fields a client sends override the session; omitted fields reuse it
+    explicit_stations = "origin" in request_data or "destination" in request_data
+    origin = (request_data.get("origin") or "").strip() if "origin" in request_data else session.origin
+    destination = (
+        (request_data.get("destination") or "").strip()
+        if "destination" in request_data else session.destination
+    )
+    journey = _journey_summary(request_data.get("journey")) if "journey" in request_data else session.journey
+    history = request_data.get("history") if "history" in request_data else session.history
+
+    routes_map = _chat_routes_map()
+
+    extracted = _extract_stations_from_message(message, routes_map)
+    if len(extracted) >= 2:
+        if not explicit_stations:
+            origin, destination = extracted[0], extracted[1]
+        elif not origin or not destination:
+            origin = origin or extracted[0]
+            destination = destination or extracted[1]
+
+    if (origin, destination, journey) != (session.origin, session.destination, session.journey):
+        session.user_context = _build_user_context(origin, destination, journey)
+    session.origin = origin
+    session.destination = destination
+    session.journey = journey
+    user_context = session.user_context
+
+    intent = intent_engine.classify(message)
+    if intent:
+        answer = _fast_path_answer(intent, message, origin, destination, journey, routes_map)
+        if answer:
+            intent_engine.record(intent, served_locally=True)
+            _save_chat_turn(session, message, answer)
+            return {
+                "response": answer,
+                "intent": intent,
+                "served_by": "fast_path",
+                "session_id": session.session_id,
+                "timestamp": clock().isoformat()
+            }
+    intent_engine.record(intent, served_locally=False)
+
+    response, prompt_stats = janmarg_brain.ask_llama_with_stats(
         message,
         user_context=user_context or None,
-        history=history
+        history=history,
+        trip=_chat_fare_trip(origin, destination, journey),
+        fare_question=intent == INTENT_FARE
     )
+    _save_chat_turn(session, message, response)
     return {
         "response": response,
-        "timestamp": datetime.now().isoformat()
+        "intent": intent,
+        "served_by": "llm",
+        "prompt_tokens": prompt_stats["prompt_tokens"] if prompt_stats else None,
+        "prompt": prompt_stats,
+        "session_id": session.session_id,
+        "timestamp": clock().isoformat()
+    }
+
+
+@app.delete("/api/chat/session/{session_id}")
+def delete_chat_session(session_id: str):
+    """Forget a chat session (history, stations and cached context)"""
+    chat_sessions.delete(session_id)
+    return {
+        "session_id": session_id,
+        "deleted": True,
+        "timestamp": clock().isoformat()
     }
 
 
+@app.get("/api/chat/stats")
+def chat_stats():
+    """
+    Share of chat traffic answered by the local fast path
+
+    Returns:
+        Request counts per intent and the local/LLM split
+    """
+    stats = intent_engine.stats()
+    stats["sessions"] = chat_sessions.stats()
+    stats["timestamp"] = clock().isoformat()
+    return stats
+
+
 @app.post("/api/janmarg-chat")
 def janmarg_chat(request_data: dict):
     """
@@ -1807,7 +2893,7 @@ def janmarg_chat(request_data: dict):
     }
 
     response = _build_chat_answer(message, origin, destination, journey, routes_map)
-    response["timestamp"] = datetime.now().isoformat()
+    response["timestamp"] = clock().isoformat()
     return response
 
 
@@ -0,0 +1,217 @@
+"""
+⏱️ SERVICE PROFILE ENGINE
+One source for headway, traffic factor, occupancy and dwell by time of day,
+replacing the hour-based is_peak_hour / get_headway / get_traffic_factor
+helpers that janmarg_data and janmarg_config each carried (and that disagreed
+on whether 11:00 and 20:00 are peak).
+
+A profile is a base value per field plus time periods that override it
+(peak, midday, night). At startup every (route, day type) profile is compiled
+into 1440-entry per-minute arrays, so a lookup is one index. Numeric fields
+ramp linearly over `transition_min` centred on each period boundary instead
+of jumping on the hour; the peak flag itself switches exactly at the
+boundary (periods are half-open, [08:00, 11:00)).
+
+The built-in profile reproduces the official figures. SERVICE_PROFILE_PATH
+points to a JSON file that overrides it; per day type and per route entries
+replace the base values they name and, if they list periods, the periods:
+
+    {
+      "transition_min": 20,
+      "day_types": {"sunday": {"base": {"headway_min": 10}, "periods": []}},
+      "routes": {"15": {"base": {"dwell_sec": 40}}}
+    }
+
+`python service_profile.py` prints the effective configuration as a starting
+point for such a file.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from janmarg_data import (
+    DWELL_TIME_SEC,
+    HEADWAY_PEAK,
+    HEADWAY_OFFPEAK,
+    PEAK_HOURS_MORNING,
+    PEAK_HOURS_EVENING,
+    TRAFFIC_FACTOR_PEAK,
+    TRAFFIC_FACTOR_OFFPEAK,
+    TRAFFIC_FACTOR_NIGHT,
+    OCCUPANCY_CRITICAL,
+    OCCUPANCY_MODERATE,
+    OCCUPANCY_LOW,
+    ROUTE_DISTANCES
+)
+
+
+SERVICE_PROFILE_PATH = os.getenv("SERVICE_PROFILE_PATH")
+MINUTES_PER_DAY = 1440
+FIELDS = ("headway_min", "traffic_factor", "occupancy", "dwell_sec")
+WEEKDAY = "weekday"
+DAY_TYPES = (WEEKDAY, "saturday", "sunday")
+
+DEFAULT_PROFILE = {
+    "transition_min": 30,
+    "base": {
+        "headway_min": HEADWAY_OFFPEAK,
+        "traffic_factor": TRAFFIC_FACTOR_OFFPEAK,
+        "occupancy": OCCUPANCY_LOW,
+        "dwell_sec": DWELL_TIME_SEC
+    },
+    # Applied in order: later periods override earlier ones where they overlap
+    "periods": [
+        {"name": "night", "start": "22:00", "end": "06:00", "traffic_factor": TRAFFIC_FACTOR_NIGHT},
+        {"name": "midday", "start": "12:00", "end": "17:00", "occupancy": OCCUPANCY_MODERATE},
+        *[
+            {
+                "name": "peak",
+                "start": f"{start:02d}:00",
+                "end": f"{end:02d}:00",
+                "peak": True,
+                "headway_min": HEADWAY_PEAK,
+                "traffic_factor": TRAFFIC_FACTOR_PEAK,
+                "occupancy": OCCUPANCY_CRITICAL
+            }
+            for start, end in (PEAK_HOURS_MORNING, PEAK_HOURS_EVENING)
+        ]
+    ],
+    "day_types": {},
+    "routes": {}
+}
+
+
+def day_type(moment):
+    """Day type of a date or datetime: weekday, saturday or sunday"""
+    return DAY_TYPES[max(0, moment.weekday() - 4)]
+
+
+def local_minute(epoch):
+    """Local minute of day (with seconds) for epoch seconds"""
+    moment = time.localtime(epoch)
+    return moment.tm_hour * 60 + moment.tm_min + moment.tm_sec / 60
+
+
+def _clock_minutes(text):
+    hours, minutes = str(text).split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _merge(profile, override):
+    """Profile with an override's base values, periods and transition applied"""
+    if not override:
+        return profile
+    return {
+        "transition_min": override.get("transition_min", profile["transition_min"]),
+        "base": {**profile["base"], **override.get("base", {})},
+        "periods": override.get("periods", profile["periods"])
+    }
+
+
+def _smooth(values, width):
+    """Circular moving average over `width` minutes: linear ramps centred on each step"""
+    width = 2 * (int(width) // 2) + 1
+    if width <= 1:
+        return values
+    half = width // 2
+    padded = np.concatenate((values[-half:], values, values[:half]))
+    # Rounded so flat stretches stay exactly at their configured value
+    return np.round(np.convolve(padded, np.ones(width) / width, mode="valid"), 6)
+
+
+class ProfileTable:
+    """Per-minute arrays of one route and day type"""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.peak = np.zeros(MINUTES_PER_DAY, dtype=bool)
+        steps = {field: np.full(MINUTES_PER_DAY, float(profile["base"][field])) for field in FIELDS}
+        for period in profile["periods"]:
+            start = _clock_minutes(period["start"]) % MINUTES_PER_DAY
+            end = _clock_minutes(period["end"]) % MINUTES_PER_DAY
+            span = np.arange(MINUTES_PER_DAY)
+            inside = (span >= start) & (span < end) if start < end else (span >= start) | (span < end)
+            for field in FIELDS:
+                if field in period:
+                    steps[field][inside] = float(period[field])
+            if "peak" in period:
+                self.peak[inside] = bool(period["peak"])
+        for field in FIELDS:
+            setattr(self, field, _smooth(steps[field], profile["transition_min"]))
+
+    def hourly(self, field):
+        """Mean of one field over each hour (24 values)"""
+        return getattr(self, field).reshape(24, 60).mean(axis=1)
+
+
+class ServiceProfile:
+    """Compiled per-minute profiles for every route and day type"""
+
+    def __init__(self, path=SERVICE_PROFILE_PATH):
+        config = dict(DEFAULT_PROFILE)
+        if path:
+            with open(path, encoding="utf-8") as f:
+                loaded = json.load(f)
+            config.update(_merge(config, loaded))
+            config["day_types"] = loaded.get("day_types", {})
+            config["routes"] = loaded.get("routes", {})
+        self.config = config
+        self.tables = {}
+        for name in DAY_TYPES:
+            by_day = _merge(config, config["day_types"].get(name))
+            self.tables[(None, name)] = ProfileTable(by_day)
+            for route_id in ROUTE_DISTANCES:
+                route = config["routes"].get(route_id)
+                if route:
+                    by_route = _merge(_merge(by_day, route), route.get("day_types", {}).get(name))
+                    self.tables[(route_id, name)] = ProfileTable(by_route)
+
+    def table(self, route_id=None, day=WEEKDAY):
+        """ProfileTable for a route (or the network default) on a day type"""
+        found = self.tables.get((route_id, day))
+        return found if found is not None else self.tables[(None, day)]
+
+    def headway(self, minute, route_id=None, day=WEEKDAY):
+        """Scheduled minutes between buses"""
+        return float(self.table(route_id, day).headway_min[int(minute) % MINUTES_PER_DAY])
+
+    def traffic_factor(self, minute, route_id=None, day=WEEKDAY):
+        """Running-time multiplier over the commercial speed"""
+        return float(self.table(route_id, day).traffic_factor[int(minute) % MINUTES_PER_DAY])
+
+    def occupancy(self, minute, route_id=None, day=WEEKDAY):
+        """Typical share of capacity on board"""
+        return float(self.table(route_id, day).occupancy[int(minute) % MINUTES_PER_DAY])
+
+    def dwell_sec(self, minute, route_id=None, day=WEEKDAY):
+        """Dwell at an intermediate stop in seconds"""
+        return float(self.table(route_id, day).dwell_sec[int(minute) % MINUTES_PER_DAY])
+
+    def is_peak(self, minute, route_id=None, day=WEEKDAY):
+        return bool(self.table(route_id, day).peak[int(minute) % MINUTES_PER_DAY])
+
+    def describe(self, minute, route_id=None, day=WEEKDAY):
+        """All profile values at one minute"""
+        table = self.table(route_id, day)
+        i = int(minute) % MINUTES_PER_DAY
+        return {
+            "route_id": route_id,
+            "day_type": day,
+            "is_peak": bool(table.peak[i]),
+            **{field: round(float(getattr(table, field)[i]), 3) for field in FIELDS}
+        }
+
+
+# Build at import (startup)
+service_profile = ServiceProfile()
+
+
+def main():
+    print(json.dumps(service_profile.config, indent=2))
+
+
+if __name__ == "__main__":
+    main()
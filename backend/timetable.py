@@ -0,0 +1,381 @@
+"""
+🕒 HEADWAY-DERIVED TIMETABLE
+Expands the per-minute service profile (headway, traffic factor, dwell) and
+per-segment run times into every trip of the service day, per route and
+direction, once at startup.
+
+Each stop keeps sorted departure arrays, so "next N departures from X after T"
+is a binary search instead of a modulo guess or a random draw. All ETA
+endpoints read their waits from here.
+"""
+
+import numpy as np
+
+from janmarg_data import (
+    COMMERCIAL_SPEED_KMH,
+    DWELL_TIME_SEC,
+    SERVICE_START_HOUR,
+    SERVICE_END_HOUR
+)
+from service_profile import service_profile, MINUTES_PER_DAY
+from transit_network import (
+    ROUTE_IDS,
+    DIRECTIONS,
+    DIRECTION_LABELS,
+    direction_stops,
+    direction_chainage
+)
+
+
+MIN_TRANSFER_MIN = 1.0   # platform change between routes at a shared station
+SERVICE_START_MIN = SERVICE_START_HOUR * 60
+SERVICE_END_MIN = SERVICE_END_HOUR * 60
+DWELL_MIN = DWELL_TIME_SEC / 60
+
+
+def minute_of_day(moment):
+    """Minutes since midnight (with seconds) for a datetime"""
+    return moment.hour * 60 + moment.minute + moment.second / 60
+
+
+def format_clock(minutes):
+    """Absolute minutes (may exceed one day) as HH:MM"""
+    whole = int(round(minutes))
+    return f"{(whole // 60) % 24:02d}:{whole % 60:02d}"
+
+
+def dispatch_times(route_id=None, start=SERVICE_START_MIN, end=SERVICE_END_MIN):
+    """Terminal departures across the service day at the profile headway of each minute"""
+    headway = service_profile.table(route_id).headway_min
+    times = []
+    t = float(start)
+    while t <= end:
+        times.append(t)
+        t += headway[int(t) % MINUTES_PER_DAY]
+    return np.array(times)
+
+
+def _service_column(times):
+    """
+    Sorted departures at one stop, plus trips still running past midnight
+    shifted back a day so early-morning queries see them
+
+    Returns:
+        (times, trip_indices) both sorted by time
+    """
+    trips = np.arange(len(times))
+    late = times >= MINUTES_PER_DAY
+    all_times = np.concatenate((times, times[late] - MINUTES_PER_DAY))
+    all_trips = np.concatenate((trips, trips[late]))
+    order = np.argsort(all_times, kind="stable")
+    return all_times[order], all_trips[order]
+
+
+class RoutePattern:
+    """All trips of one route in one direction"""
+
+    def __init__(self, route_id, direction, dispatch, profile):
+        self.route_id = route_id
+        self.direction = direction
+        self.stops = direction_stops(route_id, direction)
+        self.stop_index = {stop: seq for seq, stop in enumerate(self.stops)}
+        self.chainage_km = direction_chainage(route_id, direction)
+        self.headsign = self.stops[-1]
+
+        n_trips, n_stops = len(dispatch), len(self.stops)
+        segment_km = np.diff(self.chainage_km)
+        self.arrivals = np.empty((n_trips, n_stops))
+        self.departures = np.empty((n_trips, n_stops))
+
+        t = dispatch.astype(float)
+        for seq in range(n_stops):
+            # Buses cannot overtake in the dedicated corridor
+            t = np.maximum.accumulate(t)
+            self.arrivals[:, seq] = t
+            minute = t.astype(np.intp) % MINUTES_PER_DAY
+            dwell = profile.dwell_sec[minute] / 60 if 0 < seq < n_stops - 1 else 0.0
+            departure = t + dwell
+            self.departures[:, seq] = departure
+            if seq < n_stops - 1:
+                factor = profile.traffic_factor[departure.astype(np.intp) % MINUTES_PER_DAY]
+                t = departure + segment_km[seq] / COMMERCIAL_SPEED_KMH * 60 * factor
+
+        # Boarding columns for every stop except the last
+        self.columns = [_service_column(self.departures[:, seq]) for seq in range(n_stops - 1)]
+
+    @property
+    def key(self):
+        return (self.route_id, self.direction)
+
+    def trip_id(self, trip_index):
+        return f"{self.route_id}-{'ON' if self.direction == 0 else 'RT'}-{trip_index:03d}"
+
+    def next_trip(self, station, after):
+        """
+        Next trip boarding at station at or after minute `after`
+
+        Returns:
+            (trip_index, departure_min) with departure_min possibly on the
+            following day (>= 1440), or None if station is the last stop
+        """
+        seq = self.stop_index.get(station)
+        if seq is None or seq >= len(self.columns):
+            return None
+        times, trips = self.columns[seq]
+        i = int(np.searchsorted(times, after, side="left"))
+        if i < len(times):
+            return int(trips[i]), float(times[i])
+        return int(trips[0]), float(times[0]) + MINUTES_PER_DAY
+
+    def next_arrival(self, station, after):
+        """
+        Next trip arriving at station at or after minute `after`
+
+        Returns:
+            (trip_index, arrival_min), or None if station is the first stop
+        """
+        seq = self.stop_index.get(station)
+        if seq is None or seq == 0:
+            return None
+        column = self.arrivals[:, seq]
+        i = int(np.searchsorted(column, after, side="left"))
+        if i < len(column):
+            return i, float(column[i])
+        return 0, float(column[0]) + MINUTES_PER_DAY
+
+    def departures_after(self, station, after, limit):
+        """Up to `limit` (departure_min, trip_index) at station from minute `after`"""
+        seq = self.stop_index.get(station)
+        if seq is None or seq >= len(self.columns) or limit <= 0:
+            return []
+        times, trips = self.columns[seq]
+        i = int(np.searchsorted(times, after, side="left"))
+        picked = list(zip(times[i:i + limit].tolist(), trips[i:i + limit].tolist()))
+        if len(picked) < limit:
+            rest = limit - len(picked)
+            picked.extend(zip((times[:rest] + MINUTES_PER_DAY).tolist(), trips[:rest].tolist()))
+        return picked
+
+    def day_offset(self, trip_index, station, departure_min):
+        """Whole-day shift (0 or ±1440) between a returned departure and the stored trip"""
+        stored = self.departures[trip_index, self.stop_index[station]]
+        return MINUTES_PER_DAY * round((departure_min - stored) / MINUTES_PER_DAY)
+
+    def arrival_at(self, trip_index, station, offset=0.0):
+        """Arrival minute of one trip at station, shifted by a day_offset"""
+        return float(self.arrivals[trip_index, self.stop_index[station]]) + offset
+
+
+class Timetable:
+    """Full-day scheduled trips for every route and direction"""
+
+    def __init__(self):
+        self.patterns = {}
+        for route_id in ROUTE_IDS:
+            dispatch = dispatch_times(route_id)
+            profile = service_profile.table(route_id)
+            for direction in DIRECTIONS:
+                pattern = RoutePattern(route_id, direction, dispatch, profile)
+                self.patterns[pattern.key] = pattern
+        self._build_stop_index()
+
+    def _build_stop_index(self):
+        # station -> merged, time-sorted boarding events across all patterns
+        keys = list(self.patterns)
+        events = {}
+        for p, key in enumerate(keys):
+            pattern = self.patterns[key]
+            for seq, (times, trips) in enumerate(pattern.columns):
+                events.setdefault(pattern.stops[seq], []).append(
+                    (times, np.full(len(times), p), trips)
+                )
+        self._pattern_keys = keys
+        self._stop_events = {}
+        for station, parts in events.items():
+            times = np.concatenate([part[0] for part in parts])
+            order = np.argsort(times, kind="stable")
+            self._stop_events[station] = (
+                times[order],
+                np.concatenate([part[1] for part in parts])[order],
+                np.concatenate([part[2] for part in parts])[order]
+            )
+
+    def pattern(self, route_id, direction):
+        return self.patterns.get((route_id, direction))
+
+    def trip_count(self):
+        return sum(len(pattern.arrivals) for pattern in self.patterns.values())
+
+    def _departure(self, pattern, trip_index, station, departure_min, after):
+        return {
+            "route_id": pattern.route_id,
+            "direction": pattern.direction,
+            "direction_label": DIRECTION_LABELS[pattern.direction],
+            "headsign": pattern.headsign,
+            "trip_id": pattern.trip_id(trip_index),
+            "trip_index": trip_index,
+            "station": station,
+            "stop_sequence": pattern.stop_index[station],
+            "departure_min": round(departure_min, 2),
+            "scheduled": format_clock(departure_min),
+            "wait_min": round(departure_min - after, 1),
+            "dispatch_min": round(float(pattern.departures[trip_index, 0]), 2)
+        }
+
+    def next_departure(self, route_id, direction, station, after):
+        """
+        Next scheduled departure of one route/direction from station
+
+        Args:
+            route_id: Route identifier
+            direction: 0 (listed order) or 1 (reverse)
+            station: Canonical station name
+            after: Minute of day (may include seconds as a fraction)
+
+        Returns:
+            Departure dict, or None if the route does not board there
+        """
+        pattern = self.pattern(route_id, direction)
+        if pattern is None:
+            return None
+        found = pattern.next_trip(station, after)
+        if found is None:
+            return None
+        trip_index, departure_min = found
+        return self._departure(pattern, trip_index, station, departure_min, after)
+
+    def ride(self, route_id, direction, from_station, to_station, after):
+        """
+        Earliest scheduled trip from one stop to a later stop of the same pattern
+
+        Returns:
+            {"trip_id", "depart_min", "arrive_min", "wait_min"}, or None if the
+            pattern does not run from from_station to to_station
+        """
+        pattern = self.pattern(route_id, direction)
+        if pattern is None or from_station not in pattern.stop_index or to_station not in pattern.stop_index:
+            return None
+        if pattern.stop_index[from_station] >= pattern.stop_index[to_station]:
+            return None
+        trip_index, departure_min = pattern.next_trip(from_station, after)
+        offset = pattern.day_offset(trip_index, from_station, departure_min)
+        return {
+            "trip_id": pattern.trip_id(trip_index),
+            "depart_min": departure_min,
+            "arrive_min": pattern.arrival_at(trip_index, to_station, offset),
+            "wait_min": round(departure_min - after, 1)
+        }
+
+    def itinerary(self, legs, start_min):
+        """
+        Chain scheduled trips across transfers
+
+        Each leg after the first boards the next departure at the transfer
+        station after the previous arrival plus MIN_TRANSFER_MIN, so waits are
+        the real gap between an arriving trip and the next connecting one.
+
+        Args:
+            legs: [(route_id, direction, from_station, to_station), ...]
+            start_min: Minute of day the passenger is at the first stop
+
+        Returns:
+            List of rides (see ride()), or None if any leg cannot be served
+        """
+        rides = []
+        ready = start_min
+        for i, (route_id, direction, from_station, to_station) in enumerate(legs):
+            ride = self.ride(route_id, direction, from_station, to_station, ready)
+            if ride is None:
+                return None
+            if i > 0:
+                ride["wait_min"] = round(ride["depart_min"] - rides[-1]["arrive_min"], 1)
+            rides.append(ride)
+            ready = ride["arrive_min"] + MIN_TRANSFER_MIN
+        return rides
+
+    def connection(self, station, from_route, to_route, after, to_direction=None):
+        """
+        Wait at a shared station between the next arriving from_route bus and
+        the next to_route departure
+
+        Args:
+            station: Canonical transfer station
+            from_route: Route the passenger arrives on (either direction)
+            to_route: Route the passenger continues on
+            after: Minute of day
+            to_direction: Optional direction of the connecting route
+
+        Returns:
+            {"arrive_min", "arriving_trip_id", "departures": [...]} with one
+            departure per connecting direction (soonest first), or None
+        """
+        arrivals = []
+        for direction in DIRECTIONS:
+            pattern = self.pattern(from_route, direction)
+            found = pattern.next_arrival(station, after) if pattern else None
+            if found:
+                arrivals.append((found[1], pattern.trip_id(found[0])))
+        if not arrivals:
+            return None
+        arrive_min, arriving_trip = min(arrivals)
+
+        directions = [to_direction] if to_direction is not None else list(DIRECTIONS)
+        departures = []
+        for direction in directions:
+            departure = self.next_departure(to_route, direction, station, arrive_min + MIN_TRANSFER_MIN)
+            if departure:
+                departure["wait_min"] = round(departure["departure_min"] - arrive_min, 1)
+                departures.append(departure)
+        if not departures:
+            return None
+        departures.sort(key=lambda d: d["departure_min"])
+        return {"arrive_min": arrive_min, "arriving_trip_id": arriving_trip, "departures": departures}
+
+    def next_departures(self, station, after, limit=5, route_id=None, direction=None):
+        """
+        Next `limit` departures from station after minute `after`
+
+        Args:
+            station: Canonical station name
+            after: Minute of day
+            limit: Number of departures
+            route_id: Optional route filter
+            direction: Optional direction filter (needs route_id)
+
+        Returns:
+            Time-ordered list of departure dicts
+        """
+        if route_id is not None:
+            directions = [direction] if direction is not None else list(DIRECTIONS)
+            picked = []
+            for d in directions:
+                pattern = self.pattern(route_id, d)
+                if pattern is None:
+                    continue
+                picked.extend(
+                    (departure_min, pattern, trip_index)
+                    for departure_min, trip_index in pattern.departures_after(station, after, limit)
+                )
+            picked.sort(key=lambda item: item[0])
+            return [
+                self._departure(pattern, trip_index, station, departure_min, after)
+                for departure_min, pattern, trip_index in picked[:limit]
+            ]
+
+        events = self._stop_events.get(station)
+        if events is None or limit <= 0:
+            return []
+        times, pattern_ids, trips = events
+        i = int(np.searchsorted(times, after, side="left"))
+        rows = list(zip(times[i:i + limit].tolist(), pattern_ids[i:i + limit].tolist(), trips[i:i + limit].tolist()))
+        if len(rows) < limit:
+            rest = limit - len(rows)
+            rows.extend(zip((times[:rest] + MINUTES_PER_DAY).tolist(), pattern_ids[:rest].tolist(), trips[:rest].tolist()))
+        return [
+            self._departure(self.patterns[self._pattern_keys[p]], trip_index, station, departure_min, after)
+            for departure_min, p, trip_index in rows
+        ]
+
+
+# Build timetable at import (startup)
+timetable = Timetable()
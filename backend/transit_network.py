@@ -0,0 +1,108 @@
+"""
+🗺️ TRANSIT NETWORK MODEL
+Route geometry, stop chainage and station lookups shared by the timetable,
+planners and live-tracking modules. Built once at import from janmarg_data.
+"""
+
+import numpy as np
+
+from janmarg_data import (
+    ROUTE_1_STOPS,
+    ROUTE_7_STOPS,
+    ROUTE_15_STOPS,
+    ROUTE_4_STOPS,
+    ROUTE_1_FULL_TRACE,
+    ROUTE_7_FULL_TRACE,
+    ROUTE_15_FULL_TRACE,
+    ROUTE_4_FULL_TRACE,
+    ROUTE_1_INDICES,
+    ROUTE_7_INDICES,
+    ROUTE_15_INDICES,
+    ROUTE_4_INDICES
+)
+
+
+EARTH_RADIUS_KM = 6371.0
+
+ROUTES = {
+    '1': {'stops': ROUTE_1_STOPS, 'trace': ROUTE_1_FULL_TRACE, 'indices': ROUTE_1_INDICES},
+    '15': {'stops': ROUTE_15_STOPS, 'trace': ROUTE_15_FULL_TRACE, 'indices': ROUTE_15_INDICES},
+    '7': {'stops': ROUTE_7_STOPS, 'trace': ROUTE_7_FULL_TRACE, 'indices': ROUTE_7_INDICES},
+    '4': {'stops': ROUTE_4_STOPS, 'trace': ROUTE_4_FULL_TRACE, 'indices': ROUTE_4_INDICES}
+}
+ROUTE_IDS = list(ROUTES.keys())
+
+# Direction 0 runs in the listed stop order, direction 1 in reverse
+DIRECTIONS = (0, 1)
+DIRECTION_LABELS = {0: "Onward (↓)", 1: "Return (↑)"}
+
+
+def haversine_km(a, b):
+    """Great-circle distance between two [lat, lng] points in km."""
+    lat1, lon1 = np.radians(a[0]), np.radians(a[1])
+    lat2, lon2 = np.radians(b[0]), np.radians(b[1])
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(h))
+
+
+def _trace_chainage(trace):
+    points = np.asarray(trace, dtype=float)
+    if len(points) < 2:
+        return np.zeros(len(points))
+    steps = haversine_km(points[:-1].T, points[1:].T)
+    return np.concatenate(([0.0], np.cumsum(steps)))
+
+
+def stop_trace_index(route_id, stop):
+    """Trace index of a stop, clamped to the trace (some indices overshoot it)"""
+    route = ROUTES[route_id]
+    idx = route['indices'].get(stop)
+    stops = route['stops']
+    last = len(route['trace']) - 1
+    if idx is None:
+        idx = int(len(route['trace']) * (stops.index(stop) / len(stops)))
+    return max(0, min(int(idx), last))
+
+
+# Cumulative km along each trace point, and along each stop in listed order
+TRACE_CHAINAGE_KM = {route_id: _trace_chainage(route['trace']) for route_id, route in ROUTES.items()}
+STOP_CHAINAGE_KM = {
+    route_id: np.array([TRACE_CHAINAGE_KM[route_id][stop_trace_index(route_id, stop)] for stop in route['stops']])
+    for route_id, route in ROUTES.items()
+}
+
+STATION_COORDS = {}
+STATION_ROUTES = {}
+for _route_id, _route in ROUTES.items():
+    for _seq, _stop in enumerate(_route['stops']):
+        STATION_COORDS.setdefault(_stop, list(_route['trace'][stop_trace_index(_route_id, _stop)]))
+        STATION_ROUTES.setdefault(_stop, []).append((_route_id, _seq))
+
+STATIONS = sorted(STATION_ROUTES)
+_STATION_BY_LOWER = {station.lower(): station for station in STATIONS}
+
+
+def canonical_station(name):
+    """Case-insensitive station lookup; returns the canonical name or None"""
+    if not name:
+        return None
+    return _STATION_BY_LOWER.get(name.strip().lower())
+
+
+def direction_stops(route_id, direction):
+    stops = ROUTES[route_id]['stops']
+    return list(stops) if direction == 0 else list(reversed(stops))
+
+
+def direction_chainage(route_id, direction):
+    """Km from the start of the trip to each stop, in travel order"""
+    chainage = STOP_CHAINAGE_KM[route_id]
+    if direction == 0:
+        return chainage - chainage[0]
+    return chainage[-1] - chainage[::-1]
+
+
+def direction_between(route_id, from_station, to_station):
+    """Direction a bus on route_id travels from from_station to to_station"""
+    stops = ROUTES[route_id]['stops']
+    return 0 if stops.index(from_station) < stops.index(to_station) else 1
@@ -0,0 +1,403 @@
+"""
+🛰️ LIVE VEHICLE TRACKS
+Ingestion side of real AVL/GPS data. A batch of pings is map-matched to the
+route traces in one vectorised pass (projection onto every trace segment) and
+written into per-vehicle ring buffers that keep the last RING_SIZE fixes.
+Every fix also feeds the vehicle's Kalman filter (arrival_prediction), which
+supplies its speed and the ETAs at the stops still ahead, and the newest fix
+per vehicle goes to the headway monitor (station passages and bunching).
+
+Storage is a set of preallocated (vehicle slot × RING_SIZE) arrays, so a batch
+write is a handful of fancy-indexed assignments no matter how many pings it
+carries.
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from arrival_prediction import ChainageKalman, schedule_speed
+from headway_monitor import HeadwayMonitor
+from service_profile import local_minute
+from transit_network import (
+    ROUTES,
+    ROUTE_IDS,
+    TRACE_CHAINAGE_KM,
+    STATION_ROUTES,
+    DIRECTION_LABELS,
+    stop_trace_index
+)
+
+
+RING_SIZE = int(os.getenv("VEHICLE_RING_SIZE", "32"))
+LIVE_STALE_SEC = float(os.getenv("VEHICLE_STALE_SEC", "120"))  # older fixes are not "live"
+MAX_SNAP_KM = 0.3          # pings further than this from every trace are rejected
+MIN_DIRECTION_SPEED_KMH = 3.0  # slower filtered speeds do not reveal a direction
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LNG_EQUATOR = 111.320
+
+
+class RouteMatcher:
+    """Projects points onto route traces and returns chainage along the trace"""
+
+    def __init__(self):
+        self.route_ids = list(ROUTE_IDS)
+        lat0 = np.mean([pt[0] for route in ROUTES.values() for pt in route['trace']])
+        self.kx = KM_PER_DEG_LNG_EQUATOR * np.cos(np.radians(lat0))
+        self.segments = {}
+        for route_id in self.route_ids:
+            trace = np.asarray(ROUTES[route_id]['trace'], dtype=float)
+            xy = np.column_stack((trace[:, 1] * self.kx, trace[:, 0] * KM_PER_DEG_LAT))
+            start, vector = xy[:-1], np.diff(xy, axis=0)
+            length_sq = np.maximum((vector ** 2).sum(axis=1), 1e-12)
+            self.segments[route_id] = (start, vector, length_sq, TRACE_CHAINAGE_KM[route_id])
+
+    def _project(self, route_id, x, y):
+        start, vector, length_sq, chainage = self.segments[route_id]
+        dx = x[:, None] - start[None, :, 0]
+        dy = y[:, None] - start[None, :, 1]
+        t = np.clip((dx * vector[:, 0] + dy * vector[:, 1]) / length_sq, 0.0, 1.0)
+        ex = dx - t * vector[:, 0]
+        ey = dy - t * vector[:, 1]
+        dist = np.hypot(ex, ey)
+        best = dist.argmin(axis=1)
+        rows = np.arange(len(x))
+        seg_km = chainage[best + 1] - chainage[best]
+        return chainage[best] + t[rows, best] * seg_km, dist[rows, best]
+
+    def match(self, route_ids, lat, lng):
+        """
+        Snap pings to their route (or the closest route when route_id is unknown)
+
+        Returns:
+            (route_index, chainage_km, offset_km) arrays; route_index is -1
+            where nothing is within MAX_SNAP_KM
+        """
+        x = np.asarray(lng, dtype=float) * self.kx
+        y = np.asarray(lat, dtype=float) * KM_PER_DEG_LAT
+        n = len(x)
+        route_index = np.full(n, -1, dtype=np.intp)
+        chainage = np.zeros(n)
+        offset = np.full(n, np.inf)
+        known = np.array([r in ROUTES for r in route_ids], dtype=bool)
+        given = np.array([self.route_ids.index(r) if r in ROUTES else -1 for r in route_ids], dtype=np.intp)
+
+        for r, route_id in enumerate(self.route_ids):
+            rows = np.flatnonzero(~known | (given == r))
+            if len(rows) == 0:
+                continue
+            km, dist = self._project(route_id, x[rows], y[rows])
+            better = dist < offset[rows]
+            picked = rows[better]
+            route_index[picked] = r
+            chainage[picked] = km[better]
+            offset[picked] = dist[better]
+
+        route_index[offset > MAX_SNAP_KM] = -1
+        return route_index, chainage, offset
+
+
+def parse_json_lines(body):
+    """
+    Pings from compact JSON lines (one object per line)
+
+    Each line: {"vehicle_id", "route_id", "lat", "lng", "timestamp"} with
+    optional "direction" (0/1) and "speed_kmh"; timestamp is epoch seconds.
+
+    Raises:
+        ValueError naming the first line that is not valid JSON, not an
+        object, or has a non-numeric lat/lng/timestamp/speed or bad direction
+    """
+    pings = []
+    for number, line in enumerate(body.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            ping = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}")
+        if not isinstance(ping, dict):
+            raise ValueError(f"line {number}: expected a JSON object")
+        for field in ("lat", "lng", "timestamp", "speed_kmh"):
+            value = ping.get(field)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise ValueError(f"line {number}: {field} must be a number")
+        if ping.get("direction") not in (None, 0, 1):
+            raise ValueError(f"line {number}: direction must be 0 or 1")
+        pings.append(ping)
+    return pings
+
+
+class VehicleTracks:
+    """Per-vehicle ring buffers of map-matched fixes"""
+
+    def __init__(self, ring_size=RING_SIZE, capacity=256):
+        self.ring_size = ring_size
+        self.matcher = RouteMatcher()
+        self.route_ids = self.matcher.route_ids
+        self.slot = {}
+        self.vehicle_ids = []
+        self._lock = threading.Lock()
+        self._allocate(capacity)
+        self.kalman = ChainageKalman(capacity)
+        self.stats = {"received": 0, "accepted": 0, "rejected": 0, "batches": 0}
+        # Stop chainage along each route's trace, in listed order, for ETA lookups
+        self.route_stops = {
+            route_id: [(stop, float(TRACE_CHAINAGE_KM[route_id][stop_trace_index(route_id, stop)]))
+                       for stop in ROUTES[route_id]['stops']]
+            for route_id in self.route_ids
+        }
+        self.station_routes = {station: {route_id for route_id, _ in served} for station, served in STATION_ROUTES.items()}
+        self.headways = HeadwayMonitor(self.route_ids, self.route_stops, capacity)
+
+    def _allocate(self, capacity):
+        shape = (capacity, self.ring_size)
+        self.ts = np.zeros(shape)
+        self.lat = np.zeros(shape)
+        self.lng = np.zeros(shape)
+        self.km = np.zeros(shape)
+        self.head = np.zeros(capacity, dtype=np.intp)
+        self.count = np.zeros(capacity, dtype=np.intp)
+        self.route = np.full(capacity, -1, dtype=np.intp)
+        self.direction = np.full(capacity, -1, dtype=np.int8)
+
+    def _grow(self, needed):
+        capacity = len(self.head)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        old = {name: getattr(self, name) for name in
+               ("ts", "lat", "lng", "km", "head", "count", "route", "direction")}
+        self._allocate(new_capacity)
+        for name, values in old.items():
+            getattr(self, name)[:capacity] = values
+        self.kalman.resize(new_capacity)
+        self.headways.resize(new_capacity)
+
+    def _slots(self, vehicle_ids):
+        slots = np.empty(len(vehicle_ids), dtype=np.intp)
+        for i, vehicle_id in enumerate(vehicle_ids):
+            s = self.slot.get(vehicle_id)
+            if s is None:
+                s = self.slot[vehicle_id] = len(self.vehicle_ids)
+                self.vehicle_ids.append(vehicle_id)
+            slots[i] = s
+        self._grow(len(self.vehicle_ids))
+        return slots
+
+    def ingest(self, pings):
+        """
+        Map-match and store a batch of pings
+
+        Args:
+            pings: Dicts with vehicle_id, lat, lng and optionally route_id,
+                timestamp (epoch seconds, default now), direction, speed_kmh
+
+        Returns:
+            {"received", "accepted", "rejected", "vehicles"}
+        """
+        now = time.time()
+        valid = [p for p in pings if p.get("vehicle_id") and p.get("lat") is not None and p.get("lng") is not None]
+        received = len(pings)
+        if not valid:
+            return self._tally(received, 0)
+
+        route_ids = [str(p.get("route_id", "")) for p in valid]
+        lat = np.fromiter((p["lat"] for p in valid), dtype=float, count=len(valid))
+        lng = np.fromiter((p["lng"] for p in valid), dtype=float, count=len(valid))
+        ts = np.fromiter((p.get("timestamp") or now for p in valid), dtype=float, count=len(valid))
+        route_index, chainage, _ = self.matcher.match(route_ids, lat, lng)
+        keep = route_index >= 0
+        if not keep.any():
+            return self._tally(received, 0)
+        vehicle_ids = [p["vehicle_id"] for p, k in zip(valid, keep.tolist()) if k]
+        stated_direction = np.array(
+            [-1 if p.get("direction") is None else p["direction"] for p, k in zip(valid, keep.tolist()) if k],
+            dtype=np.int8
+        )
+        lat, lng, ts, route_index, chainage = lat[keep], lng[keep], ts[keep], route_index[keep], chainage[keep]
+
+        with self._lock:
+            slots = self._slots(vehicle_ids)
+            # Order by (vehicle, time) so each vehicle's fixes land in sequence
+            order = np.lexsort((ts, slots))
+            slots, lat, lng, ts = slots[order], lat[order], lng[order], ts[order]
+            route_index, chainage, stated_direction = route_index[order], chainage[order], stated_direction[order]
+            first = np.r_[True, slots[1:] != slots[:-1]]
+            group_start = np.maximum.accumulate(np.where(first, np.arange(len(slots)), 0))
+            rank = np.arange(len(slots)) - group_start
+            position = (self.head[slots] + rank) % self.ring_size
+            self.ts[slots, position] = ts
+            self.lat[slots, position] = lat
+            self.lng[slots, position] = lng
+            self.km[slots, position] = chainage
+            # Filter updates run fix by fix: one vectorised pass per rank within the batch
+            for r in range(int(rank.max()) + 1):
+                at_rank = rank == r
+                self.kalman.update(slots[at_rank], ts[at_rank], chainage[at_rank])
+
+            last = np.r_[slots[1:] != slots[:-1], True]
+            touched = slots[last]
+            added = rank[last] + 1
+            self.head[touched] = (self.head[touched] + added) % self.ring_size
+            self.count[touched] = np.minimum(self.count[touched] + added, self.ring_size)
+            self.route[touched] = route_index[last]
+            self._update_motion(touched, stated_direction[last])
+            self.headways.observe(touched, ts[last], chainage[last], route_index[last],
+                                  self.direction[touched].astype(np.intp), self.vehicle_ids)
+
+        return self._tally(received, len(vehicle_ids))
+
+    def _tally(self, received, accepted):
+        """Add a batch to the ingestion counters and summarise it"""
+        for key, value in (("received", received), ("accepted", accepted),
+                           ("rejected", received - accepted), ("batches", 1)):
+            self.stats[key] += value
+        return {"received": received, "accepted": accepted, "rejected": received - accepted,
+                "vehicles": len(self.vehicle_ids)}
+
+    def _update_motion(self, slots, stated_direction):
+        """Direction as reported, else from the sign of the filtered speed"""
+        # Trace chainage grows in listed stop order, i.e. direction 0
+        v = self.kalman.v[slots]
+        inferred = np.where(np.abs(v) * 60 >= MIN_DIRECTION_SPEED_KMH, np.where(v > 0, 0, 1), -1)
+        direction = np.where(stated_direction >= 0, stated_direction, inferred)
+        self.direction[slots] = np.where(direction >= 0, direction, self.direction[slots])
+
+    def _live_slots(self, now):
+        n = len(self.vehicle_ids)
+        if n == 0:
+            return np.zeros(0, dtype=np.intp)
+        newest = (self.head[:n] - 1) % self.ring_size
+        fresh = (self.count[:n] > 0) & (now - self.ts[np.arange(n), newest] <= LIVE_STALE_SEC)
+        return np.flatnonzero(fresh)
+
+    def live_vehicles(self, now=None):
+        """Newest fix of every vehicle that reported within LIVE_STALE_SEC"""
+        now = time.time() if now is None else now
+        return [self._vehicle(s, (self.head[s] - 1) % self.ring_size) for s in self._live_slots(now).tolist()]
+
+    def latest(self, vehicle_id, now=None):
+        """Newest fix of one vehicle as a bus dict, or None if unknown or stale"""
+        now = time.time() if now is None else now
+        s = self.slot.get(vehicle_id)
+        if s is None or self.count[s] == 0:
+            return None
+        i = (self.head[s] - 1) % self.ring_size
+        if now - self.ts[s, i] > LIVE_STALE_SEC:
+            return None
+        return self._vehicle(s, i)
+
+    def _vehicle(self, s, i):
+        route_id = self.route_ids[self.route[s]]
+        total_km = float(TRACE_CHAINAGE_KM[route_id][-1]) or 1.0
+        km = float(self.km[s, i])
+        direction = int(self.direction[s])
+        progress = km / total_km if direction != 1 else 1 - km / total_km
+        return {
+            "bus_id": self.vehicle_ids[s],
+            "route_id": route_id,
+            "direction": DIRECTION_LABELS.get(direction),
+            "location": [round(float(self.lat[s, i]), 6), round(float(self.lng[s, i]), 6)],
+            "chainage_km": round(km, 3),
+            "speed_kmh": round(self.kalman.speed_kmh(s), 1),
+            "progress_percent": round(progress * 100, 1),
+            "fixes": int(self.count[s]),
+            "source": "avl",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(float(self.ts[s, i])))
+        }
+
+    def track(self, vehicle_id):
+        """All buffered fixes of one vehicle, oldest first"""
+        s = self.slot.get(vehicle_id)
+        if s is None:
+            return None
+        n = int(self.count[s])
+        idx = (self.head[s] - n + np.arange(n)) % self.ring_size
+        return [
+            {"timestamp": float(self.ts[s, i]), "location": [float(self.lat[s, i]), float(self.lng[s, i])],
+             "chainage_km": round(float(self.km[s, i]), 3)}
+            for i in idx.tolist()
+        ]
+
+    def chain(self, route_id, direction, now=None):
+        """
+        Live vehicles of one route/direction ordered front to back, each with
+        the distance behind the bus ahead of it (and that distance in minutes
+        at the scheduled running speed)
+        """
+        now = time.time() if now is None else now
+        minute = local_minute(now)
+        r = self.route_ids.index(route_id)
+        slots = [s for s in self._live_slots(now).tolist() if self.route[s] == r and self.direction[s] == direction]
+        # Front of the chain is furthest along the direction of travel
+        slots.sort(key=lambda s: self.kalman.x[s], reverse=(direction == 0))
+        chain = []
+        for n, s in enumerate(slots):
+            bus = self._vehicle(s, (self.head[s] - 1) % self.ring_size)
+            if n > 0:
+                gap_km = abs(float(self.kalman.x[slots[n - 1]] - self.kalman.x[s]))
+                bus["leader_bus_id"] = self.vehicle_ids[slots[n - 1]]
+                bus["gap_km"] = round(gap_km, 2)
+                bus["gap_min"] = round(gap_km / schedule_speed(minute, route_id), 1)
+            chain.append(bus)
+        return chain
+
+    def _predictions(self, s, now):
+        direction = int(self.direction[s])
+        if direction < 0:
+            return []
+        route_id = self.route_ids[self.route[s]]
+        return self.kalman.predict_stops(s, direction, self.route_stops[route_id], now, local_minute(now), route_id)
+
+    def predictions(self, vehicle_id, now=None):
+        """
+        Kalman arrival predictions at every stop still ahead of one vehicle
+
+        Returns:
+            (bus dict, [{"station", "eta_minutes", "eta_low", "eta_high"}, ...]),
+            or None if the vehicle is unknown or stale
+        """
+        now = time.time() if now is None else now
+        bus = self.latest(vehicle_id, now)
+        if bus is None:
+            return None
+        return bus, self._predictions(self.slot[vehicle_id], now)
+
+    def approaching(self, station, route_id=None, direction=None, now=None):
+        """
+        Live vehicles heading towards station, soonest first
+
+        Args:
+            station: Canonical station name
+            route_id: Optional route filter
+            direction: Optional direction filter (0/1)
+
+        Returns:
+            List of (eta_minutes, bus dict); each bus dict carries
+            "eta_interval" [low, high] (90%)
+        """
+        now = time.time() if now is None else now
+        served = self.station_routes.get(station, set())
+        found = []
+        for s in self._live_slots(now).tolist():
+            route = self.route_ids[self.route[s]]
+            if route not in served or (route_id is not None and route != route_id):
+                continue
+            if direction is not None and int(self.direction[s]) != direction:
+                continue
+            for prediction in self._predictions(s, now):
+                if prediction["station"] == station:
+                    bus = self._vehicle(s, (self.head[s] - 1) % self.ring_size)
+                    bus["eta_interval"] = [prediction["eta_low"], prediction["eta_high"]]
+                    found.append((prediction["eta_minutes"], bus))
+                    break
+        found.sort(key=lambda item: item[0])
+        return found
+
+
+vehicle_tracks = VehicleTracks()
@@ -15,6 +15,8 @@ export default function AIChatWindow({ isOpen = true, onClose, embedded = false
   const [input, setInput] = useState('')
   const [loading, setLoading] = useState(false)
   const endRef = useRef(null)
+  const sessionIdRef = useRef(null)
+  const sentContextRef = useRef(null)
 
   useEffect(() => {
     if (endRef.current) {
@@ -33,20 +35,28 @@ export default function AIChatWindow({ isOpen = true, onClose, embedded = false
     setLoading(true)
 
     try {
-      const history = messages
-        .slice(-6)
-        .map(item => ({ role: item.role, content: item.text }))
+      // The server keeps history and trip context per session, so only
+      // resend origin/destination/journey when they have changed
+      const payload = { message: trimmed }
+      if (sessionIdRef.current) {
+        payload.session_id = sessionIdRef.current
+      }
+      const context = { origin, destination, journey }
+      const contextKey = JSON.stringify([
+        origin,
+        destination,
+        journey?.total_distance_km,
+        journey?.route_id,
+        journey?.route_1
+      ])
+      if (!sessionIdRef.current || sentContextRef.current !== contextKey) {
+        Object.assign(payload, context)
+      }
 
       const response = await fetch('http://localhost:8000/api/chat', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          message: trimmed,
-          origin,
-          destination,
-          journey,
-          history
-        })
+        body: JSON.stringify(payload)
       })
 
       if (!response.ok) {
@@ -54,6 +64,12 @@ export default function AIChatWindow({ isOpen = true, onClose, embedded = false
       }
 
       const data = await response.json()
+      if (data.session_id) {
+        // A new id means the server lost our session; resend context next turn
+        const sameSession = data.session_id === payload.session_id
+        sentContextRef.current = sameSession || 'origin' in payload ? contextKey : null
+        sessionIdRef.current = data.session_id
+      }
       setMessages(prev => [...prev, { role: 'assistant', text: data.response }])
     } catch (error) {
       setMessages(prev => [
@@ -31,12 +31,33 @@ export default function NearestBusDetector({ userLocation }) {
       }
     }
 
-    // Fetch immediately and every 30 seconds
     fetchNearestBus()
-    const interval = setInterval(fetchNearestBus, 30000)
-    return () => clearInterval(interval)
   }, [userLocation])
 
+  // Live ETA updates for the nearest stop are pushed by the server once per tick
+  const stationName = nearestBus?.station_name
+  useEffect(() => {
+    if (!stationName) return
+
+    const source = new EventSource(
+      `http://localhost:8000/api/stream/fleet?stations=${encodeURIComponent(stationName)}`
+    )
+    source.onmessage = (event) => {
+      const message = JSON.parse(event.data)
+      const next = message.etas?.[stationName]?.[0]
+      if (!next) return
+      const bus = message.updated?.find((b) => b.bus_id === next.bus_id)
+      setNearestBus((prev) => prev && {
+        ...prev,
+        bus_id: next.bus_id,
+        route_id: next.route_id,
+        eta_minutes: Math.round(next.eta_minutes),
+        ...(bus?.occupancy_percent != null ? { occupancy_percent: bus.occupancy_percent } : {})
+      })
+    }
+    return () => source.close()
+  }, [stationName])
+
   if (!nearestBus) {
     return null
   }